@@ -1,23 +1,12 @@
 #!/bin/bash
 set -e
 
-echo "Starting entrypoint: waiting for DB and running migrations if needed..."
+echo "Starting entrypoint: checking database migrations and static files..."
 
-# Try to apply migrations with retries — useful when DB may not be immediately available
-MAX_RETRIES=30
-COUNT=0
-until python manage.py migrate --noinput; do
-  COUNT=$((COUNT+1))
-  if [ ${COUNT} -ge ${MAX_RETRIES} ]; then
-    echo "migrate failed after ${MAX_RETRIES} attempts"
-    exit 1
-  fi
-  echo "Waiting for database... (${COUNT}/${MAX_RETRIES})"
-  sleep 2
-done
-
-echo "Collecting static files..."
-python manage.py collectstatic --noinput || true
+# Un solo arranque de Django: espera la base, migra y recolecta estáticos solo si hay
+# algo pendiente (una instancia a la vez) y muestra cuánto tardó cada paso
+export STARTUP_T0=$(date +%s.%N)
+python manage.py startup --db-retries 30 --db-retry-delay 2
 
 echo "Entrypoint finished — executing CMD"
 exec "$@"
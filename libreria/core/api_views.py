@@ -2,21 +2,31 @@ from rest_framework import status, generics, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from rest_framework.pagination import CursorPagination
 from rest_framework_simplejwt.tokens import RefreshToken
-from rest_framework_simplejwt.authentication import JWTAuthentication
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate
 from django.shortcuts import get_object_or_404
 from django.db import transaction
+from django.db.models import Prefetch
+from django.http import StreamingHttpResponse
+from django.core.serializers.json import DjangoJSONEncoder
+import csv
+import io
+import json
 import logging
 
-from .models import Libro, Carrito, ItemCarrito, UserProfile
+from .authentication import CachedJWTAuthentication
+from .models import Libro, Carrito, ItemCarrito, UserProfile, Pedido, ItemPedido
 from .serializers import (
     UserRegistrationSerializer, UserLoginSerializer, LibroSerializer,
     CarritoSerializer, AddToCartSerializer, SafeUserSerializer,
-    LibroCreateUpdateSerializer, UserProfileSerializer
+    LibroCreateUpdateSerializer, UserProfileSerializer, PedidoSerializer,
+    ResumenPedidosSerializer
 )
-from .decorators import role_required, permission_required, validate_input, COMMON_VALIDATIONS
+from .uploads import ImagenUploadMixin
+from .decorators import role_required, permission_required, validate_input, idempotent, get_profile, COMMON_VALIDATIONS
+from . import reservas, pedidos, estadisticas
 
 logger = logging.getLogger('security')
 
@@ -60,7 +70,7 @@ class UserLoginView(APIView):
     
     def post(self, request):
         try:
-            serializer = UserLoginSerializer(data=request.data)
+            serializer = UserLoginSerializer(data=request.data, context={'request': request})
             if serializer.is_valid():
                 user = serializer.validated_data['user']
                 tokens = serializer.get_tokens_for_user(user)
@@ -92,12 +102,14 @@ class UserLoginView(APIView):
 
 
 class UserProfileView(APIView):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [permissions.IsAuthenticated]
     
     def get(self, request):
         try:
-            profile, created = UserProfile.objects.get_or_create(user=request.user)
+            profile = get_profile(request.user)
+            if profile is None:
+                return Response({'error': 'Profile not found'}, status=status.HTTP_404_NOT_FOUND)
             return Response({
                 'user': SafeUserSerializer(request.user).data,
                 'profile': UserProfileSerializer(profile).data
@@ -108,7 +120,9 @@ class UserProfileView(APIView):
     
     def patch(self, request):
         try:
-            profile, created = UserProfile.objects.get_or_create(user=request.user)
+            profile = get_profile(request.user)
+            if profile is None:
+                return Response({'error': 'Profile not found'}, status=status.HTTP_404_NOT_FOUND)
             serializer = UserProfileSerializer(profile, data=request.data, partial=True)
             if serializer.is_valid():
                 serializer.save()
@@ -119,39 +133,59 @@ class UserProfileView(APIView):
             return Response({'error': 'Failed to update profile'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+def libros_con_relaciones():
+    """Libros con categoría, editorial y autores en un número fijo de consultas"""
+    return Libro.objects.select_related('categoria', 'editorial').prefetch_related('autores')
+
+
+def carritos_con_items():
+    """Carritos con sus items y los libros completos de cada item (para CarritoSerializer)"""
+    return Carrito.objects.prefetch_related(Prefetch(
+        'items',
+        queryset=ItemCarrito.objects.select_related('libro__categoria', 'libro__editorial')
+        .prefetch_related('libro__autores'),
+    ))
+
+
+def filtrar_libros(params):
+    """Listado de la API filtrado por ?search= y ?categoria= (también en core/async_views.py)"""
+    # Orden estable para la paginación por páginas
+    queryset = libros_con_relaciones().order_by('-id')
+    
+    # Filtros de búsqueda seguros
+    search = params.get('search', None)
+    if search:
+        # Validar entrada de búsqueda
+        import re
+        if re.match(r'^[a-zA-Z0-9\s\-_.áéíóúñ]+$', search):
+            queryset = queryset.filter(titulo__icontains=search)
+    
+    categoria = params.get('categoria', None)
+    if categoria and categoria.isdigit():
+        queryset = queryset.filter(categoria_id=categoria)
+    
+    return queryset
+
+
 class LibroListView(generics.ListAPIView):
     queryset = Libro.objects.all()
     serializer_class = LibroSerializer
     permission_classes = [permissions.AllowAny]  # Permitir ver libros sin autenticación
     
     def get_queryset(self):
-        queryset = Libro.objects.all()
-        
-        # Filtros de búsqueda seguros
-        search = self.request.query_params.get('search', None)
-        if search:
-            # Validar entrada de búsqueda
-            import re
-            if re.match(r'^[a-zA-Z0-9\s\-_.áéíóúñ]+$', search):
-                queryset = queryset.filter(titulo__icontains=search)
-        
-        categoria = self.request.query_params.get('categoria', None)
-        if categoria and categoria.isdigit():
-            queryset = queryset.filter(categoria_id=categoria)
-        
-        return queryset
+        return filtrar_libros(self.request.query_params)
 
 
 class LibroDetailView(generics.RetrieveAPIView):
-    queryset = Libro.objects.all()
+    queryset = libros_con_relaciones()
     serializer_class = LibroSerializer
     permission_classes = [permissions.AllowAny]
 
 
-class LibroCreateView(generics.CreateAPIView):
+class LibroCreateView(ImagenUploadMixin, generics.CreateAPIView):
     queryset = Libro.objects.all()
     serializer_class = LibroCreateUpdateSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [permissions.IsAuthenticated]
     
     def create(self, request, *args, **kwargs):
@@ -161,13 +195,16 @@ class LibroCreateView(generics.CreateAPIView):
             logger.warning(f"User {request.user.username} attempted to create book without permission")
             return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
         
+        rechazo = self.subida_rechazada(request)
+        if rechazo:
+            return rechazo
         return super().create(request, *args, **kwargs)
 
 
-class LibroUpdateView(generics.UpdateAPIView):
+class LibroUpdateView(ImagenUploadMixin, generics.UpdateAPIView):
     queryset = Libro.objects.all()
     serializer_class = LibroCreateUpdateSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [permissions.IsAuthenticated]
     
     def update(self, request, *args, **kwargs):
@@ -177,12 +214,15 @@ class LibroUpdateView(generics.UpdateAPIView):
             logger.warning(f"User {request.user.username} attempted to update book without permission")
             return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
         
+        rechazo = self.subida_rechazada(request)
+        if rechazo:
+            return rechazo
         return super().update(request, *args, **kwargs)
 
 
 class LibroDeleteView(generics.DestroyAPIView):
     queryset = Libro.objects.all()
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [permissions.IsAuthenticated]
     
     def destroy(self, request, *args, **kwargs):
@@ -196,12 +236,15 @@ class LibroDeleteView(generics.DestroyAPIView):
 
 
 class CarritoView(APIView):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [permissions.IsAuthenticated]
     
     def get(self, request):
         try:
-            carrito, created = Carrito.objects.get_or_create(usuario=request.user)
+            # Solo lectura: sin carrito todavía se devuelve uno vacío sin crearlo
+            carrito = carritos_con_items().filter(usuario=request.user).first()
+            if carrito is None:
+                return Response({'id': None, 'items': [], 'total': '0.00'})
             serializer = CarritoSerializer(carrito)
             return Response(serializer.data)
         except Exception as e:
@@ -210,9 +253,10 @@ class CarritoView(APIView):
 
 
 class AddToCartView(APIView):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [permissions.IsAuthenticated]
     
+    @idempotent()
     def post(self, request):
         try:
             serializer = AddToCartSerializer(data=request.data)
@@ -224,22 +268,19 @@ class AddToCartView(APIView):
                     libro = get_object_or_404(Libro, id=libro_id)
                     carrito, created = Carrito.objects.get_or_create(usuario=request.user)
                     
-                    # Verificar si el item ya existe en el carrito
-                    item, item_created = ItemCarrito.objects.get_or_create(
-                        carrito=carrito,
-                        libro=libro,
-                        defaults={'cantidad': cantidad}
-                    )
-                    
-                    if not item_created:
-                        item.cantidad += cantidad
-                        item.save()
+                    # Retener el stock con una reserva con expiración
+                    item = reservas.reservar(carrito, libro, cantidad)
+                    if item is None:
+                        libro.refresh_from_db(fields=['stock', 'stock_reservado'])
+                        return Response({
+                            'error': f'Not enough stock. Available: {libro.stock_disponible}'
+                        }, status=status.HTTP_409_CONFLICT)
                     
                     logger.info(f"User {request.user.username} added {cantidad} of book {libro.titulo} to cart")
                     
                     return Response({
                         'message': 'Item added to cart successfully',
-                        'cart': CarritoSerializer(carrito).data
+                        'cart': CarritoSerializer(carritos_con_items().get(pk=carrito.pk)).data
                     }, status=status.HTTP_201_CREATED)
             
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -249,14 +290,14 @@ class AddToCartView(APIView):
 
 
 class RemoveFromCartView(APIView):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [permissions.IsAuthenticated]
     
     def delete(self, request, item_id):
         try:
             item = get_object_or_404(ItemCarrito, id=item_id, carrito__usuario=request.user)
             libro_titulo = item.libro.titulo
-            item.delete()
+            reservas.eliminar_item(item)
             
             logger.info(f"User {request.user.username} removed {libro_titulo} from cart")
             
@@ -266,6 +307,45 @@ class RemoveFromCartView(APIView):
             return Response({'error': 'Failed to remove from cart'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+class PedidoCursorPagination(CursorPagination):
+    """Paginación por keyset sobre el índice (usuario, -fecha, -id)"""
+    ordering = ('-fecha', '-id')
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class PedidoQuerysetMixin:
+    """Pedidos del usuario con sus items y libros en un número fijo de consultas"""
+    
+    def get_queryset(self):
+        return Pedido.objects.filter(usuario=self.request.user).prefetch_related(
+            Prefetch('items', queryset=ItemPedido.objects.select_related('libro').only(
+                'id', 'pedido_id', 'cantidad', 'precio_unitario', 'libro__id', 'libro__titulo'
+            ))
+        )
+
+
+class PedidoListView(PedidoQuerysetMixin, generics.ListAPIView):
+    serializer_class = PedidoSerializer
+    pagination_class = PedidoCursorPagination
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+
+
+class PedidoDetailView(PedidoQuerysetMixin, generics.RetrieveAPIView):
+    serializer_class = PedidoSerializer
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+
+
+class ResumenPedidosView(APIView):
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get(self, request):
+        return Response(ResumenPedidosSerializer(pedidos.obtener_resumen(request.user)).data)
+
+
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def admin_dashboard(request):
@@ -275,38 +355,102 @@ def admin_dashboard(request):
         logger.warning(f"Non-admin user {request.user.username} attempted to access admin dashboard")
         return Response({'error': 'Admin access required'}, status=status.HTTP_403_FORBIDDEN)
     
-    # Datos del dashboard (ejemplo)
-    total_users = User.objects.count()
-    total_books = Libro.objects.count()
+    # Datos del dashboard desde las estadísticas pre-agregadas
+    resumen = estadisticas.resumen_dashboard()
     
     return Response({
-        'total_users': total_users,
-        'total_books': total_books,
+        'total_users': resumen['total_usuarios'],
+        'total_books': resumen['total_libros'],
+        'total_carts': resumen['total_carritos'],
+        'total_orders': resumen['total_pedidos'],
+        'total_revenue': resumen['ingresos_totales'],
+        'sales_by_day': resumen['ventas_por_dia'],
+        'sales_by_category': resumen['ventas_por_categoria'],
         'user_role': profile.role
     })
 
 
+class UserListPagination(CursorPagination):
+    """Paginación por keyset sobre la clave primaria"""
+    ordering = 'id'
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+
+# Campos visibles según el rol: valores planos obtenidos con values()
+USER_LIST_BASIC_FIELDS = ('id', 'username', 'first_name', 'last_name')
+USER_LIST_STAFF_FIELDS = USER_LIST_BASIC_FIELDS + (
+    'email', 'date_joined', 'is_active', 'profile__role', 'profile__is_verified',
+)
+USER_EXPORT_CHUNK_SIZE = 2000
+
+
+def _user_row(row):
+    """Anidar los campos profile__* como en SafeUserSerializer"""
+    data = {key: value for key, value in row.items() if not key.startswith('profile__')}
+    if 'profile__role' in row:
+        data['profile'] = {'role': row['profile__role'], 'is_verified': row['profile__is_verified']}
+    return data
+
+
+def _stream_users_json(rows):
+    yield '['
+    for index, row in enumerate(rows):
+        yield (',' if index else '') + json.dumps(_user_row(row), cls=DjangoJSONEncoder)
+    yield ']'
+
+
+def _stream_users_csv(rows, fields):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    for row in rows:
+        writer.writerow([row[field] for field in fields])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+    yield buffer.getvalue()
+
+
 # Vista para demostrar filtrado de campos según rol
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def user_list(request):
-    """Lista de usuarios con campos filtrados según el rol"""
+    """
+    Lista de usuarios con campos filtrados según el rol.
+    
+    Paginada por cursor (?cursor=&page_size=). Los administradores pueden exportar todos
+    los usuarios con ?export=json|csv como respuesta en streaming de memoria constante.
+    """
     profile = getattr(request.user, 'profile', None)
     
-    if not profile or not profile.has_permission('view_all'):
-        # Usuario normal: solo puede ver información básica
-        users = User.objects.filter(is_active=True).values('id', 'username', 'first_name', 'last_name')
-    else:
+    if profile and profile.has_permission('view_all'):
         # Admin/Moderador: puede ver más información
         users = User.objects.all()
-        users_data = []
-        for user in users:
-            user_data = SafeUserSerializer(user).data
-            # Admins pueden ver emails y fechas
-            if profile.role == 'ADMIN':
-                user_data['email'] = user.email
-                user_data['date_joined'] = user.date_joined
-            users_data.append(user_data)
-        return Response(users_data)
+        fields = USER_LIST_STAFF_FIELDS
+    else:
+        # Usuario normal: solo puede ver información básica
+        users = User.objects.filter(is_active=True)
+        fields = USER_LIST_BASIC_FIELDS
+    rows = users.order_by('id').values(*fields)
+    
+    export = request.query_params.get('export')
+    if export:
+        if not profile or profile.role != 'ADMIN':
+            logger.warning(f"Non-admin user {request.user.username} attempted to export users")
+            return Response({'error': 'Admin access required'}, status=status.HTTP_403_FORBIDDEN)
+        if export not in ('json', 'csv'):
+            return Response({'error': 'Invalid export format'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        logger.info(f"User list exported as {export} by {request.user.username}")
+        rows = rows.iterator(chunk_size=USER_EXPORT_CHUNK_SIZE)
+        if export == 'csv':
+            response = StreamingHttpResponse(_stream_users_csv(rows, fields), content_type='text/csv')
+            response['Content-Disposition'] = 'attachment; filename="users.csv"'
+        else:
+            response = StreamingHttpResponse(_stream_users_json(rows), content_type='application/json')
+        return response
     
-    return Response(list(users))
\ No newline at end of file
+    paginator = UserListPagination()
+    page = paginator.paginate_queryset(rows, request)
+    return paginator.get_paginated_response([_user_row(row) for row in page])
@@ -0,0 +1,253 @@
+"""
+Implementaciones async de endpoints de la API y de las páginas de catálogo.
+
+Se enrutan en lugar de las vistas síncronas cuando settings.ASYNC_VIEWS está activo
+(servidor ASGI, ver libreria/asgi.py). Las consultas usan el ORM async (acount, aget,
+async for) y las independientes se lanzan juntas con asyncio.gather; mientras esperan
+la base de datos el event loop sigue atendiendo otras conexiones. Los filtros son los
+mismos de las vistas síncronas (core/views.py, core/api_views.py).
+"""
+import asyncio
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import cache
+from django.core.paginator import EmptyPage, InvalidPage, Page, PageNotAnInteger, Paginator
+from django.http import Http404, JsonResponse
+from django.shortcuts import aget_object_or_404, redirect, render
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework import exceptions
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .api_views import carritos_con_items, filtrar_libros, libros_con_relaciones
+from .authentication import CachedJWTAuthentication
+from .backends import EmailBackend
+from .decorators import validate_input, COMMON_VALIDATIONS
+from .models import Autor, Categoria, Editorial, Libro
+from .serializers import CarritoSerializer, LibroSerializer, SafeUserSerializer, UserLoginSerializer
+from .views import get_client_ip, libros_home, libros_tienda
+
+logger = logging.getLogger('security')
+
+# Listas de categorías, autores y editoriales de los filtros de la tienda; core/signals.py
+# las invalida al guardar o eliminar cualquiera de los tres modelos
+FACETAS_CACHE_KEY = 'tienda:facetas'
+
+
+def _api_error(exc):
+    """Respuesta JSON equivalente a la del exception handler de DRF"""
+    data = exc.detail if isinstance(exc.detail, dict) else {'detail': exc.detail}
+    response = JsonResponse(data, status=exc.status_code)
+    if getattr(exc, 'wait', None):
+        response['Retry-After'] = '%d' % exc.wait
+    return response
+
+
+@sync_to_async
+def _throttled(request):
+    """
+    Aplica DEFAULT_THROTTLE_CLASSES como APIView.check_throttles: la excepción Throttled
+    con la espera más larga si algún throttle rechaza la petición, o None
+    """
+    esperas = [throttle.wait() for throttle in (clase() for clase in api_settings.DEFAULT_THROTTLE_CLASSES)
+               if not throttle.allow_request(request, None)]
+    if not esperas:
+        return None
+    return exceptions.Throttled(max((espera for espera in esperas if espera is not None), default=None))
+
+
+@csrf_exempt
+@require_POST
+async def user_login(request):
+    """Login por email; el hashing corre en el pool acotado de core.backends"""
+    throttled = await _throttled(request)
+    if throttled is not None:
+        logger.warning(f"Login throttled for IP {get_client_ip(request)}")
+        return _api_error(throttled)
+
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        return JsonResponse({'error': 'Invalid JSON body'}, status=400)
+
+    email = data.get('email') if isinstance(data, dict) else None
+    password = data.get('password') if isinstance(data, dict) else None
+    if not email or not password:
+        return JsonResponse({'non_field_errors': ['Must include email and password.']}, status=400)
+
+    user = await EmailBackend().aauthenticate(request, email=email, password=password)
+    if user is None:
+        logger.warning(f"Failed login attempt for email {email} from IP {get_client_ip(request)}")
+        return JsonResponse({'non_field_errors': ['Invalid credentials.']}, status=400)
+
+    @sync_to_async
+    def build_payload():
+        return {
+            'message': 'Login successful',
+            'user': SafeUserSerializer(user).data,
+            'tokens': UserLoginSerializer().get_tokens_for_user(user),
+        }
+
+    payload = await build_payload()
+    logger.info(f"User login successful: {user.username} from IP {get_client_ip(request)}")
+    return JsonResponse(payload)
+
+
+async def _lista(queryset):
+    return [obj async for obj in queryset]
+
+
+async def _paginar(queryset, por_pagina, numero):
+    """Como Paginator.get_page(), con el COUNT y la página leídos con el ORM async"""
+    paginator = Paginator(queryset, por_pagina)
+    paginator.count = await queryset.acount()
+    try:
+        numero = paginator.validate_number(numero)
+    except PageNotAnInteger:
+        numero = 1
+    except EmptyPage:
+        numero = paginator.num_pages
+    inicio = (numero - 1) * por_pagina
+    return Page(await _lista(queryset[inicio:inicio + por_pagina]), numero, paginator)
+
+
+async def facetas():
+    """Categorías, autores y editoriales para los filtros de la tienda, cacheadas"""
+    valor = await cache.aget(FACETAS_CACHE_KEY)
+    if valor is None:
+        categorias, autores, editoriales = await asyncio.gather(
+            _lista(Categoria.objects.all()), _lista(Autor.objects.all()), _lista(Editorial.objects.all()),
+        )
+        valor = {'categorias': categorias, 'autores': autores, 'editoriales': editoriales}
+        await cache.aset(FACETAS_CACHE_KEY, valor, getattr(settings, 'CATALOGO_CACHE_SECONDS', 60))
+    return valor
+
+
+def invalidar_facetas(**kwargs):
+    cache.delete(FACETAS_CACHE_KEY)
+
+
+async def home(request):
+    libros_list, search_query = libros_home(request)
+    libros = await _paginar(libros_list, 12, request.GET.get('page'))
+    # Renderizar en un hilo: los context processors leen la sesión y el usuario
+    return await sync_to_async(render)(request, 'pagCentral.html', {
+        'libros': libros,
+        'search_query': search_query
+    })
+
+
+async def tienda(request):
+    qs, q = libros_tienda(request.GET)
+    libros, filtros = await asyncio.gather(_paginar(qs, 12, request.GET.get('page')), facetas())
+    return await sync_to_async(render)(request, 'tienda/listado.html', {
+        'libros': libros,
+        **filtros,
+        'q': q,
+    })
+
+
+@validate_input({
+    'GET': {
+        'search': COMMON_VALIDATIONS['search']
+    }
+})
+async def libro_detail(request, libro_id):
+    try:
+        libro = await aget_object_or_404(
+            Libro.objects.select_related('editorial').prefetch_related('autores'), id=libro_id
+        )
+        
+        # Libros relacionados de la misma categoría (máximo 4)
+        libros_relacionados = await _lista(
+            Libro.objects.filter(categoria_id=libro.categoria_id).exclude(id=libro_id)[:4]
+        )
+        
+        return await sync_to_async(render)(request, 'libros/libro_detail.html', {
+            'libro': libro,
+            'libros_relacionados': libros_relacionados
+        })
+    except Exception as e:
+        logger.error(f"Error viewing book detail: {str(e)}")
+        messages.error(request, 'Error al cargar el libro.')
+        return redirect('home')
+
+
+@require_GET
+async def libros_api(request):
+    """GET /api/books/ con la misma respuesta paginada que LibroListView"""
+    throttled = await _throttled(request)
+    if throttled is not None:
+        return _api_error(throttled)
+    queryset = filtrar_libros(request.GET)
+    page_size = api_settings.PAGE_SIZE
+    paginator = Paginator(queryset, page_size)
+    paginator.count = await queryset.acount()
+    try:
+        numero = paginator.validate_number(request.GET.get('page', 1))
+    except InvalidPage:
+        return JsonResponse({'detail': 'Invalid page.'}, status=404)
+    
+    inicio = (numero - 1) * page_size
+    libros = await _lista(queryset[inicio:inicio + page_size])
+    url = request.build_absolute_uri()
+    if numero == 1:
+        anterior = None
+    elif numero == 2:
+        anterior = remove_query_param(url, 'page')
+    else:
+        anterior = replace_query_param(url, 'page', numero - 1)
+    return JsonResponse({
+        'count': paginator.count,
+        'next': replace_query_param(url, 'page', numero + 1) if numero < paginator.num_pages else None,
+        'previous': anterior,
+        'results': LibroSerializer(libros, many=True, context={'request': request}).data,
+    })
+
+
+@require_GET
+async def libro_api(request, pk):
+    """GET /api/books/<pk>/ como LibroDetailView"""
+    throttled = await _throttled(request)
+    if throttled is not None:
+        return _api_error(throttled)
+    try:
+        libro = await aget_object_or_404(libros_con_relaciones(), pk=pk)
+    except Http404:
+        return JsonResponse({'detail': 'No Libro matches the given query.'}, status=404)
+    return JsonResponse(LibroSerializer(libro, context={'request': request}).data)
+
+
+@require_GET
+async def carrito_api(request):
+    """GET /api/cart/ como CarritoView (JWT); sin carrito devuelve uno vacío sin crearlo"""
+    autenticacion = CachedJWTAuthentication()
+    try:
+        resultado = await sync_to_async(autenticacion.authenticate)(request)
+    except exceptions.APIException as exc:
+        return _api_error(exc)
+    if resultado is None:
+        response = _api_error(exceptions.NotAuthenticated())
+        response['WWW-Authenticate'] = autenticacion.authenticate_header(request)
+        return response
+    
+    # Como en DRF, los throttles se aplican después de autenticar y cuentan por usuario
+    user, _ = resultado
+    request.user = user
+    throttled = await _throttled(request)
+    if throttled is not None:
+        return _api_error(throttled)
+    try:
+        carrito = await carritos_con_items().filter(usuario=user).afirst()
+        if carrito is None:
+            return JsonResponse({'id': None, 'items': [], 'total': '0.00'})
+        # Items, libros y autores ya vienen precargados: serializar no consulta la base
+        return JsonResponse(CarritoSerializer(carrito).data)
+    except Exception as e:
+        logger.error(f"Error retrieving cart: {str(e)}")
+        return JsonResponse({'error': 'Failed to retrieve cart'}, status=500)
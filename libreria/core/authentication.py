@@ -0,0 +1,91 @@
+"""
+Autenticación JWT con caché de tokens verificados.
+
+Un access token se presenta en cada petición durante toda su vida útil
+(ACCESS_TOKEN_LIFETIME). `CachedJWTAuthentication` guarda, por proceso, un LRU acotado
+de digest(token) -> token validado que expira exactamente en el `exp` del token, de
+modo que las peticiones repetidas se ahorran el base64, el JSON y la verificación HMAC.
+La búsqueda del usuario sigue haciéndose en cada petición (usuarios desactivados).
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+
+class VerifiedTokenCache:
+    """LRU thread-safe de tokens ya verificados, con contadores de aciertos"""
+
+    def __init__(self, max_size=None):
+        self.max_size = max_size or getattr(settings, 'JWT_VERIFY_CACHE_SIZE', 10000)
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(raw_token):
+        if isinstance(raw_token, str):
+            raw_token = raw_token.encode()
+        return hashlib.blake2b(raw_token, digest_size=20).digest()
+
+    def get(self, raw_token):
+        key = self.key(raw_token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                token, exp = entry
+                if time.time() < exp:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return token
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, raw_token, token):
+        exp = token.payload.get('exp')
+        if exp is None:
+            return
+        key = self.key(raw_token)
+        with self._lock:
+            self._entries[key] = (token, exp)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+verified_tokens = VerifiedTokenCache()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication que reutiliza la verificación de tokens vistos recientemente"""
+
+    cache = verified_tokens
+
+    def get_validated_token(self, raw_token):
+        token = self.cache.get(raw_token)
+        if token is None:
+            token = super().get_validated_token(raw_token)
+            self.cache.set(raw_token, token)
+        return token
@@ -0,0 +1,88 @@
+"""
+Backend de autenticación por email.
+
+Resuelve el usuario con una sola consulta sobre LOWER(email), que usa el índice
+auth_user_email_lower_idx (migración 0006), y verifica la contraseña sobre ese mismo
+objeto sin la segunda búsqueda que hace `authenticate(username=...)`. `check_password`
+actualiza el hash de forma transparente cuando cambian el hasher o sus iteraciones.
+
+En modo async (`aauthenticate`) el hashing se ejecuta en un pool de hilos acotado
+(LOGIN_HASHER_MAX_WORKERS) para que una ráfaga de logins no bloquee el event loop
+ni a las vistas del catálogo.
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import User
+from django.db import close_old_connections
+from django.db.models.functions import Lower
+
+_hasher_pool = None
+_hasher_pool_lock = threading.Lock()
+
+
+def hasher_pool():
+    global _hasher_pool
+    if _hasher_pool is None:
+        with _hasher_pool_lock:
+            if _hasher_pool is None:
+                _hasher_pool = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'LOGIN_HASHER_MAX_WORKERS', 2),
+                    thread_name_prefix='login-hasher',
+                )
+    return _hasher_pool
+
+
+def _check_password(user, password):
+    try:
+        return user.check_password(password)
+    finally:
+        # Si el hash se actualiza, check_password guarda el usuario desde este hilo del pool:
+        # su conexión se recicla como al terminar una petición (CONN_MAX_AGE, conexiones rotas)
+        close_old_connections()
+
+
+def normalize_email(email):
+    return (email or '').strip().lower()
+
+
+def users_by_email(email):
+    """Usuarios cuyo email coincide sin distinguir mayúsculas (consulta indexada)"""
+    return User.objects.annotate(email_normalized=Lower('email')).filter(
+        email_normalized=normalize_email(email)
+    )
+
+
+class EmailBackend(ModelBackend):
+    """Autenticación con email + contraseña en una sola consulta"""
+
+    def _get_user(self, email):
+        return users_by_email(email).order_by('id').first()
+
+    def authenticate(self, request, email=None, password=None, **kwargs):
+        if email is None or password is None:
+            return None
+        user = self._get_user(email)
+        if user is None:
+            # Ejecutar el hasher igualmente para no revelar qué emails existen por timing
+            User().set_password(password)
+            return None
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
+
+    async def aauthenticate(self, request, email=None, password=None, **kwargs):
+        if email is None or password is None:
+            return None
+        user = await users_by_email(email).order_by('id').afirst()
+        loop = asyncio.get_running_loop()
+        if user is None:
+            await loop.run_in_executor(hasher_pool(), User().set_password, password)
+            return None
+        valid = await loop.run_in_executor(hasher_pool(), _check_password, user, password)
+        if valid and self.user_can_authenticate(user):
+            return user
+        return None
@@ -0,0 +1,191 @@
+"""
+Backend de caché compartido entre los procesos de un mismo host.
+
+LocMemCache es por proceso: con varios workers de gunicorn cada uno tiene sus propios
+contadores de rate limiting, historial de throttling de DRF y páginas cacheadas.
+SQLiteCache guarda las entradas en un archivo SQLite en modo WAL (LOCATION), así que
+todos los procesos ven lo mismo sin agregar un servicio externo:
+
+- Los lectores no bloquean al escritor ni entre sí (WAL); cada escritura es una
+  transacción corta.
+- `incr` es atómico entre procesos: UPDATE dentro de BEGIN IMMEDIATE.
+- Los enteros se guardan como INTEGER y el resto serializado con pickle.
+- Al superar MAX_ENTRIES se borran las expiradas y, si no alcanza, 1/CULL_FREQUENCY
+  de las entradas usadas hace más tiempo (LRU aproximado: `get` actualiza el último
+  acceso como mucho una vez por segundo por clave).
+
+Los valores se leen con pickle, así que quien pueda escribir el archivo puede ejecutar
+código en la aplicación: el directorio se crea con 0700 y el archivo con 0600, y no se
+usa un archivo de otro usuario o escribible por otros (p. ej. creado antes en /tmp).
+En Windows esos permisos no existen como bits de modo y solo se crea el archivo.
+"""
+import os
+import pickle
+import sqlite3
+import stat
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.exceptions import ImproperlyConfigured
+
+# Escrituras entre comprobaciones de MAX_ENTRIES (por conexión)
+CULL_EVERY = 16
+# Resolución del último acceso: evita una escritura por cada lectura de una clave caliente
+ACCESS_RESOLUTION = 1.0
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = location
+        options = params.get('OPTIONS', {})
+        self._busy_timeout = options.get('BUSY_TIMEOUT', 5)
+        self._local = threading.local()
+
+    # Conexiones
+
+    def _secure_file(self):
+        directorio = os.path.dirname(os.path.abspath(self._path))
+        os.makedirs(directorio, mode=0o700, exist_ok=True)
+        fd = os.open(self._path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            info = os.fstat(fd)
+        finally:
+            os.close(fd)
+        # Sin os.geteuid (Windows) no hay dueño POSIX que comparar, y st_mode no refleja las ACL:
+        # un archivo escribible aparece siempre como 0o666
+        ajeno = hasattr(os, 'geteuid') and info.st_uid != os.geteuid()
+        if ajeno or (os.name != 'nt' and info.st_mode & (stat.S_IWGRP | stat.S_IWOTH)):
+            raise ImproperlyConfigured(
+                f'Cache file {self._path} must be owned by the current user and not writable by others'
+            )
+
+    def _connection(self):
+        local = self._local
+        # Una conexión por hilo y por proceso (los workers de gunicorn se crean con fork)
+        if getattr(local, 'pid', None) != os.getpid():
+            self._secure_file()
+            conn = sqlite3.connect(self._path, timeout=self._busy_timeout, isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS cache ('
+                'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL, accessed REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)')
+            local.conn, local.pid, local.writes = conn, os.getpid(), 0
+        return local.conn
+
+    def _write(self, sql, params=()):
+        conn = self._connection()
+        cursor = conn.execute(sql, params)
+        self._local.writes += 1
+        if self._local.writes % CULL_EVERY == 0:
+            self._cull(conn)
+        return cursor
+
+    def _cull(self, conn):
+        count = conn.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count <= self._max_entries:
+            return
+        conn.execute('DELETE FROM cache WHERE expires IS NOT NULL AND expires <= ?', (time.time(),))
+        count = conn.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count > self._max_entries:
+            if self._cull_frequency == 0:
+                conn.execute('DELETE FROM cache')
+            else:
+                conn.execute(
+                    'DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed LIMIT ?)',
+                    (count // self._cull_frequency,),
+                )
+
+    # Valores
+
+    @staticmethod
+    def _encode(value):
+        if type(value) is int and -2 ** 63 <= value < 2 ** 63:
+            return value
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def _decode(value):
+        return value if isinstance(value, int) else pickle.loads(value)
+
+    # API de BaseCache
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        ahora = time.time()
+        cursor = self._write(
+            'INSERT INTO cache (key, value, expires, accessed) VALUES (?, ?, ?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires = excluded.expires, '
+            'accessed = excluded.accessed WHERE cache.expires IS NOT NULL AND cache.expires <= ?',
+            (key, self._encode(value), self.get_backend_timeout(timeout), ahora, ahora),
+        )
+        return cursor.rowcount == 1
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        ahora = time.time()
+        row = self._connection().execute(
+            'SELECT value, accessed FROM cache WHERE key = ? AND (expires IS NULL OR expires > ?)', (key, ahora)
+        ).fetchone()
+        if row is None:
+            return default
+        if row[1] < ahora - ACCESS_RESOLUTION:
+            self._connection().execute('UPDATE cache SET accessed = ? WHERE key = ?', (ahora, key))
+        return self._decode(row[0])
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self._write(
+            'INSERT OR REPLACE INTO cache (key, value, expires, accessed) VALUES (?, ?, ?, ?)',
+            (key, self._encode(value), self.get_backend_timeout(timeout), time.time()),
+        )
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        cursor = self._write(
+            'UPDATE cache SET expires = ? WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), key, time.time()),
+        )
+        return cursor.rowcount == 1
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._connection().execute('DELETE FROM cache WHERE key = ?', (key,)).rowcount == 1
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._connection().execute(
+            'SELECT 1 FROM cache WHERE key = ? AND (expires IS NULL OR expires > ?)', (key, time.time())
+        ).fetchone() is not None
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        conn = self._connection()
+        # El lock de escritura se toma al empezar: dos procesos no leen el mismo valor
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                'SELECT value FROM cache WHERE key = ? AND (expires IS NULL OR expires > ?)', (key, time.time())
+            ).fetchone()
+            if row is None:
+                raise ValueError(f"Key '{key}' not found")
+            valor = self._decode(row[0]) + delta
+            conn.execute('UPDATE cache SET value = ?, accessed = ? WHERE key = ?',
+                         (self._encode(valor), time.time(), key))
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+        return valor
+
+    def clear(self):
+        self._connection().execute('DELETE FROM cache')
+
+    def close(self, **kwargs):
+        # Las conexiones se reutilizan entre peticiones (Django llama a close() al terminar cada una)
+        pass
@@ -1,14 +1,34 @@
 from functools import wraps
+from asgiref.sync import iscoroutinefunction
 from django.http import JsonResponse, HttpResponseForbidden
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import redirect
 from django.contrib import messages
-from django.core.exceptions import ValidationError
+from django.core.exceptions import ValidationError, ObjectDoesNotExist
+from django.core.cache import cache
+from django.conf import settings
+from rest_framework.response import Response
+import hashlib
+import json
 import re
 import logging
 
 logger = logging.getLogger('security')
 
+
+def get_profile(user):
+    """
+    Perfil del usuario o None, sin crearlo.
+
+    Los perfiles se crean con el usuario (core/signals.py) y los usuarios antiguos se
+    completan con `manage.py crear_perfiles_faltantes`; una petición nunca escribe.
+    """
+    try:
+        return user.profile
+    except ObjectDoesNotExist:
+        return None
+
+
 def role_required(allowed_roles):
     """
     Decorador para verificar que el usuario tenga uno de los roles permitidos
@@ -17,27 +37,22 @@ def role_required(allowed_roles):
         @wraps(view_func)
         @login_required
         def _wrapped_view(request, *args, **kwargs):
-            try:
-                user_profile = request.user.profile
-                if user_profile.role not in allowed_roles:
-                    logger.warning(f"Access denied for user {request.user.username} with role {user_profile.role} "
-                                 f"to view requiring roles {allowed_roles}")
-                    
-                    if request.content_type == 'application/json':
-                        return JsonResponse({
-                            'error': 'Access denied',
-                            'message': f'Required role: {" or ".join(allowed_roles)}'
-                        }, status=403)
-                    else:
-                        messages.error(request, 'No tienes permisos para acceder a esta página.')
-                        return redirect('home')
+            user_profile = get_profile(request.user)
+            if user_profile is None or user_profile.role not in allowed_roles:
+                role = user_profile.role if user_profile else None
+                logger.warning(f"Access denied for user {request.user.username} with role {role} "
+                             f"to view requiring roles {allowed_roles}")
                 
-                return view_func(request, *args, **kwargs)
-            except AttributeError:
-                # Si el usuario no tiene perfil, crear uno por defecto
-                from .models import UserProfile
-                UserProfile.objects.create(user=request.user, role='USER')
-                return view_func(request, *args, **kwargs)
+                if request.content_type == 'application/json':
+                    return JsonResponse({
+                        'error': 'Access denied',
+                        'message': f'Required role: {" or ".join(allowed_roles)}'
+                    }, status=403)
+                else:
+                    messages.error(request, 'No tienes permisos para acceder a esta página.')
+                    return redirect('home')
+            
+            return view_func(request, *args, **kwargs)
         
         return _wrapped_view
     return decorator
@@ -51,58 +66,73 @@ def permission_required(permission):
         @wraps(view_func)
         @login_required
         def _wrapped_view(request, *args, **kwargs):
-            try:
-                user_profile = request.user.profile
-                if not user_profile.has_permission(permission):
-                    logger.warning(f"Permission denied for user {request.user.username} "
-                                 f"trying to access {permission}")
-                    
-                    if request.content_type == 'application/json':
-                        return JsonResponse({
-                            'error': 'Permission denied',
-                            'message': f'Required permission: {permission}'
-                        }, status=403)
-                    else:
-                        messages.error(request, 'No tienes permisos para realizar esta acción.')
-                        return redirect('home')
+            user_profile = get_profile(request.user)
+            if user_profile is None or not user_profile.has_permission(permission):
+                logger.warning(f"Permission denied for user {request.user.username} "
+                             f"trying to access {permission}")
                 
-                return view_func(request, *args, **kwargs)
-            except AttributeError:
-                from .models import UserProfile
-                UserProfile.objects.create(user=request.user, role='USER')
-                return view_func(request, *args, **kwargs)
+                if request.content_type == 'application/json':
+                    return JsonResponse({
+                        'error': 'Permission denied',
+                        'message': f'Required permission: {permission}'
+                    }, status=403)
+                else:
+                    messages.error(request, 'No tienes permisos para realizar esta acción.')
+                    return redirect('home')
+            
+            return view_func(request, *args, **kwargs)
         
         return _wrapped_view
     return decorator
 
 
+def _invalid_input(request, validation_rules):
+    """(método, parámetro, valor) del primer input inválido, o None"""
+    # Validar parámetros GET
+    for param, rules in validation_rules.get('GET', {}).items():
+        value = request.GET.get(param)
+        if value and not _validate_value(value, rules):
+            return 'GET', param, value
+    
+    # Validar parámetros POST para formularios
+    if request.method == 'POST':
+        for param, rules in validation_rules.get('POST', {}).items():
+            value = request.POST.get(param)
+            if value and not _validate_value(value, rules):
+                return 'POST', param, value
+    return None
+
+
+def _invalid_input_response(invalid, user):
+    method, param, value = invalid
+    logger.warning(f"Invalid {method} parameter '{param}' with value '{value}' from user {user}")
+    return JsonResponse({
+        'error': 'Invalid input',
+        'message': f'Parameter {param} contains invalid characters'
+    }, status=400)
+
+
 def validate_input(validation_rules):
     """
     Decorador para validar inputs y prevenir ataques de inyección
     """
     def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def _wrapped_async_view(request, *args, **kwargs):
+                invalid = _invalid_input(request, validation_rules)
+                if invalid:
+                    # request.user es perezoso y consulta la base: en async usar auser()
+                    return _invalid_input_response(invalid, await request.auser())
+                return await view_func(request, *args, **kwargs)
+            
+            return _wrapped_async_view
+        
         @wraps(view_func)
         def _wrapped_view(request, *args, **kwargs):
-            # Validar parámetros GET
-            for param, rules in validation_rules.get('GET', {}).items():
-                value = request.GET.get(param)
-                if value and not _validate_value(value, rules):
-                    logger.warning(f"Invalid GET parameter '{param}' with value '{value}' from user {request.user}")
-                    return JsonResponse({
-                        'error': 'Invalid input',
-                        'message': f'Parameter {param} contains invalid characters'
-                    }, status=400)
-            
-            # Validar parámetros POST para formularios
-            if request.method == 'POST':
-                for param, rules in validation_rules.get('POST', {}).items():
-                    value = request.POST.get(param)
-                    if value and not _validate_value(value, rules):
-                        logger.warning(f"Invalid POST parameter '{param}' with value '{value}' from user {request.user}")
-                        return JsonResponse({
-                            'error': 'Invalid input',
-                            'message': f'Parameter {param} contains invalid characters'
-                        }, status=400)
+            invalid = _invalid_input(request, validation_rules)
+            if invalid:
+                return _invalid_input_response(invalid, request.user)
             
             return view_func(request, *args, **kwargs)
         
@@ -110,6 +140,72 @@ def validate_input(validation_rules):
     return decorator
 
 
+IDEMPOTENCY_KEY_PATTERN = re.compile(r'^[A-Za-z0-9_\-:.]{1,255}$')
+
+
+def idempotent(lock_timeout=30):
+    """
+    Decorador para métodos POST de APIView que soporta la cabecera Idempotency-Key.
+    
+    La primera respuesta (status + body) se guarda en cache por usuario y clave durante
+    IDEMPOTENCY_KEY_TTL segundos; los reintentos con la misma clave la reciben sin volver
+    a ejecutar la vista. Un lock en cache evita ejecutar dos veces peticiones concurrentes.
+    """
+    def decorator(view_method):
+        @wraps(view_method)
+        def _wrapped_view(self, request, *args, **kwargs):
+            key = request.headers.get('Idempotency-Key')
+            if not key:
+                return view_method(self, request, *args, **kwargs)
+            
+            if not IDEMPOTENCY_KEY_PATTERN.match(key):
+                return Response({'error': 'Invalid Idempotency-Key header'}, status=400)
+            
+            user_id = request.user.pk if request.user.is_authenticated else 'anon'
+            digest = hashlib.sha256(f"{request.method}:{request.path}:{key}".encode()).hexdigest()
+            cache_key = f"idempotency:{user_id}:{digest}"
+            lock_key = f"{cache_key}:lock"
+            fingerprint = hashlib.sha256(
+                json.dumps(request.data, sort_keys=True, default=str).encode()
+            ).hexdigest()
+            
+            stored = cache.get(cache_key)
+            if stored is None:
+                if not cache.add(lock_key, fingerprint, lock_timeout):
+                    # Otra petición con la misma clave se está ejecutando
+                    stored = cache.get(cache_key)
+                    if stored is None:
+                        return Response(
+                            {'error': 'A request with this Idempotency-Key is already in progress'},
+                            status=409, headers={'Retry-After': '1'}
+                        )
+                else:
+                    try:
+                        # La petición que tenía el lock pudo terminar entre la lectura de arriba y el
+                        # add(): con el lock tomado se vuelve a leer antes de ejecutar la vista
+                        stored = cache.get(cache_key)
+                        if stored is None:
+                            response = view_method(self, request, *args, **kwargs)
+                            if response.status_code < 500 and hasattr(response, 'data'):
+                                cache.set(cache_key, {
+                                    'fingerprint': fingerprint,
+                                    'status': response.status_code,
+                                    'data': response.data,
+                                }, getattr(settings, 'IDEMPOTENCY_KEY_TTL', 86400))
+                            return response
+                    finally:
+                        cache.delete(lock_key)
+            
+            if stored['fingerprint'] != fingerprint:
+                logger.warning(f"Idempotency-Key reused with a different payload by user {request.user}")
+                return Response({'error': 'Idempotency-Key already used with a different request body'}, status=422)
+            
+            return Response(stored['data'], status=stored['status'], headers={'Idempotent-Replayed': 'true'})
+        
+        return _wrapped_view
+    return decorator
+
+
 def _validate_value(value, rules):
     """
     Validar un valor según las reglas especificadas
@@ -0,0 +1,173 @@
+"""
+Estadísticas pre-agregadas para los paneles de administración.
+
+Los contadores globales (ContadorEstadistica) y las ventas por día y categoría
+(VentaDiaria) se actualizan de forma incremental desde core/signals.py dentro de
+la misma transacción que modifica los datos. El panel lee solo estas filas, sin
+COUNT(*) sobre tablas completas. `recalcular` reconstruye todo en bloque para
+corregir desvíos o tras cargas masivas que no emiten señales (bulk_create).
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import transaction, IntegrityError
+from django.db.models import Count, Sum, F, Q, DecimalField, ExpressionWrapper
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import ItemPedido, ContadorEstadistica, VentaDiaria
+
+USUARIOS = 'usuarios'
+LIBROS = 'libros'
+CARRITOS = 'carritos'
+PEDIDOS = 'pedidos'
+INGRESOS = 'ingresos'
+CLAVES = (USUARIOS, LIBROS, CARRITOS, PEDIDOS, INGRESOS)
+
+
+def _upsert(manager, filtros, valores):
+    """UPDATE con F() y, si la fila no existe, INSERT tolerante a carreras"""
+    cambios = {campo: F(campo) + delta for campo, delta in valores.items()}
+    if manager.filter(**filtros).update(**cambios):
+        return
+    try:
+        with transaction.atomic():
+            manager.create(**filtros, **valores)
+    except IntegrityError:
+        manager.filter(**filtros).update(**cambios)
+
+
+def incrementar(clave, delta=1):
+    _upsert(ContadorEstadistica.objects, {'clave': clave}, {'valor': Decimal(str(delta))})
+
+
+def valor(clave):
+    fila = ContadorEstadistica.objects.filter(clave=clave).values_list('valor', flat=True).first()
+    return fila if fila is not None else Decimal('0')
+
+
+def registrar_venta(fecha, categoria_id=None, pedidos=0, unidades=0, ingresos=Decimal('0')):
+    _upsert(
+        VentaDiaria.objects,
+        {'fecha': fecha, 'categoria_id': categoria_id},
+        {'pedidos': pedidos, 'unidades': unidades, 'ingresos': Decimal(str(ingresos))},
+    )
+
+
+def registrar_items(pedido_id, signo):
+    """Suma (signo=1) o resta (signo=-1) los items de un pedido a las ventas por categoría"""
+    items = ItemPedido.objects.filter(pedido_id=pedido_id).values(
+        'cantidad', 'precio_unitario', 'libro__categoria_id', 'pedido__fecha'
+    )
+    for item in items:
+        if item['libro__categoria_id'] is None:
+            continue
+        registrar_venta(
+            timezone.localdate(item['pedido__fecha']),
+            item['libro__categoria_id'],
+            unidades=signo * item['cantidad'],
+            ingresos=signo * item['cantidad'] * item['precio_unitario'],
+        )
+
+
+def resumen_dashboard(dias=30):
+    """Contadores globales y ventas de los últimos `dias` días leyendo filas pre-agregadas"""
+    contadores = dict.fromkeys(CLAVES, Decimal('0'))
+    contadores.update(ContadorEstadistica.objects.filter(clave__in=CLAVES).values_list('clave', 'valor'))
+
+    desde = timezone.localdate() - timedelta(days=dias - 1)
+    ventas_por_dia = list(
+        VentaDiaria.objects.filter(fecha__gte=desde, categoria__isnull=True)
+        .order_by('fecha').values('fecha', 'pedidos', 'ingresos')
+    )
+    ventas_por_categoria = list(
+        VentaDiaria.objects.filter(fecha__gte=desde, categoria__isnull=False)
+        .values('categoria_id', 'categoria__nombre')
+        .annotate(unidades=Sum('unidades'), ingresos=Sum('ingresos'))
+        .order_by('-ingresos')
+    )
+    return {
+        'total_usuarios': int(contadores[USUARIOS]),
+        'total_libros': int(contadores[LIBROS]),
+        'total_carritos': int(contadores[CARRITOS]),
+        'total_pedidos': int(contadores[PEDIDOS]),
+        'ingresos_totales': contadores[INGRESOS],
+        'ventas_por_dia': ventas_por_dia,
+        'ventas_por_categoria': ventas_por_categoria,
+    }
+
+
+def recalcular(dias=None, batch_size=1000, apps=None):
+    """
+    Recalcula las estadísticas desde las tablas de origen.
+
+    Con `dias` solo se reconstruyen las ventas de los últimos días locales completos (hoy
+    incluido, rollup periódico); sin él se reconstruye todo el histórico. Los contadores
+    globales siempre se recalculan. `apps` permite usarla desde una migración con los
+    modelos históricos.
+    """
+    if apps is None:
+        from django.apps import apps
+    User, Libro, Carrito, Pedido, ItemPedido, ContadorEstadistica, VentaDiaria = (
+        apps.get_model(*nombre.split('.')) for nombre in (
+            'auth.User', 'core.Libro', 'core.Carrito', 'core.Pedido', 'core.ItemPedido',
+            'core.ContadorEstadistica', 'core.VentaDiaria',
+        )
+    )
+    no_cancelado = ~Q(estado='CANCELADO')
+    pedidos = Pedido.objects.all()
+    items = ItemPedido.objects.filter(pedido__in=Pedido.objects.filter(no_cancelado))
+    ventas = VentaDiaria.objects.all()
+    if dias is not None:
+        # Desde el inicio del primer día: se borran y se reconstruyen los mismos días completos
+        primer_dia = timezone.localdate() - timedelta(days=dias - 1)
+        desde = timezone.make_aware(datetime.combine(primer_dia, time.min))
+        pedidos = pedidos.filter(fecha__gte=desde)
+        items = items.filter(pedido__fecha__gte=desde)
+        ventas = ventas.filter(fecha__gte=primer_dia)
+
+    totales_dia = (
+        pedidos.annotate(dia=TruncDate('fecha')).values('dia')
+        .annotate(n=Count('id'), ingresos=Sum('total', filter=no_cancelado))
+        .order_by()
+    )
+    subtotal = ExpressionWrapper(F('cantidad') * F('precio_unitario'), output_field=DecimalField())
+    por_categoria = (
+        items.annotate(dia=TruncDate('pedido__fecha')).values('dia', 'libro__categoria_id')
+        .annotate(unidades=Sum('cantidad'), ingresos=Sum(subtotal))
+        .order_by()
+    )
+
+    with transaction.atomic():
+        # Las señales suman con UPDATE ... F() sobre estas filas: bloquearlas antes de contar
+        # hace que un incremento concurrente espere al final o quede incluido en el conteo,
+        # en lugar de perderse al reemplazar las filas
+        list(ContadorEstadistica.objects.select_for_update().filter(clave__in=CLAVES).values_list('pk'))
+        list(ventas.select_for_update().values_list('pk'))
+
+        filas = [
+            VentaDiaria(fecha=fila['dia'], pedidos=fila['n'], ingresos=fila['ingresos'] or 0)
+            for fila in totales_dia.iterator(chunk_size=batch_size)
+        ]
+        filas += [
+            VentaDiaria(fecha=fila['dia'], categoria_id=fila['libro__categoria_id'],
+                        unidades=fila['unidades'], ingresos=fila['ingresos'] or 0)
+            for fila in por_categoria.iterator(chunk_size=batch_size)
+            if fila['libro__categoria_id'] is not None
+        ]
+        agregados = Pedido.objects.aggregate(ingresos=Sum('total', filter=no_cancelado))
+        contadores = {
+            USUARIOS: User.objects.count(),
+            LIBROS: Libro.objects.count(),
+            CARRITOS: Carrito.objects.count(),
+            PEDIDOS: Pedido.objects.count(),
+            INGRESOS: agregados['ingresos'] or 0,
+        }
+
+        ventas.delete()
+        VentaDiaria.objects.bulk_create(filas, batch_size=batch_size)
+        ContadorEstadistica.objects.filter(clave__in=CLAVES).delete()
+        ContadorEstadistica.objects.bulk_create(
+            [ContadorEstadistica(clave=clave, valor=valor) for clave, valor in contadores.items()]
+        )
+    return {'ventas_diarias': len(filas), **contadores}
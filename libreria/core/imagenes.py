@@ -0,0 +1,245 @@
+"""
+Derivados responsive de Libro.imagen.
+
+Al guardar un libro con una imagen nueva (señal en core/signals.py) se programa, tras el
+commit, la generación de varias anchuras (IMAGEN_ANCHOS) en WebP y JPEG en un pool de
+hilos acotado, fuera de la petición. Los derivados se guardan junto al original con el
+storage configurado (disco local o GCS) y sus nombres quedan en `Libro.imagen_variantes`,
+que las plantillas y LibroSerializer usan para construir el `srcset`.
+
+Las portadas subidas por la API (core/uploads.py) también se procesan aquí: el archivo
+temporal se verifica y se re-codifica con Pillow, se sube al storage y se actualiza el
+libro (`imagen`, `imagen_estado`) cuando termina el trabajo.
+"""
+import io
+import logging
+import os
+import tempfile
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.move import file_move_safe
+from django.db import close_old_connections, transaction
+
+from .models import Libro
+
+logger = logging.getLogger('security')
+
+FORMATOS = {
+    'webp': ('WEBP', 'webp'),
+    'jpeg': ('JPEG', 'jpg'),
+}
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def anchos():
+    return sorted(getattr(settings, 'IMAGEN_ANCHOS', (160, 320, 640, 960)))
+
+
+def pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'IMAGEN_WORKERS', 2),
+                    thread_name_prefix='imagenes',
+                )
+    return _pool
+
+
+def _nombre_variante(origen, ancho, extension):
+    base, _ = os.path.splitext(origen)
+    directorio, archivo = os.path.split(base)
+    return f'{directorio}/variantes/{archivo}-{ancho}.{extension}'
+
+
+def _variantes_existentes(storage, origen):
+    """Derivados ya presentes en el storage para `origen`, o None si falta algún formato"""
+    variantes = {'origen': origen}
+    for formato, (_, extension) in FORMATOS.items():
+        variantes[formato] = {}
+        for ancho in anchos():
+            nombre = _nombre_variante(origen, ancho, extension)
+            if storage.exists(nombre):
+                variantes[formato][str(ancho)] = nombre
+        if not variantes[formato]:
+            return None
+    return variantes
+
+
+def _eliminar(storage, variantes):
+    for formato in FORMATOS:
+        for nombre in variantes.get(formato, {}).values():
+            try:
+                storage.delete(nombre)
+            except Exception as e:
+                logger.warning(f"Could not delete image derivative {nombre}: {str(e)}")
+
+
+def generar_variantes(libro_id, forzar=False):
+    """
+    Genera los derivados de la imagen actual del libro.
+
+    Devuelve True si se generaron. Si la imagen cambió mientras se procesaba, el
+    resultado se descarta: el UPDATE solo se aplica si `imagen` sigue siendo la misma.
+    Los derivados que ya existen en el storage se reutilizan salvo con `forzar`
+    (un save() con `imagen_variantes` desactualizado en memoria no re-procesa nada).
+    """
+    libro = Libro.objects.filter(pk=libro_id).only('id', 'imagen', 'imagen_variantes').first()
+    if libro is None or not libro.imagen:
+        return False
+    origen = libro.imagen.name
+    storage = libro.imagen.storage
+    calidad = getattr(settings, 'IMAGEN_CALIDAD', 80)
+
+    existentes = _variantes_existentes(storage, origen)
+    if existentes and not forzar:
+        return Libro.objects.filter(pk=libro_id, imagen=origen).update(imagen_variantes=existentes) == 1
+
+    # Pillow se importa al procesar la primera imagen, no al arrancar cada worker
+    from PIL import Image, ImageOps
+
+    with libro.imagen.open('rb') as archivo:
+        imagen = ImageOps.exif_transpose(Image.open(archivo))
+        imagen.load()
+    if imagen.mode not in ('RGB', 'L'):
+        imagen = imagen.convert('RGB')
+
+    # Nunca ampliar: anchuras mayores que el original se omiten (siempre queda la menor)
+    objetivo = [a for a in anchos() if a <= imagen.width] or [min(imagen.width, anchos()[0])]
+    variantes = {'origen': origen}
+    for formato, (formato_pil, extension) in FORMATOS.items():
+        variantes[formato] = {}
+        for ancho in objetivo:
+            alto = max(round(imagen.height * ancho / imagen.width), 1)
+            derivado = imagen.resize((ancho, alto), Image.Resampling.LANCZOS)
+            buffer = io.BytesIO()
+            derivado.save(buffer, formato_pil, quality=calidad, optimize=True)
+            nombre = _nombre_variante(origen, ancho, extension)
+            if storage.exists(nombre):
+                storage.delete(nombre)
+            variantes[formato][str(ancho)] = storage.save(nombre, ContentFile(buffer.getvalue()))
+
+    if not Libro.objects.filter(pk=libro_id, imagen=origen).update(imagen_variantes=variantes):
+        _eliminar(storage, variantes)
+        return False
+    previas = libro.imagen_variantes or {}
+    if previas.get('origen') not in (None, origen):
+        _eliminar(storage, previas)
+    return True
+
+
+def _generar_en_segundo_plano(libro_id):
+    try:
+        generar_variantes(libro_id)
+    except Exception as e:
+        logger.error(f"Error generating image derivatives for book {libro_id}: {str(e)}")
+    finally:
+        close_old_connections()
+
+
+def programar_variantes(libro_id):
+    """Encolar la generación en el pool una vez confirmada la transacción actual"""
+    transaction.on_commit(lambda: pool().submit(_generar_en_segundo_plano, libro_id))
+
+
+def descartar_variantes(libro):
+    """Olvidar y borrar (en segundo plano) los derivados de un libro que ya no tiene imagen"""
+    variantes = libro.imagen_variantes or {}
+    Libro.objects.filter(pk=libro.pk).update(imagen_variantes={})
+    storage = Libro._meta.get_field('imagen').storage
+    transaction.on_commit(lambda: pool().submit(_eliminar, storage, variantes))
+
+
+# Portadas subidas por la API
+
+def _directorio_subidas():
+    directorio = os.path.join(settings.FILE_UPLOAD_TEMP_DIR or tempfile.gettempdir(), 'libreria-subidas')
+    os.makedirs(directorio, exist_ok=True)
+    return directorio
+
+
+def retener_subida(archivo):
+    """
+    Mueve el archivo subido fuera del ciclo de vida de la petición.
+
+    Devuelve (token, ruta). Con TemporaryUploadedFile es un rename, sin copiar bytes.
+    """
+    token = uuid.uuid4().hex
+    ruta = os.path.join(_directorio_subidas(), token + os.path.splitext(archivo.name)[1].lower())
+    if hasattr(archivo, 'temporary_file_path'):
+        file_move_safe(archivo.temporary_file_path(), ruta)
+    else:
+        with open(ruta, 'wb') as destino:
+            for chunk in archivo.chunks():
+                destino.write(chunk)
+    return token, ruta
+
+
+def procesar_subida(libro_id, token, ruta, nombre):
+    """
+    Verifica, re-codifica y guarda la portada subida; luego genera sus derivados.
+
+    Solo se aplica si el libro sigue esperando esta subida (`imagen_subida == token`):
+    una subida posterior del mismo libro deja obsoleta a la anterior.
+    """
+    from PIL import Image, ImageOps
+
+    pendiente = Libro.objects.filter(pk=libro_id, imagen_subida=token)
+    try:
+        with Image.open(ruta) as imagen:
+            imagen.verify()
+        with Image.open(ruta) as imagen:
+            if imagen.width * imagen.height > getattr(settings, 'LIBRO_IMAGEN_MAX_PIXELS', 40_000_000):
+                raise ValueError(f'image too large ({imagen.width}x{imagen.height})')
+            imagen = ImageOps.exif_transpose(imagen)
+            # Re-codificar descarta metadatos y cualquier contenido ajeno a la imagen
+            transparente = imagen.mode in ('RGBA', 'LA') or (imagen.mode == 'P' and 'transparency' in imagen.info)
+            buffer = io.BytesIO()
+            if transparente:
+                imagen.convert('RGBA').save(buffer, 'PNG', optimize=True)
+                extension = '.png'
+            else:
+                imagen.convert('RGB').save(buffer, 'JPEG', quality=90, optimize=True)
+                extension = '.jpg'
+
+        campo = Libro._meta.get_field('imagen')
+        base = os.path.splitext(os.path.basename(nombre))[0] or 'portada'
+        guardado = campo.storage.save(campo.generate_filename(None, base + extension), ContentFile(buffer.getvalue()))
+        if not pendiente.update(imagen=guardado, imagen_estado='LISTA', imagen_subida=''):
+            campo.storage.delete(guardado)
+            return False
+        generar_variantes(libro_id)
+        return True
+    except Exception as e:
+        logger.error(f"Error processing uploaded image for book {libro_id}: {str(e)}")
+        pendiente.update(imagen_estado='ERROR', imagen_subida='')
+        return False
+    finally:
+        try:
+            os.remove(ruta)
+        except FileNotFoundError:
+            pass
+
+
+def _procesar_subida_en_segundo_plano(*args):
+    try:
+        procesar_subida(*args)
+    finally:
+        close_old_connections()
+
+
+def programar_subida(libro, archivo):
+    """Retiene el archivo subido, marca el libro como pendiente y encola el procesamiento"""
+    token, ruta = retener_subida(archivo)
+    Libro.objects.filter(pk=libro.pk).update(imagen_estado='PENDIENTE', imagen_subida=token)
+    libro.imagen_estado, libro.imagen_subida = 'PENDIENTE', token
+    transaction.on_commit(
+        lambda: pool().submit(_procesar_subida_en_segundo_plano, libro.pk, token, ruta, archivo.name)
+    )
@@ -0,0 +1,206 @@
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestFilesMixin, staticfiles_storage
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core.management.commands.benchmark_endpoints import percentil
+from core.models import Carrito, Libro
+
+# (nombre, ruta, peso). Solo las vistas con implementación en core/async_views.py
+RUTAS = [
+    ('home', '/', 2),
+    ('tienda', '/tienda/', 2),
+    ('libro_detail', '/libros/{libro}/', 3),
+    ('api_books_list', '/api/books/', 3),
+    ('api_book_detail', '/api/books/{libro}/', 3),
+    ('api_cart', '/api/cart/', 2),
+]
+
+
+def puerto_libre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class Command(BaseCommand):
+    help = ('Compare gunicorn sync workers (WSGI views) with uvicorn workers (ASYNC_VIEWS=True) on the '
+            'read-heavy pages and API endpoints, using the current database')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000, help='Requests per server')
+        parser.add_argument('--concurrency', type=int, default=100, help='Concurrent client connections')
+        parser.add_argument('--workers', type=int, default=2, help='Worker processes for each server')
+        parser.add_argument('--client-delay-ms', type=float, default=20,
+                            help='Pause between the request line and the headers (simulates slow clients)')
+        parser.add_argument('--server', action='append', dest='servers', choices=['gunicorn', 'uvicorn'],
+                            help='Server to measure (repeatable); defaults to both')
+        parser.add_argument('--startup-timeout', type=float, default=30)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--output', help='Write the JSON report to this file')
+
+    def handle(self, *args, **options):
+        if isinstance(staticfiles_storage, ManifestFilesMixin) and \
+                not staticfiles_storage.exists(staticfiles_storage.manifest_name):
+            raise CommandError('No static manifest found: run collectstatic before benchmarking the pages')
+        libros = list(Libro.objects.order_by('-id').values_list('id', flat=True)[:500])
+        if not libros:
+            raise CommandError('No books in the database: seed it first with manage.py generate_catalog')
+
+        headers_cart = None
+        carrito = Carrito.objects.select_related('usuario').first()
+        if carrito is not None:
+            headers_cart = {'Authorization': f'Bearer {AccessToken.for_user(carrito.usuario)}'}
+        else:
+            self.stdout.write(self.style.WARNING('No carts in the database: api_cart skipped'))
+
+        rng = random.Random(options['seed'])
+        rutas = [r for r in RUTAS if r[0] != 'api_cart' or headers_cart]
+        plan = []
+        for nombre, ruta, _ in rng.choices(rutas, weights=[r[2] for r in rutas], k=options['requests']):
+            headers = {'X-Forwarded-For': f'10.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(1, 255)}'}
+            if nombre == 'api_cart':
+                headers.update(headers_cart)
+            plan.append((nombre, ruta.format(libro=rng.choice(libros)), headers))
+
+        informe = {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'config': {clave: options[clave] for clave in ('requests', 'concurrency', 'workers', 'client_delay_ms', 'seed')},
+            'database': settings.DATABASES['default']['ENGINE'].rsplit('.', 1)[-1],
+            'servers': {},
+        }
+        for servidor in options['servers'] or ['gunicorn', 'uvicorn']:
+            port = puerto_libre()
+            proceso = self.arrancar(servidor, port, options)
+            try:
+                self.esperar(proceso, port, options['startup_timeout'])
+                self.stdout.write(f'{servidor}: {len(plan)} requests, concurrency {options["concurrency"]}, '
+                                  f'{options["workers"]} workers')
+                resultados, duracion = asyncio.run(self.ejecutar(port, plan, options))
+            finally:
+                proceso.terminate()
+                try:
+                    proceso.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    proceso.kill()
+            informe['servers'][servidor] = self.resumen(resultados, duracion)
+            self.imprimir(servidor, informe['servers'][servidor])
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(informe, f, indent=2)
+            self.stdout.write(f'Report written to {options["output"]}')
+
+    # Servidores
+
+    def arrancar(self, servidor, port, options):
+        env = {
+            **os.environ,
+            'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'libreria.settings'),
+            'ALLOWED_HOSTS': ','.join({*settings.ALLOWED_HOSTS, '127.0.0.1'}),
+            'SECURE_SSL_REDIRECT': 'False',
+            'RATELIMIT_ENABLE': 'False',
+            'ASYNC_VIEWS': str(servidor == 'uvicorn'),
+        }
+        if servidor == 'gunicorn':
+            comando = [sys.executable, '-m', 'gunicorn', 'libreria.wsgi:application', '--worker-class', 'sync',
+                       '--workers', str(options['workers']), '--bind', f'127.0.0.1:{port}']
+        else:
+            comando = [sys.executable, '-m', 'uvicorn', 'libreria.asgi:application', '--workers',
+                       str(options['workers']), '--host', '127.0.0.1', '--port', str(port), '--no-access-log']
+        salida = None if options['verbosity'] >= 2 else subprocess.DEVNULL
+        return subprocess.Popen(comando, cwd=settings.BASE_DIR, env=env, stdout=salida, stderr=salida)
+
+    def esperar(self, proceso, port, timeout):
+        limite = time.monotonic() + timeout
+        while time.monotonic() < limite:
+            if proceso.poll() is not None:
+                raise CommandError(f'Server exited with code {proceso.returncode} (use -v 2 to see its output)')
+            try:
+                status = asyncio.run(self.peticion(port, '/api/books/', {}, 0))
+            except OSError:
+                status = None
+            if status == 200:
+                return
+            time.sleep(0.2)
+        raise CommandError(f'Server on port {port} not ready after {timeout}s')
+
+    # Clientes
+
+    async def ejecutar(self, port, plan, options):
+        resultados = []
+        pendientes = iter(plan)
+        retardo = options['client_delay_ms'] / 1000
+
+        async def cliente():
+            for nombre, ruta, headers in pendientes:
+                inicio = time.perf_counter()
+                try:
+                    status = await self.peticion(port, ruta, headers, retardo)
+                except (OSError, ValueError, IndexError):
+                    status = 0
+                resultados.append((nombre, status, time.perf_counter() - inicio))
+
+        inicio = time.perf_counter()
+        await asyncio.gather(*(cliente() for _ in range(options['concurrency'])))
+        return resultados, time.perf_counter() - inicio
+
+    async def peticion(self, port, ruta, headers, retardo):
+        """GET con Connection: close; las cabeceras llegan `retardo` segundos después de la línea de petición"""
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        try:
+            writer.write(f'GET {ruta} HTTP/1.1\r\n'.encode('latin-1'))
+            await writer.drain()
+            if retardo:
+                await asyncio.sleep(retardo)
+            lineas = ['Host: 127.0.0.1', 'Connection: close', 'Accept-Encoding: identity']
+            lineas += [f'{nombre}: {valor}' for nombre, valor in headers.items()]
+            writer.write(('\r\n'.join(lineas) + '\r\n\r\n').encode('latin-1'))
+            await writer.drain()
+            datos = await reader.read()
+        finally:
+            writer.close()
+            await writer.wait_closed()
+        return int(datos.split(b'\r\n', 1)[0].split(b' ', 2)[1])
+
+    # Informe
+
+    def resumen(self, resultados, duracion):
+        por_endpoint = defaultdict(list)
+        for nombre, status, segundos in resultados:
+            por_endpoint[nombre].append((status, segundos * 1000))
+
+        def estadisticas(filas):
+            latencias = sorted(ms for _, ms in filas)
+            return {
+                'requests': len(filas),
+                'errors': sum(1 for status, _ in filas if not 200 <= status < 400),
+                'p50_ms': round(percentil(latencias, 50), 3),
+                'p95_ms': round(percentil(latencias, 95), 3),
+                'p99_ms': round(percentil(latencias, 99), 3),
+            }
+
+        return {
+            'duration_s': round(duracion, 3),
+            'throughput_rps': round(len(resultados) / duracion, 2) if duracion else None,
+            **estadisticas([(status, segundos * 1000) for _, status, segundos in resultados]),
+            'endpoints': {nombre: estadisticas(filas) for nombre, filas in sorted(por_endpoint.items())},
+        }
+
+    def imprimir(self, servidor, r):
+        for nombre, e in r['endpoints'].items():
+            linea = (f"  {nombre:18} {e['requests']:>6} reqs {e['errors']:>4} err  p50 {e['p50_ms']:>8.2f} ms  "
+                     f"p95 {e['p95_ms']:>8.2f} ms  p99 {e['p99_ms']:>8.2f} ms")
+            self.stdout.write(self.style.WARNING(linea) if e['errors'] else linea)
+        self.stdout.write(f"{servidor}: {r['throughput_rps'] or 0:,.1f} req/s, p50 {r['p50_ms']} ms, "
+                          f"p95 {r['p95_ms']} ms, p99 {r['p99_ms']} ms, {r['errors']} errors")
@@ -0,0 +1,145 @@
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+
+from core.cache import SQLiteCache
+from core.management.commands.benchmark_endpoints import percentil
+
+BACKENDS = {
+    'locmem': lambda directorio: LocMemCache('benchmark-cache', {'OPTIONS': {'MAX_ENTRIES': 100000}}),
+    'filebased': lambda directorio: FileBasedCache(os.path.join(directorio, 'files'),
+                                                   {'OPTIONS': {'MAX_ENTRIES': 100000}}),
+    'sqlite': lambda directorio: SQLiteCache(os.path.join(directorio, 'cache.sqlite3'),
+                                             {'OPTIONS': {'MAX_ENTRIES': 100000}}),
+}
+# Proporción de cada operación en la mezcla (como el rate limiter: lecturas, escrituras y contadores)
+MEZCLA = [('get', 70), ('set', 20), ('incr', 10)]
+CONTADORES = 16
+
+
+def _trabajador(nombre, directorio, options, seed, cola):
+    cache = BACKENDS[nombre](directorio)
+    for i in range(CONTADORES):
+        # Solo crea los que falten: en los backends compartidos ya existen
+        cache.add(f'contador:{i}', 0, None)
+    latencias = defaultdict(list)
+    incrementos = [0]
+    cerrojo = threading.Lock()
+    valor = os.urandom(options['value_size'])
+
+    def hilo(seed_hilo):
+        rng = random.Random(seed_hilo)
+        operaciones = rng.choices([op for op, _ in MEZCLA], weights=[peso for _, peso in MEZCLA],
+                                  k=options['operations'] // options['threads'])
+        propias = defaultdict(list)
+        hechos = 0
+        for op in operaciones:
+            clave = f'clave:{rng.randrange(options["keys"])}'
+            inicio = time.perf_counter()
+            if op == 'get':
+                cache.get(clave)
+            elif op == 'set':
+                cache.set(clave, valor, 300)
+            else:
+                cache.incr(f'contador:{rng.randrange(CONTADORES)}')
+                hechos += 1
+            propias[op].append(time.perf_counter() - inicio)
+        with cerrojo:
+            for op, valores in propias.items():
+                latencias[op].extend(valores)
+            incrementos[0] += hechos
+
+    hilos = [threading.Thread(target=hilo, args=(seed * 100 + i,)) for i in range(options['threads'])]
+    inicio = time.perf_counter()
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    cola.put((dict(latencias), incrementos[0], time.perf_counter() - inicio))
+
+
+class Command(BaseCommand):
+    help = ('Compare LocMemCache, FileBasedCache and core.cache.SQLiteCache with several processes and '
+            'threads: throughput, latency per operation and increments lost across processes')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=4)
+        parser.add_argument('--threads', type=int, default=2, help='Threads per process')
+        parser.add_argument('--operations', type=int, default=5000, help='Operations per process')
+        parser.add_argument('--keys', type=int, default=1000)
+        parser.add_argument('--value-size', type=int, default=512, help='Bytes per cached value')
+        parser.add_argument('--backend', action='append', dest='backends', choices=list(BACKENDS),
+                            help='Backend to measure (repeatable); defaults to all')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Write the JSON report to this file')
+
+    def handle(self, *args, **options):
+        contexto = multiprocessing.get_context('fork')
+        informe = {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'config': {clave: options[clave] for clave in
+                       ('processes', 'threads', 'operations', 'keys', 'value_size', 'seed')},
+            'backends': {},
+        }
+        for nombre in options['backends'] or list(BACKENDS):
+            directorio = tempfile.mkdtemp(prefix='benchmark_cache_')
+            try:
+                cola = contexto.Queue()
+                procesos = [contexto.Process(target=_trabajador, args=(nombre, directorio, options,
+                                                                       options['seed'] + i, cola))
+                            for i in range(options['processes'])]
+                inicio = time.perf_counter()
+                for proceso in procesos:
+                    proceso.start()
+                resultados = [cola.get() for _ in procesos]
+                duracion = time.perf_counter() - inicio
+                for proceso in procesos:
+                    proceso.join()
+
+                # Lo que ve un proceso nuevo: en LocMemCache nada, en los compartidos la suma de todos
+                cache = BACKENDS[nombre](directorio)
+                observados = sum(cache.get(f'contador:{i}') or 0 for i in range(CONTADORES))
+            finally:
+                shutil.rmtree(directorio, ignore_errors=True)
+
+            latencias = defaultdict(list)
+            for propias, _, _ in resultados:
+                for op, valores in propias.items():
+                    latencias[op].extend(valores)
+            total_ops = sum(len(valores) for valores in latencias.values())
+            incrementos = sum(r[1] for r in resultados)
+            informe['backends'][nombre] = r = {
+                'duration_s': round(duracion, 3),
+                'ops_per_s': round(total_ops / duracion, 1),
+                'increments': incrementos,
+                'increments_seen': observados,
+                'increments_lost': incrementos - observados,
+                'operations': {
+                    op: {
+                        'count': len(valores),
+                        'p50_us': round(percentil(sorted(valores), 50) * 1e6, 1),
+                        'p99_us': round(percentil(sorted(valores), 99) * 1e6, 1),
+                    }
+                    for op, valores in sorted(latencias.items())
+                },
+            }
+            ops = '  '.join(f"{op} p50 {e['p50_us']:>7.1f} us p99 {e['p99_us']:>8.1f} us"
+                            for op, e in r['operations'].items())
+            linea = (f"{nombre:10} {r['ops_per_s']:>10,.0f} ops/s  {ops}  "
+                     f"incr seen {observados}/{incrementos}")
+            self.stdout.write(self.style.WARNING(linea) if r['increments_lost'] else linea)
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(informe, f, indent=2)
+            self.stdout.write(f'Report written to {options["output"]}')
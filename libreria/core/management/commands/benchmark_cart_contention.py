@@ -0,0 +1,180 @@
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import date
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection, transaction
+
+from core import reservas
+from core.api_views import carritos_con_items
+from core.management.commands.benchmark_endpoints import percentil
+from core.models import Carrito, Libro
+
+# Perfiles SQLite comparados: el modo por defecto (rollback journal, transacciones DEFERRED,
+# 5 s de espera) y el de settings.SQLITE_OPTIONS
+PERFILES_SQLITE = {
+    'rollback-journal': {'init_command': 'PRAGMA journal_mode=DELETE'},
+    'tuned': settings.SQLITE_OPTIONS,
+}
+
+
+class Command(BaseCommand):
+    help = ('Measure concurrent cart writes (the AddToCartView transaction) and cart reads on a fresh test '
+            'database; on SQLite compares the default rollback journal with the tuned WAL profile')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=8, help='Threads adding to their own carts')
+        parser.add_argument('--readers', type=int, default=4, help='Threads reading carts meanwhile')
+        parser.add_argument('--adds', type=int, default=200, help='Cart adds per writer')
+        parser.add_argument('--books', type=int, default=20, help='Books shared by all writers (hot rows)')
+        parser.add_argument('--profile', action='append', dest='profiles', choices=list(PERFILES_SQLITE),
+                            help='SQLite profile to measure (repeatable); defaults to all')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Write the JSON report to this file')
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'sqlite':
+            perfiles = {nombre: PERFILES_SQLITE[nombre] for nombre in options['profiles'] or PERFILES_SQLITE}
+        elif options['profiles']:
+            raise CommandError('--profile only applies to SQLite databases')
+        else:
+            perfiles = {connection.vendor: connection.settings_dict.get('OPTIONS', {})}
+
+        informe = {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'config': {clave: options[clave] for clave in ('writers', 'readers', 'adds', 'books', 'seed')},
+            'database': connection.vendor,
+            'profiles': {},
+        }
+        for nombre, opciones in perfiles.items():
+            informe['profiles'][nombre] = r = self.medir(opciones, options)
+            linea = (f"{nombre:18} writes {r['writes_per_s']:>8,.1f}/s  p50 {r['write_p50_ms']:>7.2f} ms  "
+                     f"p95 {r['write_p95_ms']:>7.2f} ms  p99 {r['write_p99_ms']:>8.2f} ms  "
+                     f"errors {r['write_errors']:>4}  |  reads {r['reads_per_s']:>8,.1f}/s  "
+                     f"p95 {r['read_p95_ms']} ms  errors {r['read_errors']}")
+            self.stdout.write(self.style.WARNING(linea) if r['write_errors'] or r['read_errors'] else linea)
+            for mensaje, veces in r['error_messages'].items():
+                self.stdout.write(f'  {veces} x {mensaje}')
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(informe, f, indent=2)
+            self.stdout.write(f'Report written to {options["output"]}')
+
+    def medir(self, opciones, options):
+        nombre_original = connection.settings_dict['NAME']
+        opciones_originales = connection.settings_dict.get('OPTIONS', {})
+        temporal = None
+        # Las opciones se leen al abrir cada conexión, también las de los hilos
+        connection.settings_dict['OPTIONS'] = dict(opciones)
+        connection.close()
+        if connection.vendor == 'sqlite':
+            # Una base en archivo por perfil: el modo WAL queda grabado en el archivo
+            temporal = tempfile.mkdtemp(prefix='benchmark_cart_contention_')
+            connection.settings_dict.setdefault('TEST', {})['NAME'] = os.path.join(temporal, 'bench.sqlite3')
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            libros, usuarios = self.sembrar(options)
+            return self.ejecutar(libros, usuarios, options)
+        finally:
+            connection.creation.destroy_test_db(nombre_original, verbosity=0)
+            connection.settings_dict['OPTIONS'] = opciones_originales
+            if temporal:
+                for nombre in os.listdir(temporal):
+                    os.remove(os.path.join(temporal, nombre))
+                os.rmdir(temporal)
+
+    def sembrar(self, options):
+        libros = Libro.objects.bulk_create([
+            Libro(titulo=f'Contención {i}', descripcion='Benchmark', precio=Decimal('10.00'), stock=10 ** 9,
+                  fecha_publicacion=date(2020, 1, 1))
+            for i in range(options['books'])
+        ])
+        usuarios = [User.objects.create(username=f'contencion_{i}') for i in range(options['writers'])]
+        return [libro.pk for libro in libros], usuarios
+
+    def ejecutar(self, libros, usuarios, options):
+        escrituras, lecturas = [], []
+        errores = Counter()
+        cerrojo = threading.Lock()
+        salida = threading.Barrier(len(usuarios) + options['readers'] + 1)
+        terminado = threading.Event()
+
+        def registrar(destino, inicio, error=None):
+            with cerrojo:
+                destino.append((time.perf_counter() - inicio, error is None))
+                if error is not None:
+                    errores[str(error)] += 1
+
+        def escritor(usuario, seed):
+            rng = random.Random(seed)
+            salida.wait()
+            try:
+                for _ in range(options['adds']):
+                    inicio = time.perf_counter()
+                    try:
+                        # Misma transacción que AddToCartView: lee el libro y el carrito y luego escribe
+                        with transaction.atomic():
+                            libro = Libro.objects.get(pk=rng.choice(libros))
+                            carrito, _ = Carrito.objects.get_or_create(usuario=usuario)
+                            reservas.reservar(carrito, libro, 1)
+                    except DatabaseError as e:
+                        registrar(escrituras, inicio, e)
+                    else:
+                        registrar(escrituras, inicio)
+            finally:
+                connection.close()
+
+        def lector(seed):
+            rng = random.Random(seed)
+            salida.wait()
+            try:
+                while not terminado.is_set():
+                    inicio = time.perf_counter()
+                    try:
+                        list(carritos_con_items().filter(usuario=rng.choice(usuarios)))
+                    except DatabaseError as e:
+                        registrar(lecturas, inicio, e)
+                    else:
+                        registrar(lecturas, inicio)
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=escritor, args=(usuario, options['seed'] + i))
+                 for i, usuario in enumerate(usuarios)]
+        lectores = [threading.Thread(target=lector, args=(options['seed'] - i - 1,)) for i in range(options['readers'])]
+        for hilo in hilos + lectores:
+            hilo.start()
+        salida.wait()
+        inicio = time.perf_counter()
+        for hilo in hilos:
+            hilo.join()
+        duracion = time.perf_counter() - inicio
+        terminado.set()
+        for hilo in lectores:
+            hilo.join()
+
+        def ms(filas, p):
+            latencias = sorted(segundos * 1000 for segundos, ok in filas if ok)
+            return round(percentil(latencias, p), 3) if latencias else None
+
+        return {
+            'duration_s': round(duracion, 3),
+            'writes_per_s': round(sum(ok for _, ok in escrituras) / duracion, 2),
+            'write_errors': sum(not ok for _, ok in escrituras),
+            'write_p50_ms': ms(escrituras, 50),
+            'write_p95_ms': ms(escrituras, 95),
+            'write_p99_ms': ms(escrituras, 99),
+            'reads_per_s': round(sum(ok for _, ok in lecturas) / duracion, 2),
+            'read_errors': sum(not ok for _, ok in lecturas),
+            'read_p95_ms': ms(lecturas, 95),
+            'error_messages': dict(errores.most_common(5)),
+        }
@@ -0,0 +1,55 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+
+from core.middleware import CompressionMiddleware
+from core.staticfiles import brotli
+
+
+class Command(BaseCommand):
+    help = 'Measure response sizes and compression throughput for API payloads'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=200)
+        parser.add_argument('--path', action='append', dest='paths',
+                            help='API path to measure (repeatable); defaults to the book list pages')
+
+    def handle(self, *args, **options):
+        paths = options['paths'] or ['/api/books/', '/api/books/?page=2']
+        usuario = User.objects.create(username=f'bench_compresion_{time.time_ns()}')
+        try:
+            client = Client()
+            client.force_login(usuario)
+            payloads = []
+            with override_settings(RATELIMIT_ENABLE=False):
+                for path in paths:
+                    response = client.get(path, HTTP_ACCEPT_ENCODING='identity', secure=True)
+                    if response.status_code == 200:
+                        payloads.append((path, response.content))
+                    else:
+                        self.stdout.write(self.style.WARNING(f'{path}: status {response.status_code}, skipped'))
+        finally:
+            usuario.delete()
+
+        middleware = CompressionMiddleware(lambda request: None)
+        encodings = ['gzip'] + (['br'] if brotli is not None else [])
+        for path, body in payloads:
+            self.stdout.write(f'{path}: {len(body):,} bytes uncompressed')
+            for encoding in encodings:
+                inicio = time.perf_counter()
+                for _ in range(options['iterations']):
+                    compressed = middleware.compress(body, encoding)
+                duracion = time.perf_counter() - inicio
+                ratio = len(compressed) / len(body) if body else 0
+                mb_s = len(body) * options['iterations'] / duracion / 1e6
+                self.stdout.write(f'  {encoding:<5} {len(compressed):>9,} bytes ({ratio:.1%}), '
+                                  f'{duracion / options["iterations"] * 1e3:.2f} ms/response, {mb_s:,.1f} MB/s')
+
+            chunks = [body[i:i + 8192] for i in range(0, len(body), 8192)]
+            for encoding in encodings:
+                streamed = b''.join(middleware.compress_stream(iter(chunks), encoding))
+                self.stdout.write(f'  {encoding:<5} streamed in {len(chunks)} chunks: {len(streamed):,} bytes')
+        if brotli is None:
+            self.stdout.write(self.style.WARNING('Brotli not installed: only gzip measured'))
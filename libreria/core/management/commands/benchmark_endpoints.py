@@ -0,0 +1,548 @@
+import asyncio
+import http.client
+import io
+import json
+import logging
+import math
+import os
+import random
+import string
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from decimal import Decimal
+from importlib import import_module
+from urllib.parse import quote
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.models import User
+from django.contrib.staticfiles.storage import ManifestFilesMixin, staticfiles_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+from django.test.utils import override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core import reservas
+from core.management.commands.generate_catalog import SUSTANTIVOS
+from core.models import (
+    Autor, Carrito, Categoria, Editorial, ItemPedido, Libro, Pedido, UserProfile,
+)
+
+PREFIX = 'bench_'
+PASSWORD = 'LoadTest123!'
+
+# (nombre, método, ruta, autenticación, peso). Los nombres son los de core/urls.py;
+# las variantes de una misma ruta llevan sufijo. Autenticación: None, 'jwt', 'jwt_admin',
+# 'jwt_moderator', 'session' o 'session_admin'.
+ESCENARIOS = [
+    # API
+    ('api_books_list', 'GET', '/api/books/', None, 20),
+    ('api_books_list:search', 'GET', '/api/books/?search={palabra}', None, 6),
+    ('api_books_list:categoria', 'GET', '/api/books/?categoria={categoria}', None, 4),
+    ('api_book_detail', 'GET', '/api/books/{libro}/', None, 15),
+    ('api_profile', 'GET', '/api/auth/profile/', 'jwt', 5),
+    ('api_cart', 'GET', '/api/cart/', 'jwt', 8),
+    ('api_cart_add', 'POST', '/api/cart/add/', 'jwt', 4),
+    ('api_cart_remove', 'DELETE', '/api/cart/remove/{item}/', 'jwt', 2),
+    ('api_orders_list', 'GET', '/api/orders/', 'jwt', 4),
+    ('api_orders_summary', 'GET', '/api/orders/summary/', 'jwt', 3),
+    ('api_order_detail', 'GET', '/api/orders/{pedido}/', 'jwt', 3),
+    ('api_login', 'POST', '/api/auth/login/', None, 1),
+    ('api_register', 'POST', '/api/auth/register/', None, 0.5),
+    ('api_book_create', 'POST', '/api/books/create/', 'jwt_moderator', 0.5),
+    ('api_book_update', 'PATCH', '/api/books/{libro}/update/', 'jwt_moderator', 0.5),
+    ('api_book_delete', 'DELETE', '/api/books/{libro_borrable}/delete/', 'jwt_moderator', 0.2),
+    ('api_admin_dashboard', 'GET', '/api/admin/dashboard/', 'jwt_admin', 0.5),
+    ('api_user_list', 'GET', '/api/admin/users/', 'jwt_admin', 0.5),
+    # Web
+    ('home', 'GET', '/', None, 6),
+    ('tienda', 'GET', '/tienda/', None, 6),
+    ('categorias', 'GET', '/categorias/', None, 2),
+    ('categoria_detalle', 'GET', '/categorias/{categoria}/', None, 2),
+    ('autores', 'GET', '/autores/', None, 2),
+    ('autor_detalle', 'GET', '/autores/{autor}/', None, 2),
+    ('editoriales', 'GET', '/editoriales/', None, 2),
+    ('editorial_detalle', 'GET', '/editoriales/{editorial}/', None, 2),
+    ('libro_detail', 'GET', '/libros/{libro}/', None, 6),
+    ('nosotros', 'GET', '/nosotros/', None, 0.5),
+    ('contacto', 'GET', '/contacto/', None, 0.5),
+    ('faq', 'GET', '/faq/', None, 0.5),
+    ('registro', 'GET', '/registro/', None, 0.5),
+    ('ver_carrito', 'GET', '/carrito/', 'session', 3),
+    ('agregar_al_carrito', 'POST', '/carrito/agregar/{libro}/', 'session', 1),
+    ('eliminar_item', 'GET', '/carrito/eliminar/{item}/', 'session', 0.5),
+    ('user_profile', 'GET', '/perfil/', 'session', 2),
+    ('admin_dashboard', 'GET', '/admin/dashboard/', 'session_admin', 0.5),
+]
+
+def percentil(ordenados, p):
+    """Percentil por rango más cercano sobre una lista ya ordenada"""
+    if not ordenados:
+        return None
+    return ordenados[max(math.ceil(p / 100 * len(ordenados)) - 1, 0)]
+
+
+class SilentRequestHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class QueryCountingApplication:
+    """Envuelve la aplicación WSGI y devuelve en X-Bench-Queries las consultas de cada petición"""
+
+    header = 'X-Bench-Queries'
+
+    def __init__(self, application):
+        self.application = application
+
+    def __call__(self, environ, start_response):
+        consultas = [0]
+
+        def contar(execute, sql, params, many, context):
+            consultas[0] += 1
+            return execute(sql, params, many, context)
+
+        def start(status, headers, exc_info=None):
+            headers.append((self.header, str(consultas[0])))
+            return start_response(status, headers, exc_info)
+
+        # La vista se ejecuta dentro de la llamada; las respuestas en streaming no leen la base
+        with connection.execute_wrapper(contar):
+            return self.application(environ, start)
+
+
+class Peticion:
+    __slots__ = ('nombre', 'metodo', 'ruta', 'headers', 'body')
+
+    def __init__(self, nombre, metodo, ruta, headers, body=b''):
+        self.nombre = nombre
+        self.metodo = metodo
+        self.ruta = ruta
+        self.headers = headers
+        self.body = body
+
+
+class Command(BaseCommand):
+    help = ('Load-test every route in core/urls.py against an in-process WSGI server and a '
+            'freshly seeded test database; reports p50/p95/p99 latency, throughput and queries per endpoint')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000, help='Measured requests (after warmup)')
+        parser.add_argument('--warmup', type=int, default=100, help='Requests sent before measuring')
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--client', choices=['threads', 'asyncio'], default='threads',
+                            help='Keep-alive clients on threads, or one asyncio task per concurrent connection')
+        parser.add_argument('--mix', choices=['all', 'api', 'web'], default='all')
+        parser.add_argument('--only', action='append', default=[], help='Endpoint name to include (repeatable)')
+        parser.add_argument('--exclude', action='append', default=[], help='Endpoint name to skip (repeatable)')
+        parser.add_argument('--weight', action='append', default=[], metavar='NAME=WEIGHT',
+                            help='Override the weight of an endpoint in the mix (repeatable)')
+        parser.add_argument('--books', type=int, default=2000)
+        parser.add_argument('--authors', type=int, default=300)
+        parser.add_argument('--categories', type=int, default=25)
+        parser.add_argument('--publishers', type=int, default=40)
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--orders-per-user', type=int, default=3)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='JSON results file (default: benchmarks/endpoints-<timestamp>.json)')
+        parser.add_argument('--compare', help='Previous JSON results to compare against')
+
+    def handle(self, *args, **options):
+        escenarios = self.escenarios(options)
+        if not escenarios:
+            raise CommandError('No endpoints left in the mix')
+        previo = None
+        if options['compare']:
+            with open(options['compare']) as f:
+                previo = json.load(f)
+
+        nombre_original = connection.settings_dict['NAME']
+        temporal = None
+        if connection.vendor == 'sqlite':
+            # Base en archivo: la base en memoria compartida serializa mal las escrituras de varios hilos
+            temporal = tempfile.mkdtemp(prefix='benchmark_endpoints_')
+            connection.settings_dict.setdefault('TEST', {})['NAME'] = os.path.join(temporal, 'bench.sqlite3')
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            inicio = time.perf_counter()
+            rng = random.Random(options['seed'])
+            datos = self.sembrar(options, rng)
+            self.stdout.write(f'Seeded {len(datos["libros"])} books and {len(datos["usuarios"])} customer accounts '
+                              f'in {time.perf_counter() - inicio:.1f}s ({connection.vendor})')
+
+            plan = self.planificar(escenarios, options['warmup'] + options['requests'], datos, rng)
+            # Los errores quedan en el informe por código de estado; el log de cada petición sobra
+            if options['verbosity'] < 2:
+                logging.disable(logging.CRITICAL)
+            with override_settings(**self.ajustes()):
+                resultados, duracion = self.ejecutar(plan, options)
+        finally:
+            logging.disable(logging.NOTSET)
+            connection.creation.destroy_test_db(nombre_original, verbosity=0)
+            if temporal:
+                for nombre in os.listdir(temporal):
+                    os.remove(os.path.join(temporal, nombre))
+                os.rmdir(temporal)
+
+        informe = self.informe(resultados[options['warmup']:], duracion, options)
+        self.imprimir(informe, previo)
+        salida = options['output'] or os.path.join(
+            'benchmarks', f'endpoints-{time.strftime("%Y%m%d-%H%M%S")}.json')
+        os.makedirs(os.path.dirname(salida) or '.', exist_ok=True)
+        with open(salida, 'w') as f:
+            json.dump(informe, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f'Results written to {salida}'))
+
+    def escenarios(self, options):
+        pesos = {}
+        for valor in options['weight']:
+            nombre, _, peso = valor.partition('=')
+            try:
+                pesos[nombre] = float(peso)
+            except ValueError:
+                raise CommandError(f'Invalid weight for {nombre}: {peso!r}')
+        conocidos = {e[0] for e in ESCENARIOS}
+        for nombre in [*options['only'], *options['exclude'], *pesos]:
+            if nombre not in conocidos:
+                raise CommandError(f'Unknown endpoint {nombre!r}; expected one of {", ".join(sorted(conocidos))}')
+
+        seleccion = []
+        for nombre, metodo, ruta, auth, peso in ESCENARIOS:
+            es_api = ruta.startswith('/api/')
+            if options['mix'] == 'api' and not es_api or options['mix'] == 'web' and es_api:
+                continue
+            if options['only'] and nombre not in options['only'] or nombre in options['exclude']:
+                continue
+            peso = pesos.get(nombre, peso)
+            if peso > 0:
+                seleccion.append((nombre, metodo, ruta, auth, peso))
+        return seleccion
+
+    def ajustes(self):
+        """Ajustes para servir en HTTP plano desde 127.0.0.1 sin el rate limiting por IP"""
+        ajustes = {
+            'ALLOWED_HOSTS': ['127.0.0.1', 'localhost'],
+            'SECURE_SSL_REDIRECT': False,
+            'RATELIMIT_ENABLE': False,
+        }
+        # Sin collectstatic previo las plantillas no pueden resolver {% static %} contra el manifest
+        if isinstance(staticfiles_storage, ManifestFilesMixin) and \
+                not staticfiles_storage.exists(staticfiles_storage.manifest_name):
+            self.stdout.write(self.style.WARNING('No static manifest found: templates use unhashed static URLs'))
+            ajustes['STORAGES'] = {
+                **settings.STORAGES,
+                'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+            }
+        return ajustes
+
+    # Datos
+
+    def sembrar(self, options, rng):
+        call_command('generate_catalog', books=max(options['books'], 1), authors=max(options['authors'], 1),
+                     categories=max(options['categories'], 1), publishers=max(options['publishers'], 1),
+                     seed=options['seed'], stdout=io.StringIO())
+        # Sin agotados: los 409 por falta de stock no son lo que se mide
+        Libro.objects.update(stock=1_000_000)
+        categorias = list(Categoria.objects.values_list('id', flat=True))
+        editoriales = list(Editorial.objects.values_list('id', flat=True))
+        autores = list(Autor.objects.values_list('id', flat=True))
+        libros = list(Libro.objects.values_list('id', flat=True))
+
+        # generate_users se niega a correr con DEBUG=False; aquí siembra la base de pruebas desechable
+        with override_settings(DEBUG=True):
+            call_command('generate_users', count=max(options['users'], 8), prefix=PREFIX, password=PASSWORD,
+                         hash_pool=2, roles='USER=100', seed=options['seed'], stdout=io.StringIO())
+        usuarios = list(User.objects.filter(username__startswith=PREFIX).order_by('id'))
+        admins, moderadores, usuarios = usuarios[:4], usuarios[4:8], usuarios[8:] or usuarios[:8]
+        UserProfile.objects.filter(user__in=admins).update(role='ADMIN')
+        UserProfile.objects.filter(user__in=moderadores).update(role='MODERATOR')
+
+        pedidos = defaultdict(list)
+        for usuario in usuarios:
+            for _ in range(options['orders_per_user']):
+                pedidos[usuario.id].append(Pedido(usuario=usuario, total=0, direccion_envio='Calle Falsa 123'))
+        Pedido.objects.bulk_create([p for lista in pedidos.values() for p in lista], batch_size=1000)
+        pedidos = defaultdict(list)
+        for pedido_id, usuario_id in Pedido.objects.values_list('id', 'usuario_id'):
+            pedidos[usuario_id].append(pedido_id)
+        ItemPedido.objects.bulk_create([
+            ItemPedido(pedido_id=pedido_id, libro_id=rng.choice(libros), cantidad=rng.randint(1, 3),
+                       precio_unitario=Decimal('19.90'))
+            for lista in pedidos.values() for pedido_id in lista for _ in range(rng.randint(1, 4))
+        ], batch_size=5000)
+
+        sesiones = import_module(settings.SESSION_ENGINE).SessionStore
+        return {
+            'categorias': categorias,
+            'editoriales': editoriales,
+            'autores': autores,
+            'libros': libros,
+            'usuarios': usuarios,
+            'pedidos': pedidos,
+            'identidades': {
+                rol: [self.identidad(u, sesiones) for u in grupo]
+                for rol, grupo in (('user', usuarios), ('admin', admins), ('moderator', moderadores))
+            },
+        }
+
+    def identidad(self, usuario, sesiones):
+        sesion = sesiones()
+        sesion[SESSION_KEY] = str(usuario.pk)
+        sesion[BACKEND_SESSION_KEY] = 'django.contrib.auth.backends.ModelBackend'
+        sesion[HASH_SESSION_KEY] = usuario.get_session_auth_hash()
+        sesion.create()
+        csrf = ''.join(random.choices(string.ascii_letters + string.digits, k=32))
+        return {
+            'usuario': usuario,
+            'jwt': f'Bearer {AccessToken.for_user(usuario)}',
+            'cookie': f'{settings.SESSION_COOKIE_NAME}={sesion.session_key}; {settings.CSRF_COOKIE_NAME}={csrf}',
+            'csrf': csrf,
+        }
+
+    def planificar(self, escenarios, total, datos, rng):
+        """Sortea de antemano toda la secuencia de peticiones: misma semilla, misma carga"""
+        elegidos = rng.choices(escenarios, weights=[e[4] for e in escenarios], k=total)
+        # Los borrados necesitan filas propias creadas antes de empezar
+        Libro.objects.bulk_create([
+            Libro(titulo=f'Borrable {i}', descripcion='-', precio=1, stock=1, fecha_publicacion=date.today())
+            for i, e in enumerate(elegidos) if e[0] == 'api_book_delete'
+        ])
+        borrables = iter(Libro.objects.filter(titulo__startswith='Borrable ').values_list('id', flat=True))
+        en_carrito = set()
+        plan = []
+        for numero, (nombre, metodo, ruta, auth, _) in enumerate(elegidos):
+            rol = {'jwt_admin': 'admin', 'session_admin': 'admin', 'jwt_moderator': 'moderator'}.get(auth, 'user')
+            identidad = rng.choice(datos['identidades'][rol])
+            usuario = identidad['usuario']
+            valores = {
+                'libro': rng.choice(datos['libros']),
+                'categoria': rng.choice(datos['categorias']),
+                'autor': rng.choice(datos['autores']),
+                'editorial': rng.choice(datos['editoriales']),
+                'palabra': quote(rng.choice(SUSTANTIVOS)),
+            }
+            if '{pedido}' in ruta:
+                valores['pedido'] = rng.choice(datos['pedidos'][usuario.id] or [0])
+            if '{item}' in ruta:
+                # Un item distinto por petición: cada borrado encuentra el suyo
+                libro_id = rng.choice(datos['libros'])
+                while (usuario.id, libro_id) in en_carrito:
+                    libro_id = rng.choice(datos['libros'])
+                en_carrito.add((usuario.id, libro_id))
+                carrito, _ = Carrito.objects.get_or_create(usuario=usuario)
+                valores['item'] = reservas.reservar(carrito, Libro(id=libro_id), 1).id
+            if '{libro_borrable}' in ruta:
+                valores['libro_borrable'] = next(borrables)
+
+            # IPs sintéticas: el throttling de DRF sigue activo, repartido como con clientes reales
+            headers = {'X-Forwarded-For': f'10.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}'}
+            if auth and auth.startswith('jwt'):
+                headers['Authorization'] = identidad['jwt']
+            elif auth:
+                headers['Cookie'] = identidad['cookie']
+                headers['X-CSRFToken'] = identidad['csrf']
+            plan.append(Peticion(nombre, metodo, ruta.format(**valores), headers,
+                                 self.cuerpo(nombre, headers, valores, datos, rng, numero)))
+        return plan
+
+    def cuerpo(self, nombre, headers, valores, datos, rng, numero):
+        if nombre == 'agregar_al_carrito':
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+            return b'cantidad=1'
+        if nombre == 'api_cart_add':
+            payload = {'libro_id': valores['libro'], 'cantidad': 1}
+        elif nombre == 'api_login':
+            usuario = rng.choice(datos['usuarios'])
+            payload = {'email': usuario.email, 'password': PASSWORD}
+        elif nombre == 'api_register':
+            username = f'{PREFIX}nuevo_{numero}'
+            payload = {'username': username, 'email': f'{username}@loadtest.example', 'password': PASSWORD,
+                       'password_confirm': PASSWORD, 'first_name': 'Bench', 'last_name': 'Mark'}
+        elif nombre == 'api_book_create':
+            payload = {'titulo': f'Nuevo {numero}', 'descripcion': 'Creado por el benchmark', 'precio': '12.50',
+                       'stock': 10, 'categoria_id': valores['categoria'], 'editorial_id': valores['editorial'],
+                       'autores_ids': [valores['autor']], 'fecha_publicacion': date.today().isoformat()}
+        elif nombre == 'api_book_update':
+            payload = {'precio': f'{rng.randint(500, 9000) / 100:.2f}'}
+        else:
+            return b''
+        headers['Content-Type'] = 'application/json'
+        return json.dumps(payload).encode()
+
+    # Ejecución
+
+    def ejecutar(self, plan, options):
+        server = ThreadedWSGIServer(('127.0.0.1', 0), SilentRequestHandler, allow_reuse_address=False)
+        server.set_app(QueryCountingApplication(get_wsgi_application()))
+        hilo = threading.Thread(target=server.serve_forever, daemon=True)
+        hilo.start()
+        host, port = server.server_address[:2]
+        self.stdout.write(f'Serving on http://{host}:{port}/, {len(plan)} requests '
+                          f'({options["warmup"]} warmup), concurrency {options["concurrency"]}, {options["client"]} client')
+        try:
+            if options['client'] == 'asyncio':
+                return asyncio.run(self.ejecutar_async(host, port, plan, options['concurrency'], options['warmup']))
+            return self.ejecutar_hilos(host, port, plan, options['concurrency'], options['warmup'])
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def ejecutar_hilos(self, host, port, plan, concurrencia, warmup):
+        resultados = [None] * len(plan)
+        siguiente = iter(range(len(plan)))
+        cerrojo = threading.Lock()
+        inicio_medicion = [None]
+
+        def cliente():
+            conexion = http.client.HTTPConnection(host, port, timeout=60)
+            try:
+                while True:
+                    with cerrojo:
+                        numero = next(siguiente, None)
+                        if numero == warmup:
+                            inicio_medicion[0] = time.perf_counter()
+                    if numero is None:
+                        return
+                    peticion = plan[numero]
+                    inicio = time.perf_counter()
+                    try:
+                        conexion.request(peticion.metodo, peticion.ruta, body=peticion.body or None,
+                                         headers=peticion.headers)
+                        respuesta = conexion.getresponse()
+                        respuesta.read()
+                        status, consultas = respuesta.status, respuesta.getheader(QueryCountingApplication.header)
+                    except (OSError, http.client.HTTPException):
+                        conexion.close()
+                        status, consultas = 0, None
+                    resultados[numero] = (peticion.nombre, status, time.perf_counter() - inicio, consultas)
+            finally:
+                conexion.close()
+
+        with ThreadPoolExecutor(max_workers=concurrencia) as pool:
+            for futuro in [pool.submit(cliente) for _ in range(concurrencia)]:
+                futuro.result()
+        fin = time.perf_counter()
+        return resultados, fin - (inicio_medicion[0] or fin)
+
+    async def ejecutar_async(self, host, port, plan, concurrencia, warmup):
+        resultados = [None] * len(plan)
+        siguiente = iter(range(len(plan)))
+        inicio_medicion = [None]
+
+        async def cliente():
+            for numero in siguiente:
+                if numero == warmup:
+                    inicio_medicion[0] = time.perf_counter()
+                peticion = plan[numero]
+                inicio = time.perf_counter()
+                try:
+                    status, consultas = await self.peticion_async(host, port, peticion)
+                except (OSError, ValueError, IndexError):
+                    status, consultas = 0, None
+                resultados[numero] = (peticion.nombre, status, time.perf_counter() - inicio, consultas)
+
+        await asyncio.gather(*(cliente() for _ in range(concurrencia)))
+        fin = time.perf_counter()
+        return resultados, fin - (inicio_medicion[0] or fin)
+
+    async def peticion_async(self, host, port, peticion):
+        """HTTP/1.1 mínimo sobre asyncio streams: una conexión por petición, leída hasta EOF"""
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            lineas = [f'{peticion.metodo} {peticion.ruta} HTTP/1.1', f'Host: {host}:{port}', 'Connection: close',
+                      f'Content-Length: {len(peticion.body)}']
+            lineas += [f'{nombre}: {valor}' for nombre, valor in peticion.headers.items()]
+            writer.write(('\r\n'.join(lineas) + '\r\n\r\n').encode('latin-1') + peticion.body)
+            await writer.drain()
+            datos = await reader.read()
+        finally:
+            writer.close()
+            await writer.wait_closed()
+        cabecera = datos.partition(b'\r\n\r\n')[0].decode('latin-1').split('\r\n')
+        status = int(cabecera[0].split(' ', 2)[1])
+        consultas = None
+        for linea in cabecera[1:]:
+            nombre, _, valor = linea.partition(':')
+            if nombre.strip().lower() == QueryCountingApplication.header.lower():
+                consultas = valor.strip()
+        return status, consultas
+
+    # Informe
+
+    def informe(self, resultados, duracion, options):
+        por_endpoint = defaultdict(list)
+        for resultado in resultados:
+            por_endpoint[resultado[0]].append(resultado)
+
+        endpoints = {}
+        for nombre, filas in sorted(por_endpoint.items()):
+            latencias = sorted(fila[2] * 1000 for fila in filas)
+            consultas = [int(fila[3]) for fila in filas if fila[3] is not None]
+            estados = defaultdict(int)
+            for fila in filas:
+                estados[str(fila[1])] += 1
+            endpoints[nombre] = {
+                'requests': len(filas),
+                'errors': sum(1 for fila in filas if not 200 <= fila[1] < 400),
+                'status': dict(sorted(estados.items())),
+                'throughput_rps': round(len(filas) / duracion, 2) if duracion else None,
+                'mean_ms': round(sum(latencias) / len(latencias), 3),
+                'p50_ms': round(percentil(latencias, 50), 3),
+                'p95_ms': round(percentil(latencias, 95), 3),
+                'p99_ms': round(percentil(latencias, 99), 3),
+                'max_ms': round(latencias[-1], 3),
+                'queries_mean': round(sum(consultas) / len(consultas), 2) if consultas else None,
+                'queries_max': max(consultas) if consultas else None,
+            }
+
+        latencias = sorted(fila[2] * 1000 for fila in resultados)
+        return {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'config': {
+                clave: options[clave] for clave in (
+                    'requests', 'warmup', 'concurrency', 'client', 'mix', 'only', 'exclude', 'weight',
+                    'books', 'authors', 'categories', 'publishers', 'users', 'orders_per_user', 'seed',
+                )
+            },
+            'database': connection.vendor,
+            'debug': settings.DEBUG,
+            'total': {
+                'requests': len(resultados),
+                'errors': sum(e['errors'] for e in endpoints.values()),
+                'duration_s': round(duracion, 3),
+                'throughput_rps': round(len(resultados) / duracion, 2) if duracion else None,
+                'p50_ms': percentil(latencias, 50) and round(percentil(latencias, 50), 3),
+                'p95_ms': percentil(latencias, 95) and round(percentil(latencias, 95), 3),
+                'p99_ms': percentil(latencias, 99) and round(percentil(latencias, 99), 3),
+            },
+            'endpoints': endpoints,
+        }
+
+    def imprimir(self, informe, previo):
+        previos = (previo or {}).get('endpoints', {})
+        self.stdout.write(f"{'endpoint':28} {'reqs':>6} {'err':>4} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} "
+                          f"{'p99 ms':>8} {'queries':>8}" + ('  p95 vs prev' if previo else ''))
+        for nombre, e in informe['endpoints'].items():
+            linea = (f"{nombre:28} {e['requests']:>6} {e['errors']:>4} {e['throughput_rps'] or 0:>8.1f} "
+                     f"{e['p50_ms']:>8.2f} {e['p95_ms']:>8.2f} {e['p99_ms']:>8.2f} "
+                     f"{e['queries_mean'] if e['queries_mean'] is not None else '-':>8}")
+            if nombre in previos and previos[nombre].get('p95_ms'):
+                linea += f"  {(e['p95_ms'] / previos[nombre]['p95_ms'] - 1):+.1%}"
+            if e['errors']:
+                linea = self.style.WARNING(linea + f"  status={e['status']}")
+            self.stdout.write(linea)
+
+        total = informe['total']
+        resumen = (f"Total: {total['requests']} requests in {total['duration_s']:.2f}s, "
+                   f"{total['throughput_rps'] or 0:,.1f} req/s, p50 {total['p50_ms']} ms, "
+                   f"p95 {total['p95_ms']} ms, p99 {total['p99_ms']} ms, {total['errors']} errors")
+        if previo and previo.get('total', {}).get('throughput_rps'):
+            resumen += f" ({total['throughput_rps'] / previo['total']['throughput_rps'] - 1:+.1%} req/s vs previous)"
+        self.stdout.write(resumen)
@@ -0,0 +1,47 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core.authentication import CachedJWTAuthentication, VerifiedTokenCache
+
+
+class Command(BaseCommand):
+    help = 'Benchmark per-request JWT authentication cost with and without the verified-token cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=20000)
+        parser.add_argument('--tokens', type=int, default=50, help='Distinct access tokens in rotation')
+
+    def handle(self, *args, **options):
+        usuario = User.objects.create(username=f'bench_jwt_{time.time_ns()}')
+        try:
+            tokens = [str(AccessToken.for_user(usuario)) for _ in range(options['tokens'])]
+            factory = APIRequestFactory()
+            peticiones = [factory.get('/api/cart/', HTTP_AUTHORIZATION=f'Bearer {token}') for token in tokens]
+            raws = [token.encode() for token in tokens]
+
+            cached = CachedJWTAuthentication()
+            cached.cache = VerifiedTokenCache()
+            n = options['requests']
+
+            self.stdout.write('Token verification only (no user lookup):')
+            self.report('JWTAuthentication', n, lambda i: JWTAuthentication().get_validated_token(raws[i % len(raws)]))
+            self.report('CachedJWTAuthentication', n, lambda i: cached.get_validated_token(raws[i % len(raws)]))
+
+            self.stdout.write('Full authenticate() (includes the user query):')
+            self.report('JWTAuthentication', n // 4, lambda i: JWTAuthentication().authenticate(peticiones[i % len(peticiones)]))
+            self.report('CachedJWTAuthentication', n // 4, lambda i: cached.authenticate(peticiones[i % len(peticiones)]))
+            self.stdout.write(f'Cache stats: {cached.cache.stats()}')
+        finally:
+            usuario.delete()
+
+    def report(self, nombre, n, fn):
+        inicio = time.perf_counter()
+        for i in range(n):
+            fn(i)
+        duracion = time.perf_counter() - inicio
+        self.stdout.write(f'  {nombre:<26} {duracion / n * 1e6:8.1f} µs/request  ({n / duracion:,.0f}/s)')
@@ -0,0 +1,71 @@
+import asyncio
+import time
+
+from django.contrib.auth import authenticate
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from core.backends import EmailBackend
+
+PASSWORD = 'Bench123!'
+
+
+class Command(BaseCommand):
+    help = 'Benchmark login throughput: legacy double lookup vs EmailBackend (sync and async)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20)
+        parser.add_argument('--logins', type=int, default=40, help='Logins per scenario')
+        parser.add_argument('--concurrency', type=int, default=8, help='Concurrent logins in the async scenario')
+
+    def handle(self, *args, **options):
+        prefix = f'bench_login_{time.time_ns()}'
+        hashed = make_password(PASSWORD)
+        users = User.objects.bulk_create([
+            User(username=f'{prefix}_{i}', email=f'{prefix}_{i}@Bench.example', password=hashed)
+            for i in range(options['users'])
+        ])
+        emails = [u.email for u in users]
+        logins = options['logins']
+
+        try:
+            self.report('legacy get(email) + authenticate()', logins, lambda i: self.legacy(emails[i % len(emails)]))
+            backend = EmailBackend()
+            self.report('EmailBackend.authenticate', logins,
+                        lambda i: backend.authenticate(None, email=emails[i % len(emails)], password=PASSWORD))
+
+            async def run_async():
+                semaforo = asyncio.Semaphore(options['concurrency'])
+
+                async def login(i):
+                    async with semaforo:
+                        return await backend.aauthenticate(None, email=emails[i % len(emails)], password=PASSWORD)
+
+                return await asyncio.gather(*(login(i) for i in range(logins)))
+
+            inicio = time.perf_counter()
+            resultados = asyncio.run(run_async())
+            duracion = time.perf_counter() - inicio
+            ok = sum(1 for r in resultados if r is not None)
+            self.stdout.write(f"{'EmailBackend.aauthenticate (pool)':40} {logins / duracion:8.1f} logins/s  "
+                              f"ok={ok}/{logins}")
+        finally:
+            User.objects.filter(username__startswith=prefix).delete()
+
+    def legacy(self, email):
+        try:
+            user = User.objects.get(email=email)
+        except User.DoesNotExist:
+            return None
+        return authenticate(username=user.username, password=PASSWORD)
+
+    def report(self, nombre, logins, login):
+        with CaptureQueriesContext(connection) as queries:
+            inicio = time.perf_counter()
+            ok = sum(1 for i in range(logins) if login(i) is not None)
+            duracion = time.perf_counter() - inicio
+        self.stdout.write(f"{nombre:40} {logins / duracion:8.1f} logins/s  ok={ok}/{logins}  "
+                          f"queries/login={len(queries) / logins:.1f}")
@@ -0,0 +1,81 @@
+import threading
+import time
+from datetime import date
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, OperationalError
+from django.db.models import Sum
+
+from core import reservas
+from core.models import Libro, Carrito, Reserva
+
+
+class Command(BaseCommand):
+    help = 'Benchmark reserve/release throughput with several threads competing for the same books'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--operations', type=int, default=200, help='Reserve+release cycles per thread')
+        parser.add_argument('--books', type=int, default=1, help='Number of contended books')
+        parser.add_argument('--stock', type=int, default=50)
+
+    def handle(self, *args, **options):
+        threads = options['threads']
+        libros = [
+            Libro.objects.create(
+                titulo=f'bench-reserva-{i}', descripcion='benchmark', precio=10, stock=options['stock'],
+                fecha_publicacion=date.today(),
+            )
+            for i in range(options['books'])
+        ]
+        usuarios = [User.objects.create(username=f'bench_reserva_{i}_{time.time_ns()}') for i in range(threads)]
+        carritos = [Carrito.objects.create(usuario=u) for u in usuarios]
+
+        resultados = {'reservas': 0, 'sin_stock': 0, 'errores': 0}
+        lock = threading.Lock()
+
+        def worker(indice):
+            carrito = carritos[indice]
+            locales = {'reservas': 0, 'sin_stock': 0, 'errores': 0}
+            try:
+                for n in range(options['operations']):
+                    libro = libros[n % len(libros)]
+                    try:
+                        item = reservas.reservar(carrito, libro, 1)
+                        if item is None:
+                            locales['sin_stock'] += 1
+                            continue
+                        locales['reservas'] += 1
+                        reservas.eliminar_item(item)
+                    except OperationalError:
+                        # SQLite: "database is locked" bajo contención de escritura
+                        locales['errores'] += 1
+            finally:
+                connection.close()
+            with lock:
+                for clave, valor in locales.items():
+                    resultados[clave] += valor
+
+        inicio = time.perf_counter()
+        hilos = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        duracion = time.perf_counter() - inicio
+
+        ids = [l.id for l in libros]
+        reservado = sum(Libro.objects.filter(id__in=ids).values_list('stock_reservado', flat=True))
+        activo = Reserva.objects.filter(libro_id__in=ids).aggregate(total=Sum('cantidad'))['total'] or 0
+        Libro.objects.filter(id__in=[l.id for l in libros]).delete()
+        User.objects.filter(id__in=[u.id for u in usuarios]).delete()
+
+        ciclos = resultados['reservas']
+        self.stdout.write(f"Threads: {threads}, books: {len(libros)}, vendor: {connection.vendor}")
+        self.stdout.write(f"Reserve+release cycles: {ciclos} in {duracion:.2f}s ({ciclos / duracion:.1f} cycles/s)")
+        self.stdout.write(f"Rejected for stock: {resultados['sin_stock']}, lock errors: {resultados['errores']}")
+        if reservado != activo or reservado > options['stock'] * len(libros):
+            self.stdout.write(self.style.ERROR(f'Inconsistent counter: stock_reservado={reservado}, active holds={activo}'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Counter consistent with active holds ({activo} units still held)'))
@@ -0,0 +1,89 @@
+import time
+import uuid
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core.models import TokenRevocado
+from core.tokens import RevocationStore, RevocableTokenRefreshSerializer
+
+BENCH_PREFIX = 'bench'
+
+
+class Command(BaseCommand):
+    help = 'Benchmark revoked-token checks and refresh rotation with many revoked JTIs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--revoked', type=int, default=1_000_000, help='Revoked JTIs to insert')
+        parser.add_argument('--checks', type=int, default=100_000, help='Lookups of non-revoked JTIs')
+        parser.add_argument('--refreshes', type=int, default=200, help='Refresh rotations to run')
+        parser.add_argument('--batch-size', type=int, default=10_000)
+        parser.add_argument('--keep', action='store_true', help='Keep the inserted JTIs after the run')
+
+    def handle(self, *args, **options):
+        expira_en = timezone.now() + timedelta(days=1)
+        inicio = time.perf_counter()
+        pendientes = options['revoked']
+        while pendientes > 0:
+            lote = min(pendientes, options['batch_size'])
+            TokenRevocado.objects.bulk_create(
+                [TokenRevocado(jti=f'{BENCH_PREFIX}{uuid.uuid4().hex}', expira_en=expira_en) for _ in range(lote)],
+                batch_size=options['batch_size'],
+            )
+            pendientes -= lote
+        self.stdout.write(f"Inserted {options['revoked']} revoked JTIs in {time.perf_counter() - inicio:.1f}s")
+
+        store = RevocationStore(capacity=max(options['revoked'] * 2, 1000))
+        inicio = time.perf_counter()
+        store.sync(force=True)
+        self.stdout.write(f"Bloom filter built in {time.perf_counter() - inicio:.2f}s "
+                          f"({len(store._filter.bits) / 1024 / 1024:.1f} MiB, {store._filter.hashes} hashes)")
+
+        usuario = User.objects.create(username=f'bench_revocacion_{time.time_ns()}')
+        try:
+            self.bench_checks(store, options['checks'])
+            self.bench_refresh(usuario, options['refreshes'])
+        finally:
+            usuario.delete()
+            if not options['keep']:
+                TokenRevocado.objects.filter(jti__startswith=BENCH_PREFIX).delete()
+
+    def bench_checks(self, store, checks):
+        jtis = [uuid.uuid4().hex for _ in range(checks)]
+        with CaptureQueriesContext(connection) as queries:
+            inicio = time.perf_counter()
+            revocados = sum(1 for jti in jtis if store.is_revoked(jti))
+            duracion = time.perf_counter() - inicio
+        self.stdout.write(f"Not-revoked checks: {checks / duracion:,.0f}/s, "
+                          f"DB queries: {len(queries)} (false positives reaching DB), revoked: {revocados}")
+
+        muestra = list(TokenRevocado.objects.values_list('jti', flat=True)[:1000])
+        inicio = time.perf_counter()
+        revocados = sum(1 for jti in muestra if store.is_revoked(jti))
+        duracion = time.perf_counter() - inicio
+        self.stdout.write(f"Revoked checks: {len(muestra) / max(duracion, 1e-9):,.0f}/s "
+                          f"({revocados}/{len(muestra)} detected)")
+
+    def bench_refresh(self, usuario, refreshes):
+        refresh = str(RefreshToken.for_user(usuario))
+        inicio = time.perf_counter()
+        for _ in range(refreshes):
+            serializer = RevocableTokenRefreshSerializer(data={'refresh': refresh})
+            serializer.is_valid(raise_exception=True)
+            refresh = serializer.validated_data['refresh']
+        duracion = time.perf_counter() - inicio
+        self.stdout.write(f"Refresh rotations: {refreshes / duracion:,.0f}/s")
+
+        serializer = RevocableTokenRefreshSerializer(data={'refresh': refresh})
+        serializer.is_valid(raise_exception=True)
+        reuso = RevocableTokenRefreshSerializer(data={'refresh': refresh})
+        try:
+            reuso.is_valid(raise_exception=True)
+            self.stdout.write(self.style.ERROR('Reused refresh token was accepted'))
+        except Exception:
+            self.stdout.write(self.style.SUCCESS('Reused refresh token rejected'))
@@ -0,0 +1,30 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from core.models import UserProfile
+
+
+class Command(BaseCommand):
+    help = 'Create the default UserProfile for existing users that do not have one'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        sin_perfil = User.objects.filter(profile__isnull=True).order_by('id').values_list('id', flat=True)
+        total = 0
+        ultimo_id = 0
+        while True:
+            ids = list(sin_perfil.filter(id__gt=ultimo_id)[:batch_size])
+            if not ids:
+                break
+            # ignore_conflicts: un perfil creado en paralelo por la señal no aborta el lote
+            UserProfile.objects.bulk_create(
+                [UserProfile(user_id=user_id, role='USER') for user_id in ids],
+                batch_size=batch_size,
+                ignore_conflicts=True,
+            )
+            total += len(ids)
+            ultimo_id = ids[-1]
+        self.stdout.write(self.style.SUCCESS(f'Created {total} missing user profiles'))
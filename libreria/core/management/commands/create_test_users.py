@@ -20,7 +20,7 @@ class Command(BaseCommand):
         if created:
             admin_user.set_password('Admin123!')
             admin_user.save()
-            UserProfile.objects.create(user=admin_user, role='ADMIN', is_verified=True)
+            UserProfile.objects.filter(user=admin_user).update(role='ADMIN', is_verified=True)
             self.stdout.write(self.style.SUCCESS(f'Admin user created: admin / Admin123!'))
         else:
             self.stdout.write(self.style.WARNING('Admin user already exists'))
@@ -37,7 +37,7 @@ class Command(BaseCommand):
         if created:
             mod_user.set_password('Mod123!')
             mod_user.save()
-            UserProfile.objects.create(user=mod_user, role='MODERATOR', is_verified=True)
+            UserProfile.objects.filter(user=mod_user).update(role='MODERATOR', is_verified=True)
             self.stdout.write(self.style.SUCCESS(f'Moderator user created: moderator / Mod123!'))
         else:
             self.stdout.write(self.style.WARNING('Moderator user already exists'))
@@ -54,7 +54,7 @@ class Command(BaseCommand):
         if created:
             normal_user.set_password('User123!')
             normal_user.save()
-            UserProfile.objects.create(user=normal_user, role='USER', is_verified=True)
+            UserProfile.objects.filter(user=normal_user).update(role='USER', is_verified=True)
             self.stdout.write(self.style.SUCCESS(f'Normal user created: usuario / User123!'))
         else:
             self.stdout.write(self.style.WARNING('Normal user already exists'))
@@ -71,7 +71,7 @@ class Command(BaseCommand):
         if created:
             guest_user.set_password('Guest123!')
             guest_user.save()
-            UserProfile.objects.create(user=guest_user, role='GUEST')
+            UserProfile.objects.filter(user=guest_user).update(role='GUEST')
             self.stdout.write(self.style.SUCCESS(f'Guest user created: invitado / Guest123!'))
         else:
             self.stdout.write(self.style.WARNING('Guest user already exists'))
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import reservas
+
+
+class Command(BaseCommand):
+    help = 'Release expired stock reservations in batches. Use --loop to run as a background worker.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Reservations released per transaction')
+        parser.add_argument('--loop', action='store_true', help='Keep running, sweeping every --interval seconds')
+        parser.add_argument('--interval', type=float, default=30.0, help='Seconds between sweeps in --loop mode')
+        parser.add_argument('--reconcile', action='store_true',
+                            help='Recompute Libro.stock_reservado from active reservations before sweeping')
+
+    def handle(self, *args, **options):
+        if options['reconcile']:
+            corregidos = reservas.reconciliar_stock_reservado()
+            self.stdout.write(self.style.SUCCESS(f'Reserved stock reconciled for {corregidos} books'))
+
+        while True:
+            liberadas = self.sweep(options['batch_size'])
+            if liberadas:
+                self.stdout.write(self.style.SUCCESS(f'Released {liberadas} expired reservations'))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+    def sweep(self, batch_size):
+        total = 0
+        while True:
+            liberadas = reservas.expirar_reservas(batch_size=batch_size)
+            total += liberadas
+            if liberadas < batch_size:
+                return total
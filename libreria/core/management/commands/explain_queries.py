@@ -0,0 +1,101 @@
+import re
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.http import QueryDict
+from django.test import RequestFactory
+from django.utils import timezone
+
+from core.api_views import carritos_con_items, filtrar_libros
+from core.backends import users_by_email
+from core.models import Autor, Carrito, Categoria, Editorial, ItemCarrito, Libro, Pedido, Reserva, TokenRevocado
+from core.views import libros_home, libros_tienda
+
+# SQLite: "SCAN tabla" sin índice recorre la tabla entera; PostgreSQL: "Seq Scan on tabla"
+SCAN_PATTERNS = {
+    'sqlite': re.compile(r'\bSCAN (\w+)(?! USING (?:COVERING )?INDEX)(?!\w)'),
+    'postgresql': re.compile(r'Seq Scan on (\w+)'),
+}
+SORT_PATTERNS = {
+    'sqlite': re.compile(r'USE TEMP B-TREE FOR ORDER BY'),
+    'postgresql': re.compile(r'^\s*(?:->\s*)?Sort\b', re.MULTILINE),
+}
+
+
+def _primero(modelo):
+    return modelo.objects.order_by('pk').values_list('pk', flat=True).first() or 1
+
+
+def consultas():
+    """
+    (nombre, queryset, excepciones): las consultas principales de cada vista, con los mismos
+    helpers que usan las vistas para que no se desalineen. Las excepciones son tablas que
+    pueden recorrerse o 'sort' si se acepta ordenar sin índice.
+    """
+    categoria, autor, editorial = _primero(Categoria), _primero(Autor), _primero(Editorial)
+    libro = Libro.objects.filter(pk=_primero(Libro)).values('pk', 'categoria_id').first() or \
+        {'pk': 1, 'categoria_id': categoria}
+    usuario = _primero(User)
+    carrito = _primero(Carrito)
+    libros_pagina, _ = libros_home(RequestFactory().get('/'))
+    return [
+        # Sin filtros se recorre el catálogo por la clave primaria y se corta en el LIMIT
+        ('home', libros_pagina[:12], {'core_libro'}),
+        ('tienda:categoria', libros_tienda(QueryDict(f'categoria={categoria}'))[0][:12], set()),
+        ('tienda:editorial', libros_tienda(QueryDict(f'editorial={editorial}'))[0][:12], set()),
+        # Los libros de un autor salen de la tabla intermedia y se ordenan por core_libro.id:
+        # el orden se resuelve sobre las filas del autor, no sobre el catálogo
+        ('tienda:autor', libros_tienda(QueryDict(f'autor={autor}'))[0][:12], {'sort'}),
+        ('categoria_detalle', Libro.objects.filter(categoria=categoria).order_by('-id')[:12], set()),
+        ('autor_detalle', Libro.objects.filter(autores=autor).order_by('-id')[:12], {'sort'}),
+        ('editorial_detalle', Libro.objects.filter(editorial=editorial).order_by('-id')[:12], set()),
+        ('libro_detail:relacionados',
+         Libro.objects.filter(categoria_id=libro['categoria_id']).exclude(id=libro['pk'])[:4], set()),
+        ('api_books_list', filtrar_libros(QueryDict(''))[:20], {'core_libro'}),
+        ('api_books_list:categoria', filtrar_libros(QueryDict(f'categoria={categoria}'))[:20], set()),
+        ('api_cart', carritos_con_items().filter(usuario=usuario), set()),
+        ('ver_carrito:items', ItemCarrito.objects.filter(carrito_id=carrito).select_related('libro'), set()),
+        ('agregar_al_carrito:item', ItemCarrito.objects.filter(carrito_id=carrito, libro_id=libro['pk']), set()),
+        ('api_orders_list', Pedido.objects.filter(usuario=usuario).order_by('-fecha', '-id')[:20], set()),
+        ('api_login', users_by_email('lector@example.com').order_by('id')[:1], set()),
+        ('expirar_reservas', Reserva.objects.filter(expira_en__lte=timezone.now()).order_by('expira_en')[:500],
+         set()),
+        ('token_revocado', TokenRevocado.objects.filter(jti='0' * 32), set()),
+    ]
+
+
+class Command(BaseCommand):
+    help = 'Run EXPLAIN over the main query of each view and flag full table scans and sorts without an index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--only', action='append', default=[], help='Query name to explain (repeatable)')
+        parser.add_argument('--fail-on-scan', action='store_true',
+                            help='Exit with an error if any query does a full scan (for CI)')
+
+    def handle(self, *args, **options):
+        scan = SCAN_PATTERNS.get(connection.vendor)
+        sort = SORT_PATTERNS.get(connection.vendor)
+        if scan is None:
+            self.stdout.write(self.style.WARNING(f'No scan detection for {connection.vendor}: printing plans only'))
+
+        marcadas = []
+        for nombre, queryset, permitidas in consultas():
+            if options['only'] and nombre not in options['only']:
+                continue
+            plan = queryset.explain()
+            tablas = sorted({tabla for tabla in scan.findall(plan) if tabla not in permitidas}) if scan else []
+            ordena = bool(sort and sort.search(plan)) and 'sort' not in permitidas
+            if tablas or ordena:
+                problemas = [f'full scan of {", ".join(tablas)}'] if tablas else []
+                problemas += ['sort without index'] if ordena else []
+                self.stdout.write(self.style.WARNING(f'{nombre}: {"; ".join(problemas)}'))
+                marcadas.append(nombre)
+            else:
+                self.stdout.write(self.style.SUCCESS(f'{nombre}: ok'))
+            if tablas or ordena or options['verbosity'] >= 2:
+                for linea in plan.splitlines():
+                    self.stdout.write(f'    {linea}')
+
+        if marcadas and options['fail_on_scan']:
+            raise CommandError(f'{len(marcadas)} queries scan or sort without an index: {", ".join(marcadas)}')
@@ -0,0 +1,57 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core import imagenes
+from core.models import Libro
+
+
+def _procesar(libro_id, forzar):
+    try:
+        return libro_id, imagenes.generar_variantes(libro_id, forzar=forzar), None
+    except Exception as e:
+        return libro_id, False, str(e)
+
+
+class Command(BaseCommand):
+    help = 'Generate responsive WebP/JPEG derivatives for existing book images'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=4, help='Worker processes (0 = run in this process)')
+        parser.add_argument('--all', action='store_true', help='Process every book with an image, not only the missing ones')
+        parser.add_argument('--force', action='store_true', help='Regenerate derivatives that already exist in storage')
+
+    def handle(self, *args, **options):
+        libros = Libro.objects.exclude(imagen='').exclude(imagen__isnull=True)
+        if not options['all']:
+            libros = libros.filter(imagen_variantes={})
+        ids = list(libros.order_by('id').values_list('id', flat=True))
+        self.stdout.write(f'Processing {len(ids)} books')
+
+        inicio = time.perf_counter()
+        generados = errores = 0
+        forzar = [options['force']] * len(ids)
+        if options['processes'] > 0:
+            # Cada proceso hijo abre su propia conexión; no heredar la del padre
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=options['processes']) as pool:
+                resultados = pool.map(_procesar, ids, forzar, chunksize=8)
+                generados, errores = self.report(resultados)
+        else:
+            generados, errores = self.report(map(_procesar, ids, forzar))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated derivatives for {generados} books in {time.perf_counter() - inicio:.1f}s ({errores} errors)'
+        ))
+
+    def report(self, resultados):
+        generados = errores = 0
+        for libro_id, ok, error in resultados:
+            if error:
+                errores += 1
+                self.stdout.write(self.style.WARNING(f'Book {libro_id}: {error}'))
+            elif ok:
+                generados += 1
+        return generados, errores
@@ -0,0 +1,290 @@
+import itertools
+import multiprocessing
+import random
+from contextlib import nullcontext
+import time
+from bisect import bisect
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, transaction
+from django.utils import timezone
+
+from core import estadisticas
+from core.procesos import inicializar_django
+from core.models import Autor, Carrito, Categoria, Editorial, ItemCarrito, ItemPedido, Libro, Pedido
+
+ADJETIVOS = ['oscuro', 'último', 'secreto', 'perdido', 'eterno', 'breve', 'silencioso', 'rojo', 'antiguo',
+             'infinito', 'pequeño', 'salvaje', 'invisible', 'dorado', 'nuevo', 'lejano']
+SUSTANTIVOS = ['jardín', 'viaje', 'mar', 'reino', 'tiempo', 'camino', 'sueño', 'libro', 'río', 'ciudad',
+               'bosque', 'invierno', 'espejo', 'puente', 'guerra', 'fuego', 'algoritmo', 'código']
+NOMBRES = ['Ana', 'Luis', 'María', 'José', 'Carmen', 'Pedro', 'Lucía', 'Jorge', 'Elena', 'Diego', 'Sofía',
+           'Pablo', 'Laura', 'Andrés', 'Isabel', 'Tomás', 'Valeria', 'Martín', 'Paula', 'Gabriel']
+APELLIDOS = ['García', 'Rodríguez', 'López', 'Martínez', 'González', 'Pérez', 'Sánchez', 'Romero', 'Torres',
+             'Flores', 'Rivera', 'Gómez', 'Díaz', 'Vargas', 'Castro', 'Ortiz', 'Morales', 'Rojas']
+
+# Autores por libro: la gran mayoría tiene uno solo
+AUTORES_POR_LIBRO = [1, 2, 3, 4]
+PESOS_AUTORES_POR_LIBRO = [70, 20, 7, 3]
+ESTADOS_PEDIDO = ['ENTREGADO', 'ENVIADO', 'PENDIENTE', 'CANCELADO']
+PESOS_ESTADOS_PEDIDO = [70, 10, 15, 5]
+
+
+def pesos_zipf(n, exponente):
+    """Pesos acumulados tipo Zipf: el elemento i pesa 1 / (i + 1) ** exponente"""
+    return list(itertools.accumulate(1 / (i + 1) ** exponente for i in range(n)))
+
+
+def precio_aleatorio(rng):
+    """Precios log-normales con mediana ~20"""
+    return Decimal(f'{min(max(rng.lognormvariate(3.0, 0.5), 3), 500):.2f}')
+
+
+def elegir(rng, valores, acumulados):
+    """Como rng.choices(valores, cum_weights=acumulados)[0] pero sin crear listas"""
+    return valores[bisect(acumulados, rng.random() * acumulados[-1], 0, len(acumulados) - 1)]
+
+
+def ids_insertados(modelo, objetos, batch_size, desde_id=None):
+    """bulk_create devolviendo los ids; sin RETURNING los lee de vuelta por encima de `desde_id`"""
+    creados = modelo.objects.bulk_create(objetos, batch_size=batch_size)
+    if connection.features.can_return_rows_from_bulk_insert:
+        return [obj.pk for obj in creados]
+    return list(modelo.objects.filter(id__gt=desde_id or 0).order_by('id').values_list('id', flat=True))
+
+
+# Estado de cada proceso para la generación de libros (ver _preparar)
+_contexto = {}
+
+
+def _preparar(categorias, editoriales, autores, exponente, max_autores, chunk_size, cerrojo=None):
+    _contexto.update(
+        cerrojo=cerrojo or nullcontext(),
+        categorias=categorias,
+        acumulados_categorias=pesos_zipf(len(categorias), exponente),
+        editoriales=editoriales,
+        acumulados_editoriales=pesos_zipf(len(editoriales), exponente),
+        autores=autores,
+        acumulados_autores=pesos_zipf(len(autores), exponente),
+        autores_por_libro=AUTORES_POR_LIBRO[:max_autores],
+        pesos_autores_por_libro=PESOS_AUTORES_POR_LIBRO[:max_autores],
+        chunk_size=chunk_size,
+    )
+
+
+def _insertar_libros(desde, cantidad, seed):
+    """Inserta los libros [desde, desde + cantidad) y sus autores; devuelve (libros, relaciones)"""
+    rng = random.Random(seed)
+    ctx = _contexto
+    hoy = date.today()
+    libros = []
+    for n in range(desde, desde + cantidad):
+        libros.append(Libro(
+            titulo=f'El {rng.choice(SUSTANTIVOS)} {rng.choice(ADJETIVOS)} {n}',
+            descripcion=' '.join(rng.choices(SUSTANTIVOS + ADJETIVOS, k=rng.randint(15, 60))).capitalize() + '.',
+            precio=precio_aleatorio(rng),
+            # Algunos agotados
+            stock=0 if rng.random() < 0.05 else int(rng.expovariate(1 / 40)) + 1,
+            categoria_id=elegir(rng, ctx['categorias'], ctx['acumulados_categorias']),
+            editorial_id=elegir(rng, ctx['editoriales'], ctx['acumulados_editoriales']),
+            # Más títulos recientes que antiguos
+            fecha_publicacion=hoy - timedelta(days=min(int(rng.expovariate(1 / 2500)), 60 * 365)),
+        ))
+
+    Relacion = Libro.autores.through
+    with _contexto['cerrojo'], transaction.atomic():
+        if connection.features.can_return_rows_from_bulk_insert:
+            ids = [libro.pk for libro in Libro.objects.bulk_create(libros, batch_size=ctx['chunk_size'])]
+        else:
+            # Otros procesos insertan a la vez: leer de vuelta por título (incluye el número global)
+            Libro.objects.bulk_create(libros, batch_size=ctx['chunk_size'])
+            ids = list(Libro.objects.filter(titulo__in=[libro.titulo for libro in libros])
+                       .values_list('id', flat=True))
+        relaciones = []
+        for libro_id in ids:
+            cuantos = rng.choices(ctx['autores_por_libro'], weights=ctx['pesos_autores_por_libro'])[0]
+            elegidos = {elegir(rng, ctx['autores'], ctx['acumulados_autores']) for _ in range(cuantos)}
+            relaciones.extend(Relacion(libro_id=libro_id, autor_id=autor_id) for autor_id in elegidos)
+        Relacion.objects.bulk_create(relaciones, batch_size=ctx['chunk_size'])
+    return len(ids), len(relaciones)
+
+
+def _insertar_libros_args(args):
+    return _insertar_libros(*args)
+
+
+class Command(BaseCommand):
+    help = ('Generate a large synthetic catalog (books, authors, categories, publishers, carts and orders) '
+            'with skewed, Zipf-like popularity using chunked bulk inserts')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--books', type=int, default=1_000_000)
+        parser.add_argument('--authors', type=int, default=100_000)
+        parser.add_argument('--categories', type=int, default=60)
+        parser.add_argument('--publishers', type=int, default=2000)
+        parser.add_argument('--max-authors', type=int, default=4, choices=[1, 2, 3, 4],
+                            help='Maximum authors per book')
+        parser.add_argument('--skew', type=float, default=1.1,
+                            help='Zipf exponent for category, publisher, author and book popularity (0 = uniform)')
+        parser.add_argument('--carts', type=int, default=0, help='Users that get a cart with items')
+        parser.add_argument('--orders', type=int, default=0, help='Orders to create, spread over the selected users')
+        parser.add_argument('--order-days', type=int, default=365,
+                            help='Spread order dates over this many past days, more of them in recent days')
+        parser.add_argument('--users-prefix', default='',
+                            help='Only give carts and orders to users whose username starts with this prefix')
+        parser.add_argument('--chunk-size', type=int, default=10_000)
+        parser.add_argument('--processes', type=int, default=0,
+                            help='Worker processes for the book inserts (0 = this process). '
+                                 'With SQLite only building the rows runs in parallel')
+        parser.add_argument('--seed', type=int, default=None)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        chunk_size = max(options['chunk_size'], 1)
+        inicio = time.perf_counter()
+
+        categorias = self.crear_con_nombre(Categoria, [
+            f'{rng.choice(SUSTANTIVOS).capitalize()} {rng.choice(ADJETIVOS)} {i}' for i in range(options['categories'])
+        ])
+        editoriales = self.crear_con_nombre(Editorial, [
+            f'Ediciones {rng.choice(APELLIDOS)} {i}' for i in range(options['publishers'])
+        ])
+        if not categorias or not editoriales:
+            raise CommandError('At least one category and one publisher are required')
+        autores = []
+        for offset in range(0, options['authors'], chunk_size):
+            with transaction.atomic():
+                ultimo = Autor.objects.order_by('-id').values_list('id', flat=True).first()
+                autores += ids_insertados(Autor, [
+                    Autor(nombre=rng.choice(NOMBRES), apellido=f'{rng.choice(APELLIDOS)} {rng.choice(APELLIDOS)}')
+                    for _ in range(min(chunk_size, options['authors'] - offset))
+                ], chunk_size, ultimo)
+        if not autores:
+            raise CommandError('At least one author is required')
+        self.stdout.write(f'{len(categorias)} categories, {len(editoriales)} publishers, {len(autores)} authors '
+                          f'in {time.perf_counter() - inicio:.1f}s')
+
+        # La popularidad sigue el orden de la lista: barajarla para que no dependa del id
+        for ids in (categorias, editoriales, autores):
+            rng.shuffle(ids)
+        libros, relaciones = self.crear_libros(options, categorias, editoriales, autores, chunk_size, rng)
+        estadisticas.incrementar(estadisticas.LIBROS, libros)
+        self.stdout.write(f'{libros} books with {relaciones} author links in {time.perf_counter() - inicio:.1f}s')
+
+        if options['carts'] or options['orders']:
+            usuarios = User.objects.filter(username__startswith=options['users_prefix']).order_by('id')
+            usuarios = list(usuarios.values_list('id', flat=True)[:max(options['carts'], options['orders'])])
+            if not usuarios:
+                raise CommandError('No users found for carts and orders; create some with generate_users')
+            libros_ids = list(Libro.objects.values_list('id', flat=True))
+            rng.shuffle(libros_ids)
+            acumulados = pesos_zipf(len(libros_ids), options['skew'])
+            if options['carts']:
+                self.crear_carritos(usuarios[:options['carts']], libros_ids, acumulados, chunk_size, rng)
+            if options['orders']:
+                if options['order_days'] < 1:
+                    raise CommandError('--order-days must be at least 1')
+                self.crear_pedidos(usuarios, options['orders'], options['order_days'], libros_ids, acumulados,
+                                   chunk_size, rng)
+                # bulk_create no emite señales: reconstruir panel y resúmenes de pedidos
+                call_command('recalcular_estadisticas', stdout=self.stdout)
+
+        self.stdout.write(self.style.SUCCESS(f'Catalog generated in {time.perf_counter() - inicio:.1f}s'))
+
+    def crear_con_nombre(self, modelo, nombres):
+        """Modelos con nombre único: los existentes se reutilizan"""
+        modelo.objects.bulk_create([modelo(nombre=nombre) for nombre in nombres], ignore_conflicts=True)
+        return list(modelo.objects.filter(nombre__in=nombres).values_list('id', flat=True))
+
+    def crear_libros(self, options, categorias, editoriales, autores, chunk_size, rng):
+        contexto = (categorias, editoriales, autores, options['skew'], options['max_authors'], chunk_size)
+        desde = Libro.objects.count()
+        tareas = [
+            (desde + offset, min(chunk_size, options['books'] - offset), rng.getrandbits(64))
+            for offset in range(0, options['books'], chunk_size)
+        ]
+        libros = relaciones = 0
+        inicio = time.perf_counter()
+        if options['processes'] > 0:
+            if connection.vendor == 'sqlite':
+                # SQLite admite un solo escritor: los procesos arman las filas en paralelo e insertan por turnos
+                contexto += (multiprocessing.Lock(),)
+            # Cada proceso hijo abre su propia conexión; no heredar la del padre
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=options['processes'], initializer=inicializar_django,
+                                     initargs=(f'{__name__}._preparar', *contexto)) as pool:
+                resultados = pool.map(_insertar_libros_args, tareas)
+                for creados, enlaces in resultados:
+                    libros, relaciones = self.progreso(libros + creados, relaciones + enlaces, options, inicio)
+        else:
+            _preparar(*contexto)
+            for tarea in tareas:
+                creados, enlaces = _insertar_libros(*tarea)
+                libros, relaciones = self.progreso(libros + creados, relaciones + enlaces, options, inicio)
+        return libros, relaciones
+
+    def progreso(self, libros, relaciones, options, inicio):
+        transcurrido = time.perf_counter() - inicio
+        self.stdout.write(f'{libros}/{options["books"]} books, {(libros + relaciones) / transcurrido:,.0f} rows/s')
+        return libros, relaciones
+
+    def crear_carritos(self, usuarios, libros, acumulados, chunk_size, rng):
+        # ignore_conflicts omite los carritos existentes: el panel solo suma los nuevos
+        antes = Carrito.objects.count()
+        Carrito.objects.bulk_create([Carrito(usuario_id=usuario_id) for usuario_id in usuarios],
+                                    batch_size=chunk_size, ignore_conflicts=True)
+        estadisticas.incrementar(estadisticas.CARRITOS, Carrito.objects.count() - antes)
+        # Los carritos que ya tienen items (quizá con reservas activas) se dejan como están
+        carritos = list(Carrito.objects.filter(usuario_id__in=usuarios, items__isnull=True)
+                        .values_list('id', flat=True))
+        # Items sin Reserva: equivalen a carritos cuya retención de stock ya expiró
+        items = []
+        for carrito_id in carritos:
+            elegidos = {elegir(rng, libros, acumulados) for _ in range(rng.randint(1, 5))}
+            items.extend(ItemCarrito(carrito_id=carrito_id, libro_id=libro_id, cantidad=rng.randint(1, 3))
+                         for libro_id in elegidos)
+        ItemCarrito.objects.bulk_create(items, batch_size=chunk_size)
+        self.stdout.write(f'{len(carritos)} carts filled with {len(items)} items')
+
+    def crear_pedidos(self, usuarios, total, dias, libros, acumulados, chunk_size, rng):
+        creados = items = 0
+        ahora = timezone.now()
+        for offset in range(0, total, chunk_size):
+            cantidad = min(chunk_size, total - offset)
+            lineas = []
+            for _ in range(cantidad):
+                elegidos = {elegir(rng, libros, acumulados) for _ in range(rng.randint(1, 4))}
+                lineas.append([(libro_id, rng.randint(1, 3), precio_aleatorio(rng)) for libro_id in elegidos])
+            # Más pedidos recientes que antiguos, a cualquier hora
+            fechas = [ahora - timedelta(days=min(int(rng.expovariate(4 / dias)), dias - 1),
+                                        seconds=rng.randrange(86400))
+                      for _ in range(cantidad)]
+            with transaction.atomic():
+                ultimo = Pedido.objects.order_by('-id').values_list('id', flat=True).first()
+                pedidos = ids_insertados(Pedido, [
+                    Pedido(
+                        usuario_id=rng.choice(usuarios),
+                        total=sum(unidades * precio for _, unidades, precio in detalle),
+                        estado=rng.choices(ESTADOS_PEDIDO, weights=PESOS_ESTADOS_PEDIDO)[0],
+                        direccion_envio=f'Calle {rng.choice(APELLIDOS)} {rng.randint(1, 9999)}',
+                    )
+                    for detalle in lineas
+                ], chunk_size, ultimo)
+                # auto_now_add pisa la fecha en bulk_create: se fija después
+                Pedido.objects.bulk_update(
+                    [Pedido(pk=pedido_id, fecha=fecha) for pedido_id, fecha in zip(pedidos, fechas)],
+                    ['fecha'], batch_size=chunk_size,
+                )
+                filas = [
+                    ItemPedido(pedido_id=pedido_id, libro_id=libro_id, cantidad=unidades, precio_unitario=precio)
+                    for pedido_id, detalle in zip(pedidos, lineas)
+                    for libro_id, unidades, precio in detalle
+                ]
+                ItemPedido.objects.bulk_create(filas, batch_size=chunk_size)
+            creados += len(pedidos)
+            items += len(filas)
+        self.stdout.write(f'{creados} orders with {items} items')
@@ -0,0 +1,113 @@
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core import estadisticas
+from core.models import UserProfile, Carrito
+
+ROLES = [role for role, _ in UserProfile.ROLE_CHOICES]
+# Todos los usuarios comparten una contraseña conocida: los roles con privilegios solo se
+# crean si se piden explícitamente en --roles
+ROLES_POR_DEFECTO = 'USER=92,GUEST=8'
+
+
+def parse_roles(value):
+    """'USER=90,GUEST=8,MODERATOR=1.5,ADMIN=0.5' -> ([roles], [pesos])"""
+    roles, pesos = [], []
+    for parte in value.split(','):
+        role, _, peso = parte.partition('=')
+        role = role.strip().upper()
+        if role not in ROLES:
+            raise CommandError(f'Unknown role {role!r}; expected one of {", ".join(ROLES)}')
+        try:
+            pesos.append(float(peso))
+        except ValueError:
+            raise CommandError(f'Invalid weight for role {role}: {peso!r}')
+        roles.append(role)
+    if sum(pesos) <= 0:
+        raise CommandError('Role weights must add up to more than 0')
+    return roles, pesos
+
+
+class Command(BaseCommand):
+    help = 'Generate many users with profiles and carts for load testing (bulk inserts, pre-hashed passwords)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=100_000)
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--prefix', default='loadtest_')
+        parser.add_argument('--password', default='LoadTest123!', help='Password shared by every generated user')
+        parser.add_argument('--hash-pool', type=int, default=16,
+                            help='Distinct password hashes (salts) computed once and reused')
+        parser.add_argument('--processes', type=int, default=0,
+                            help='Worker processes for hashing the pool (0 = hash in this process)')
+        parser.add_argument('--roles', default=ROLES_POR_DEFECTO,
+                            help='Weighted roles, e.g. USER=90,GUEST=8,MODERATOR=1.5,ADMIN=0.5; '
+                                 'privileged roles are only created when listed here')
+        parser.add_argument('--no-carts', action='store_true', help='Do not create a cart per user')
+        parser.add_argument('--seed', type=int, default=None)
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG:
+            raise CommandError('generate_users creates accounts with a shared known password; '
+                               'refusing to run with DEBUG=False')
+        roles, pesos = parse_roles(options['roles'])
+        rng = random.Random(options['seed'])
+        prefix = options['prefix']
+        chunk_size = options['chunk_size']
+
+        inicio = time.perf_counter()
+        hashes = self.hash_pool(options['password'], options['hash_pool'], options['processes'])
+        self.stdout.write(f'Hashed {len(hashes)} passwords in {time.perf_counter() - inicio:.2f}s')
+
+        # Continuar la numeración si ya hay usuarios generados con este prefijo
+        desde = User.objects.filter(username__startswith=prefix).count()
+        total = options['count']
+        filas = 0
+        inicio = time.perf_counter()
+        for offset in range(0, total, chunk_size):
+            numeros = range(desde + offset, desde + min(offset + chunk_size, total))
+            filas += self.insert_chunk(prefix, numeros, hashes, roles, pesos, rng, not options['no_carts'])
+            transcurrido = time.perf_counter() - inicio
+            self.stdout.write(f'{offset + len(numeros)}/{total} users, {filas / transcurrido:,.0f} rows/s')
+
+        # bulk_create no emite post_save: ajustar los contadores del panel en bloque
+        estadisticas.incrementar(estadisticas.USUARIOS, total)
+        if not options['no_carts']:
+            estadisticas.incrementar(estadisticas.CARRITOS, total)
+
+        transcurrido = time.perf_counter() - inicio
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {total} users ({filas} rows) in {transcurrido:.1f}s, {filas / transcurrido:,.0f} rows/s'
+        ))
+
+    def hash_pool(self, password, size, processes):
+        size = max(size, 1)
+        if processes > 0:
+            with ProcessPoolExecutor(max_workers=processes) as pool:
+                return list(pool.map(make_password, [password] * size))
+        return [make_password(password) for _ in range(size)]
+
+    def insert_chunk(self, prefix, numeros, hashes, roles, pesos, rng, carts):
+        usernames = [f'{prefix}{n:07d}' for n in numeros]
+        with transaction.atomic():
+            User.objects.bulk_create([
+                User(username=username, email=f'{username}@loadtest.example', password=rng.choice(hashes))
+                for username in usernames
+            ], batch_size=len(usernames))
+            # Los ids se leen de vuelta para no depender de RETURNING en bulk_create
+            ids = list(User.objects.filter(username__in=usernames).values_list('id', flat=True))
+            asignados = rng.choices(roles, weights=pesos, k=len(ids))
+            UserProfile.objects.bulk_create(
+                [UserProfile(user_id=user_id, role=role) for user_id, role in zip(ids, asignados)],
+                batch_size=len(ids),
+            )
+            if carts:
+                Carrito.objects.bulk_create([Carrito(usuario_id=user_id) for user_id in ids], batch_size=len(ids))
+        return len(ids) * (3 if carts else 2)
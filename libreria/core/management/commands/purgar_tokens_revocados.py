@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from core.tokens import purge_expired
+
+
+class Command(BaseCommand):
+    help = 'Delete revoked refresh-token JTIs whose tokens have already expired'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        total = purge_expired(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Purged {total} expired revoked tokens'))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core import estadisticas, pedidos
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the pre-aggregated dashboard statistics (and per-user order summaries) in bulk'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help='Only rebuild daily sales for the last N days (periodic rollup). Default: full history')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--skip-order-summaries', action='store_true',
+                            help='Do not rebuild ResumenPedidos')
+
+    def handle(self, *args, **options):
+        if options['days'] is not None and options['days'] < 1:
+            raise CommandError('--days must be at least 1')
+        resultado = estadisticas.recalcular(dias=options['days'], batch_size=options['batch_size'])
+        for clave, valor in resultado.items():
+            self.stdout.write(f'{clave}: {valor}')
+
+        if not options['skip_order_summaries']:
+            total = pedidos.recalcular_resumenes(batch_size=options['batch_size'])
+            self.stdout.write(f'order summaries: {total}')
+
+        self.stdout.write(self.style.SUCCESS('Statistics rebuilt'))
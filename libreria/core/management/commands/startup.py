@@ -0,0 +1,200 @@
+"""
+Arranque del contenedor en un solo proceso de Django (entrypoint.sh).
+
+En lugar de correr `migrate` y `collectstatic` completos en cada arranque, comprueba
+primero si hay algo que hacer:
+
+- Migraciones: calcula el plan pendiente; si está vacío no toca la base. Si hay que
+  migrar toma un lock de la base (pg_advisory_lock / GET_LOCK, o un archivo junto a la
+  base en SQLite: flock, o msvcrt.locking en Windows) para que solo una instancia migre,
+  y vuelve a calcular el plan ya con el lock por si otra lo hizo mientras esperaba.
+- Estáticos: huella de los archivos fuente (ruta, tamaño y fecha de cada uno, sin leerlos)
+  comparada con la guardada en el último collectstatic. Se guarda en BASE_DIR y no en
+  STATIC_ROOT, que se sirve públicamente.
+"""
+import hashlib
+import json
+import os
+import time
+import zlib
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import ManifestFilesMixin, staticfiles_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+from django.db.migrations.executor import MigrationExecutor
+
+# Clave del advisory lock de PostgreSQL (bigint) y nombre del lock de MySQL
+LOCK_ID = zlib.crc32(b'libreria.migrate')
+LOCK_NAME = 'libreria.migrate'
+STAMP_NAME = 'startup-stamp.json'
+
+
+def plan_pendiente():
+    executor = MigrationExecutor(connection)
+    return executor.migration_plan(executor.loader.graph.leaf_nodes())
+
+
+@contextmanager
+def bloqueo_migraciones():
+    """Lock exclusivo entre instancias mientras se migra"""
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_lock(%s)', [LOCK_ID])
+        try:
+            yield
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_advisory_unlock(%s)', [LOCK_ID])
+    elif connection.vendor == 'mysql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT GET_LOCK(%s, -1)', [LOCK_NAME])
+        try:
+            yield
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT RELEASE_LOCK(%s)', [LOCK_NAME])
+    else:
+        # SQLite: las instancias comparten el archivo de la base, y por lo tanto el host
+        with bloqueo_archivo(f"{connection.settings_dict['NAME']}.migrate.lock"):
+            yield
+
+
+@contextmanager
+def bloqueo_archivo(ruta):
+    """Lock exclusivo sobre un archivo: flock en POSIX, msvcrt.locking del primer byte en Windows"""
+    with open(ruta, 'w') as archivo:
+        if fcntl is not None:
+            fcntl.flock(archivo, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(archivo, fcntl.LOCK_UN)
+            return
+        # LK_LOCK deja de reintentar a los 10 s con OSError: seguir esperando, como flock
+        while True:
+            try:
+                msvcrt.locking(archivo.fileno(), msvcrt.LK_LOCK, 1)
+                break
+            except OSError:
+                pass
+        try:
+            yield
+        finally:
+            archivo.seek(0)
+            msvcrt.locking(archivo.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def huella_estaticos():
+    """Hash de los archivos que recolectaría collectstatic y de la configuración del storage"""
+    sha = hashlib.sha256(repr((settings.STATIC_URL, settings.STORAGES['staticfiles'])).encode())
+    archivos = []
+    for finder in finders.get_finders():
+        for ruta, storage in finder.list(['CVS', '.*', '*~']):
+            prefijo = getattr(storage, 'prefix', None) or ''
+            stat = os.stat(storage.path(ruta))
+            archivos.append((os.path.join(prefijo, ruta), stat.st_size, stat.st_mtime_ns))
+    for archivo in sorted(archivos):
+        sha.update(repr(archivo).encode())
+    return sha.hexdigest(), len(archivos)
+
+
+def ruta_huella():
+    return os.path.join(settings.BASE_DIR, STAMP_NAME)
+
+
+def huella_guardada():
+    """Huella del último collectstatic, si lo recolectado sigue en su sitio"""
+    try:
+        with open(ruta_huella()) as archivo:
+            guardada = json.load(archivo)
+    except (OSError, ValueError):
+        return None
+    # La huella vive fuera de STATIC_ROOT: no vale si los estáticos se borraron o se movieron
+    if guardada.get('static_root') != str(settings.STATIC_ROOT) or not os.path.isdir(settings.STATIC_ROOT):
+        return None
+    if isinstance(staticfiles_storage, ManifestFilesMixin) and \
+            not staticfiles_storage.exists(staticfiles_storage.manifest_name):
+        return None
+    return guardada.get('sources')
+
+
+def guardar_huella(huella):
+    with open(ruta_huella(), 'w') as archivo:
+        json.dump({'sources': huella, 'static_root': str(settings.STATIC_ROOT)}, archivo)
+    # Versiones anteriores la guardaban en STATIC_ROOT
+    if staticfiles_storage.exists(STAMP_NAME):
+        staticfiles_storage.delete(STAMP_NAME)
+
+
+class Command(BaseCommand):
+    help = ('Container startup: wait for the database, migrate and collect static files only when '
+            'something is pending, and report how long each step took')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--no-migrate', action='store_true', help='Skip the database steps (image build)')
+        parser.add_argument('--no-static', action='store_true', help='Skip the static files check')
+        parser.add_argument('--db-retries', type=int, default=30)
+        parser.add_argument('--db-retry-delay', type=float, default=2)
+
+    def handle(self, *args, **options):
+        tiempos = []
+        # entrypoint.sh exporta STARTUP_T0 (date +%s.%N) para medir también el arranque de Python/Django
+        if os.environ.get('STARTUP_T0'):
+            tiempos.append(('python + django setup', time.time() - float(os.environ['STARTUP_T0']), ''))
+
+        if not options['no_migrate']:
+            inicio = time.perf_counter()
+            intentos = self.esperar_base(options['db_retries'], options['db_retry_delay'])
+            tiempos.append(('database', time.perf_counter() - inicio, f'{intentos} attempt(s)'))
+
+            inicio = time.perf_counter()
+            pendientes = plan_pendiente()
+            tiempos.append(('migration plan', time.perf_counter() - inicio, f'{len(pendientes)} pending'))
+            if pendientes:
+                inicio = time.perf_counter()
+                with bloqueo_migraciones():
+                    espera = time.perf_counter() - inicio
+                    # Otra instancia pudo haber migrado mientras se esperaba el lock
+                    pendientes = plan_pendiente()
+                    if pendientes:
+                        call_command('migrate', interactive=False, verbosity=max(options['verbosity'] - 1, 0))
+                tiempos.append(('migrate', time.perf_counter() - inicio,
+                                f'{len(pendientes)} applied, {espera:.2f}s waiting for the lock'))
+
+        if not options['no_static']:
+            inicio = time.perf_counter()
+            huella, archivos = huella_estaticos()
+            al_dia = huella_guardada() == huella
+            tiempos.append(('static check', time.perf_counter() - inicio,
+                            f'{archivos} source files, {"up to date" if al_dia else "changed"}'))
+            if not al_dia:
+                inicio = time.perf_counter()
+                call_command('collectstatic', interactive=False, verbosity=max(options['verbosity'] - 1, 0))
+                guardar_huella(huella)
+                tiempos.append(('collectstatic', time.perf_counter() - inicio, ''))
+
+        for paso, segundos, detalle in tiempos:
+            self.stdout.write(f'startup: {paso:<22} {segundos:>7.2f}s  {detalle}'.rstrip())
+        self.stdout.write(f'startup: {"total":<22} {sum(t[1] for t in tiempos):>7.2f}s')
+
+    def esperar_base(self, reintentos, espera):
+        for intento in range(1, reintentos + 1):
+            try:
+                connection.ensure_connection()
+                return intento
+            except OperationalError as e:
+                if intento == reintentos:
+                    raise CommandError(f'Database not available after {reintentos} attempts: {e}')
+                self.stdout.write(f'Waiting for database... ({intento}/{reintentos})')
+                connection.close()
+                time.sleep(espera)
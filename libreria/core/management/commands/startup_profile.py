@@ -0,0 +1,144 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Se ejecuta en un intérprete nuevo con -X importtime: mide lo que paga cada worker al arrancar.
+# AppConfig.create importa el módulo de cada app; se envuelve junto con import_models() y
+# ready() de cada instancia. Imprime un JSON en stdout (importtime escribe en stderr).
+SCRIPT = '''
+import json, time
+inicio = time.perf_counter()
+import django
+from django.apps import AppConfig
+
+apps = {}
+crear = AppConfig.create
+
+
+def medir(etiqueta, fase, funcion):
+    def envuelta(*args, **kwargs):
+        t = time.perf_counter()
+        try:
+            return funcion(*args, **kwargs)
+        finally:
+            apps.setdefault(etiqueta, {})[fase] = time.perf_counter() - t
+    return envuelta
+
+
+def create(cls, entry):
+    t = time.perf_counter()
+    app_config = crear(entry)
+    apps.setdefault(app_config.label, {})['import'] = time.perf_counter() - t
+    app_config.import_models = medir(app_config.label, 'models', app_config.import_models)
+    app_config.ready = medir(app_config.label, 'ready', app_config.ready)
+    return app_config
+
+
+AppConfig.create = classmethod(create)
+fases = {}
+t = time.perf_counter()
+django.setup()
+fases['django.setup'] = time.perf_counter() - t
+from django.core.wsgi import get_wsgi_application
+t = time.perf_counter()
+get_wsgi_application()
+fases['middleware'] = time.perf_counter() - t
+from django.urls import get_resolver
+t = time.perf_counter()
+get_resolver().url_patterns
+fases['urlconf'] = time.perf_counter() - t
+fases['total'] = time.perf_counter() - inicio
+print(json.dumps({'phases': fases, 'apps': apps}))
+'''
+
+
+def leer_importtime(stderr):
+    """{módulo: (propio, acumulado)} en segundos a partir de la salida de -X importtime"""
+    modulos = {}
+    for linea in stderr.splitlines():
+        if not linea.startswith('import time:') or 'cumulative' in linea:
+            continue
+        propio, acumulado, nombre = linea[len('import time:'):].split('|')
+        modulos[nombre.strip()] = (int(propio) / 1e6, int(acumulado) / 1e6)
+    return modulos
+
+
+def perfilar(env):
+    proceso = subprocess.run([sys.executable, '-X', 'importtime', '-c', SCRIPT], cwd=settings.BASE_DIR,
+                             env=env, capture_output=True, text=True)
+    if proceso.returncode != 0:
+        raise CommandError(f'Profiling process failed:\n{proceso.stderr[-2000:]}')
+    resultado = json.loads(proceso.stdout.strip().splitlines()[-1])
+    resultado['modules'] = leer_importtime(proceso.stderr)
+    return resultado
+
+
+class Command(BaseCommand):
+    help = ('Profile worker startup in a fresh interpreter: import time per module and package, '
+            'import/models/ready() time per app, and middleware and URLconf loading')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=3, help='Runs per profile; the median run is reported')
+        parser.add_argument('--top', type=int, default=15, help='Modules and packages to list')
+        parser.add_argument('--compare', action='store_true',
+                            help='Profile with DEV_TOOLS=True and DEV_TOOLS=False and compare the totals')
+        parser.add_argument('--output', help='Write the JSON report to this file')
+
+    def handle(self, *args, **options):
+        perfiles = {'dev_tools': 'True', 'production': 'False'} if options['compare'] else {'current': None}
+        informe = {'runs': options['runs'], 'profiles': {}}
+        for nombre, dev_tools in perfiles.items():
+            env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE',
+                                                                         'libreria.settings'))
+            if dev_tools is not None:
+                env['DEV_TOOLS'] = dev_tools
+            # La primera ejecución puede compilar .pyc: se descarta
+            perfilar(env)
+            corridas = sorted((perfilar(env) for _ in range(options['runs'])),
+                              key=lambda r: r['phases']['total'])
+            resultado = corridas[len(corridas) // 2]
+            informe['profiles'][nombre] = resultado
+            self.reportar(nombre, resultado, corridas, options['top'])
+
+        if options['compare']:
+            dev, prod = (informe['profiles'][p]['phases']['total'] for p in ('dev_tools', 'production'))
+            self.stdout.write(f'\nproduction profile: {prod * 1000:.0f} ms vs {dev * 1000:.0f} ms with dev tools '
+                              f'({(prod - dev) / dev * 100:+.0f}%)')
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(informe, f, indent=2)
+            self.stdout.write(f'Report written to {options["output"]}')
+
+    def reportar(self, nombre, resultado, corridas, top):
+        fases = resultado['phases']
+        mediana = statistics.median(r['phases']['total'] for r in corridas)
+        self.stdout.write(self.style.MIGRATE_HEADING(f'{nombre}: {mediana * 1000:.0f} ms to a ready worker'))
+        for fase, segundos in fases.items():
+            if fase != 'total':
+                self.stdout.write(f'  {fase:<30} {segundos * 1000:>8.1f} ms')
+
+        self.stdout.write('  apps (import / models / ready):')
+        apps = sorted(resultado['apps'].items(), key=lambda a: -sum(a[1].values()))
+        for etiqueta, tiempos in apps[:top]:
+            partes = ' / '.join(f'{tiempos.get(f, 0) * 1000:6.1f}' for f in ('import', 'models', 'ready'))
+            self.stdout.write(f'    {etiqueta:<28} {partes} ms')
+
+        # Tiempo propio sumado por paquete de primer nivel: suma el total de imports sin contar dos veces
+        paquetes = defaultdict(float)
+        for modulo, (propio, _) in resultado['modules'].items():
+            paquetes[modulo.split('.')[0]] += propio
+        self.stdout.write(f'  packages (self import time, {sum(paquetes.values()) * 1000:.0f} ms total):')
+        for paquete, segundos in sorted(paquetes.items(), key=lambda p: -p[1])[:top]:
+            self.stdout.write(f'    {paquete:<28} {segundos * 1000:>8.1f} ms')
+
+        self.stdout.write('  modules (cumulative import time):')
+        modulos = sorted(resultado['modules'].items(), key=lambda m: -m[1][1])
+        for modulo, (_, acumulado) in modulos[:top]:
+            self.stdout.write(f'    {modulo:<50} {acumulado * 1000:>8.1f} ms')
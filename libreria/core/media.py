@@ -0,0 +1,148 @@
+"""
+Entrega de archivos media (portadas de libros) con DEBUG=False.
+
+Las portadas (MEDIA_PUBLIC_PREFIXES) son públicas. La media privada de cada usuario va en
+MEDIA_USER_PREFIX/<id del usuario>/ y solo la reciben su dueño y el staff; el resto de los
+archivos fuera de los prefijos públicos, solo el staff. Sin permiso se responde 404, igual
+que si el archivo no existiera.
+
+La vista solo decide si el archivo puede servirse y resuelve las cabeceras condicionales
+(ETag / If-None-Match, Last-Modified / If-Modified-Since). Con MEDIA_ACCEL_MODE='nginx'
+o 'apache' la transferencia de bytes se delega al servidor web mediante
+X-Accel-Redirect o X-Sendfile, que también atiende los Range. Sin servidor delante,
+la vista responde Range de un solo intervalo (206) leyendo solo el tramo pedido.
+"""
+import mimetypes
+import os
+import posixpath
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import (
+    FileResponse, Http404, HttpResponse, HttpResponseNotModified, StreamingHttpResponse,
+)
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_http_date_safe
+
+CHUNK_SIZE = 64 * 1024
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def media_etag(stat):
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def is_public(path):
+    prefixes = getattr(settings, 'MEDIA_PUBLIC_PREFIXES', ('libros/',))
+    return any(path.startswith(prefix) for prefix in prefixes)
+
+
+def can_access(user, path):
+    if is_public(path):
+        return True
+    if not user.is_authenticated:
+        return False
+    if user.is_staff:
+        return True
+    return path.startswith(f"{getattr(settings, 'MEDIA_USER_PREFIX', 'usuarios/')}{user.pk}/")
+
+
+def _not_modified(request, etag, mtime):
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match is not None:
+        return if_none_match.strip() == '*' or etag in [tag.strip() for tag in if_none_match.split(',')]
+    since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE') or '')
+    return since is not None and int(mtime) <= since
+
+
+def parse_range(header, size):
+    """(inicio, fin) inclusivo para un Range de un solo intervalo; None si no aplica; () si no es satisfacible"""
+    match = RANGE_RE.match((header or '').strip())
+    if not match:
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        length = int(end)
+        if length == 0:
+            return ()
+        return max(size - length, 0), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        return ()
+    return start, end
+
+
+def _range_applies(request, etag, mtime):
+    """If-Range: solo servir el intervalo si el archivo no cambió desde que el cliente lo vio"""
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith('"') or if_range.startswith('W/'):
+        return if_range.strip() == etag
+    since = parse_http_date_safe(if_range)
+    return since is not None and int(mtime) <= since
+
+
+def _read_range(path, start, length):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def serve_media(request, path, document_root=None):
+    path = posixpath.normpath(path).lstrip('/')
+    try:
+        fullpath = safe_join(document_root or settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404('Not found')
+    if not os.path.isfile(fullpath):
+        raise Http404('Not found')
+    if not can_access(request.user, path):
+        raise Http404('Not found')
+
+    stat = os.stat(fullpath)
+    etag = media_etag(stat)
+    content_type, _ = mimetypes.guess_type(fullpath)
+    content_type = content_type or 'application/octet-stream'
+
+    if _not_modified(request, etag, stat.st_mtime):
+        response = HttpResponseNotModified()
+    else:
+        mode = getattr(settings, 'MEDIA_ACCEL_MODE', '')
+        byte_range = parse_range(request.META.get('HTTP_RANGE'), stat.st_size) \
+            if _range_applies(request, etag, stat.st_mtime) else None
+
+        if mode == 'nginx':
+            response = HttpResponse(content_type=content_type)
+            response['X-Accel-Redirect'] = getattr(settings, 'MEDIA_ACCEL_PREFIX', '/protected-media/') + quote(path)
+        elif mode == 'apache':
+            response = HttpResponse(content_type=content_type)
+            response['X-Sendfile'] = fullpath
+        elif byte_range == ():
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{stat.st_size}'
+        elif byte_range:
+            start, end = byte_range
+            response = StreamingHttpResponse(_read_range(fullpath, start, end - start + 1),
+                                             status=206, content_type=content_type)
+            response['Content-Length'] = end - start + 1
+            response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+        else:
+            response = FileResponse(open(fullpath, 'rb'), content_type=content_type)
+        response['Accept-Ranges'] = 'bytes'
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['Cache-Control'] = ('public, ' if is_public(path) else 'private, ') + \
+        f"max-age={getattr(settings, 'MEDIA_CACHE_SECONDS', 86400)}"
+    return response
@@ -1,12 +1,19 @@
+import gzip
 import logging
 import time
+import zlib
 from django.core.cache import cache
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, FileResponse
+from django.utils.cache import patch_vary_headers
 from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
 from django.utils.deprecation import MiddlewareMixin
 from django.contrib.auth.models import AnonymousUser
 import json
 
+from . import routers
+from .staticfiles import accepted_encodings, brotli
+
 logger = logging.getLogger('security')
 
 class RateLimitMiddleware(MiddlewareMixin):
@@ -48,10 +55,17 @@ class RateLimitMiddleware(MiddlewareMixin):
         """Verificar si se ha excedido el rate limit"""
         cache_key = f"rate_limit:{endpoint_type}:{client_ip}"
         
-        # Obtener contador actual
-        current_count = cache.get(cache_key, 0)
+        # Contar la petición de forma atómica (add + incr): con leer y volver a escribir
+        # el contador, las peticiones simultáneas de otros workers se pierden
+        cache.add(cache_key, 0, window)
+        try:
+            current_count = cache.incr(cache_key)
+        except ValueError:
+            # Expiró entre add() e incr(): empieza una ventana nueva
+            cache.set(cache_key, 1, window)
+            current_count = 1
         
-        if current_count >= limit:
+        if current_count > limit:
             # Log del intento de rate limiting
             logger.warning(f"Rate limit exceeded for IP {client_ip} on {endpoint_type} endpoint. "
                          f"Count: {current_count}, Limit: {limit}")
@@ -65,9 +79,6 @@ class RateLimitMiddleware(MiddlewareMixin):
             response.status_code = 429
             return response
         
-        # Incrementar contador
-        cache.set(cache_key, current_count + 1, window)
-        
         return None
 
 
@@ -149,4 +160,130 @@ class XSSProtectionMiddleware(MiddlewareMixin):
         if not settings.DEBUG:
             response['Strict-Transport-Security'] = 'max-age=31536000; includeSubDomains; preload'
         
-        return response
\ No newline at end of file
+        return response
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Compresión gzip/Brotli de respuestas dinámicas (JSON de la API, HTML, CSV).
+
+    - Negocia por Accept-Encoding; Brotli solo si el paquete está instalado.
+    - Omite cuerpos pequeños, tipos ya comprimidos, respuestas con Content-Encoding,
+      archivos (FileResponse, X-Accel-Redirect/X-Sendfile) y respuestas parciales.
+    - Las StreamingHttpResponse (sync o async) se comprimen por fragmentos, vaciando el
+      compresor en cada uno para no retener datos.
+    - BREACH: no comprime las rutas de COMPRESSION_EXCLUDE_PATHS, cuyas respuestas
+      reflejan datos del request junto a secretos (tokens JWT de login/registro/refresh),
+      ni las respuestas que fijan cookies (inicio de sesión, token CSRF nuevo): son las que
+      suelen llevar el secreto recién emitido también en el cuerpo.
+    """
+    COMPRESSIBLE_TYPES = (
+        'text/', 'application/json', 'application/javascript', 'application/xml', 'image/svg+xml',
+    )
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.min_size = getattr(settings, 'COMPRESSION_MIN_SIZE', 512)
+        self.gzip_level = getattr(settings, 'COMPRESSION_GZIP_LEVEL', 6)
+        self.brotli_quality = getattr(settings, 'COMPRESSION_BROTLI_QUALITY', 4)
+        self.exclude_paths = tuple(getattr(settings, 'COMPRESSION_EXCLUDE_PATHS', ()))
+
+    def process_response(self, request, response):
+        if not self.should_compress(request, response):
+            return response
+        encoding = self.choose_encoding(request)
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = self.compress_async(response.streaming_content, encoding)
+            else:
+                response.streaming_content = self.compress_stream(response.streaming_content, encoding)
+            del response.headers['Content-Length']
+        else:
+            if len(response.content) < self.min_size:
+                return response
+            compressed = self.compress(response.content, encoding)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+
+        # El cuerpo ya no es idéntico byte a byte: ETag débil, como GZipMiddleware
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+        return response
+
+    def should_compress(self, request, response):
+        if response.status_code != 200 or response.has_header('Content-Encoding'):
+            return False
+        if isinstance(response, FileResponse) or response.has_header('X-Accel-Redirect') \
+                or response.has_header('X-Sendfile'):
+            return False
+        if 'no-transform' in response.get('Cache-Control', ''):
+            return False
+        if request.path.startswith(self.exclude_paths) or response.cookies:
+            return False
+        content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+        return content_type.startswith(self.COMPRESSIBLE_TYPES)
+
+    def choose_encoding(self, request):
+        accepted = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING'))
+        if brotli is not None and 'br' in accepted:
+            return 'br'
+        if 'gzip' in accepted:
+            return 'gzip'
+        return None
+
+    def compress(self, data, encoding):
+        if encoding == 'br':
+            return brotli.compress(data, quality=self.brotli_quality)
+        return gzip.compress(data, compresslevel=self.gzip_level)
+
+    def _compressor(self, encoding):
+        """(comprimir_fragmento, finalizar) para una compresión incremental"""
+        if encoding == 'br':
+            compressor = brotli.Compressor(quality=self.brotli_quality)
+            return (lambda chunk: compressor.process(chunk) + compressor.flush()), compressor.finish
+        compressor = zlib.compressobj(self.gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        return (lambda chunk: compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)), compressor.flush
+
+    def compress_stream(self, chunks, encoding):
+        process, finish = self._compressor(encoding)
+        for chunk in chunks:
+            if chunk:
+                yield process(chunk)
+        yield finish()
+
+    async def compress_async(self, chunks, encoding):
+        process, finish = self._compressor(encoding)
+        async for chunk in chunks:
+            if chunk:
+                yield process(chunk)
+        yield finish()
+
+
+class ReplicaPinningMiddleware(MiddlewareMixin):
+    """
+    Lectura de las propias escrituras con réplicas (core/routers.py): tras una petición
+    que escribe, el cliente lee del primario durante REPLICA_PIN_SECONDS
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'DATABASE_REPLICAS', ()):
+            raise MiddlewareNotUsed()
+        super().__init__(get_response)
+
+    def process_request(self, request):
+        routers.iniciar_peticion(settings.REPLICA_PIN_COOKIE in request.COOKIES)
+
+    def process_response(self, request, response):
+        if routers.terminar_peticion():
+            response.set_cookie(
+                settings.REPLICA_PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS,
+                secure=request.is_secure(), httponly=True, samesite='Lax',
+            )
+        return response
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.1 on 2026-10-19 14:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_alter_libro_id_userprofile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='libro',
+            name='stock_reservado',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='Reserva',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cantidad', models.PositiveIntegerField()),
+                ('expira_en', models.DateTimeField(db_index=True)),
+                ('item', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='reserva', to='core.itemcarrito')),
+                ('libro', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservas', to='core.libro')),
+            ],
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.1 on 2026-10-19 14:25
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_reservas_stock'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenPedidos',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_pedidos', models.PositiveIntegerField(default=0)),
+                ('gasto_total', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['usuario', '-fecha', '-id'], name='pedido_usuario_fecha_idx'),
+        ),
+        migrations.AddField(
+            model_name='resumenpedidos',
+            name='usuario',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='resumen_pedidos', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
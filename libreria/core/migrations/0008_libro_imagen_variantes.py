@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-19 14:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_tokens_revocados'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='libro',
+            name='imagen_variantes',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
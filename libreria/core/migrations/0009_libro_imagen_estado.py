@@ -0,0 +1,23 @@
+# Generated by Django 5.2.1 on 2026-10-19 14:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_libro_imagen_variantes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='libro',
+            name='imagen_estado',
+            field=models.CharField(choices=[('LISTA', 'Lista'), ('PENDIENTE', 'Pendiente'), ('ERROR', 'Error')], default='LISTA', editable=False, max_length=10),
+        ),
+        migrations.AddField(
+            model_name='libro',
+            name='imagen_subida',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+    ]
@@ -0,0 +1,41 @@
+from django.db import migrations
+from django.db.models import Count, Max, Sum
+
+
+def deduplicar(apps, schema_editor):
+    """
+    Une los ItemCarrito repetidos (mismo carrito y libro) antes de la restricción única de
+    0011: queda el de menor id con la suma de cantidades y una sola Reserva con las
+    unidades de todas, así `Libro.stock_reservado` no cambia.
+    """
+    ItemCarrito = apps.get_model('core', 'ItemCarrito')
+    Reserva = apps.get_model('core', 'Reserva')
+    repetidos = (ItemCarrito.objects.values('carrito_id', 'libro_id')
+                 .annotate(n=Count('id')).filter(n__gt=1).order_by())
+    for grupo in repetidos.iterator():
+        items = list(ItemCarrito.objects.filter(carrito_id=grupo['carrito_id'], libro_id=grupo['libro_id'])
+                     .order_by('id'))
+        conservado, sobrantes = items[0], items[1:]
+        reservas = Reserva.objects.filter(item__in=items)
+        totales = reservas.aggregate(cantidad=Sum('cantidad'), expira_en=Max('expira_en'))
+        reserva = reservas.order_by('item_id').first()
+        if reserva is not None:
+            reservas.exclude(pk=reserva.pk).delete()
+            reserva.item = conservado
+            reserva.cantidad = totales['cantidad']
+            reserva.expira_en = totales['expira_en']
+            reserva.save(update_fields=['item', 'cantidad', 'expira_en'])
+        conservado.cantidad = sum(item.cantidad for item in items)
+        conservado.save(update_fields=['cantidad'])
+        ItemCarrito.objects.filter(pk__in=[item.pk for item in sobrantes]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_libro_imagen_estado'),
+    ]
+
+    operations = [
+        migrations.RunPython(deduplicar, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.1 on 2026-10-19 15:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """
+    Índices compuestos para los filtros y el orden de las vistas (ver `explain_queries`).
+    Los índices nuevos se crean antes de quitar los de una sola columna que reemplazan.
+    """
+
+    dependencies = [
+        ('core', '0010_deduplicar_items_carrito'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='itemcarrito',
+            constraint=models.UniqueConstraint(fields=('carrito', 'libro'), name='itemcarrito_carrito_libro_uniq'),
+        ),
+        migrations.AddIndex(
+            model_name='libro',
+            index=models.Index(fields=['categoria', '-id'], name='libro_categoria_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='libro',
+            index=models.Index(fields=['editorial', '-id'], name='libro_editorial_id_idx'),
+        ),
+        migrations.AlterField(
+            model_name='itemcarrito',
+            name='carrito',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='items', to='core.carrito'),
+        ),
+        migrations.AlterField(
+            model_name='libro',
+            name='categoria',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='libros', to='core.categoria'),
+        ),
+        migrations.AlterField(
+            model_name='libro',
+            name='editorial',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='libros', to='core.editorial'),
+        ),
+        # Libros de un autor (autor_detalle): WHERE autor_id = ? con el libro_id en el índice.
+        # La tabla intermedia es automática, no tiene Meta.indexes
+        migrations.RunSQL(
+            sql='CREATE INDEX IF NOT EXISTS core_libro_autores_autor_libro_idx '
+                'ON core_libro_autores (autor_id, libro_id);',
+            reverse_sql='DROP INDEX IF EXISTS core_libro_autores_autor_libro_idx;',
+        ),
+    ]
@@ -0,0 +1,23 @@
+from django.db import migrations
+
+
+def poblar(apps, schema_editor):
+    """
+    Carga ContadorEstadistica y VentaDiaria con los datos existentes: las señales solo
+    suman lo que cambia después, así que sin esto los paneles muestran 0 tras el deploy.
+    """
+    from core import estadisticas
+
+    estadisticas.recalcular(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('core', '0011_indices_consultas'),
+    ]
+
+    operations = [
+        migrations.RunPython(poblar, migrations.RunPython.noop),
+    ]
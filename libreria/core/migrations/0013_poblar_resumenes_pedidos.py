@@ -0,0 +1,22 @@
+from django.db import migrations
+
+
+def poblar(apps, schema_editor):
+    """
+    Carga ResumenPedidos con los pedidos existentes: las señales ajustan los totales de forma
+    incremental, así que sin esto el primer pedido tras el deploy deja el resumen en 1 pedido.
+    """
+    from core import pedidos
+
+    pedidos.recalcular_resumenes(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_poblar_estadisticas'),
+    ]
+
+    operations = [
+        migrations.RunPython(poblar, migrations.RunPython.noop),
+    ]
@@ -66,12 +66,59 @@ class Libro(models.Model):
     descripcion = models.TextField()
     precio = models.DecimalField(max_digits=8, decimal_places=2)
     stock = models.PositiveIntegerField()
-    categoria = models.ForeignKey(Categoria, on_delete=models.SET_NULL, null=True, related_name="libros")
-    editorial = models.ForeignKey(Editorial, on_delete=models.SET_NULL, null=True, related_name="libros")
+    # Unidades retenidas por reservas activas; se mantiene de forma incremental
+    # en core/reservas.py para no sumar las reservas en cada lectura.
+    stock_reservado = models.PositiveIntegerField(default=0)
+    # Sin índice propio: los compuestos de Meta.indexes empiezan por estas columnas
+    categoria = models.ForeignKey(Categoria, on_delete=models.SET_NULL, null=True, related_name="libros",
+                                  db_index=False)
+    editorial = models.ForeignKey(Editorial, on_delete=models.SET_NULL, null=True, related_name="libros",
+                                  db_index=False)
     autores = models.ManyToManyField(Autor, related_name="libros")
     imagen = models.ImageField(upload_to="libros/", null=True, blank=True)
+    # Versiones redimensionadas de `imagen` generadas en segundo plano (core/imagenes.py):
+    # {'origen': <imagen.name>, 'webp': {'320': <name>, ...}, 'jpeg': {...}}
+    imagen_variantes = models.JSONField(default=dict, blank=True, editable=False)
+    # Procesamiento en segundo plano de la última imagen subida por la API (core/imagenes.py)
+    IMAGEN_ESTADOS = [
+        ('LISTA', 'Lista'),
+        ('PENDIENTE', 'Pendiente'),
+        ('ERROR', 'Error'),
+    ]
+    imagen_estado = models.CharField(max_length=10, choices=IMAGEN_ESTADOS, default='LISTA', editable=False)
+    imagen_subida = models.CharField(max_length=64, blank=True, editable=False)
     fecha_publicacion = models.DateField()
 
+    class Meta:
+        indexes = [
+            # Listados por categoría / editorial (tienda, detalle, API, relacionados):
+            # WHERE categoria_id = ? ORDER BY id DESC
+            models.Index(fields=['categoria', '-id'], name='libro_categoria_id_idx'),
+            models.Index(fields=['editorial', '-id'], name='libro_editorial_id_idx'),
+        ]
+
+    @property
+    def stock_disponible(self):
+        """Stock que todavía puede reservarse (stock menos reservas activas)"""
+        return max(self.stock - self.stock_reservado, 0)
+
+    def variantes_imagen(self, formato):
+        """[(ancho, url)] de los derivados vigentes de la imagen, de menor a mayor"""
+        variantes = self.imagen_variantes or {}
+        if not self.imagen or variantes.get('origen') != self.imagen.name:
+            return []
+        storage = self.imagen.storage
+        return [(int(ancho), storage.url(nombre))
+                for ancho, nombre in sorted(variantes.get(formato, {}).items(), key=lambda kv: int(kv[0]))]
+
+    @property
+    def imagen_srcset_webp(self):
+        return ', '.join(f'{url} {ancho}w' for ancho, url in self.variantes_imagen('webp'))
+
+    @property
+    def imagen_srcset_jpeg(self):
+        return ', '.join(f'{url} {ancho}w' for ancho, url in self.variantes_imagen('jpeg'))
+
     def __str__(self):
         return self.titulo
 
@@ -87,16 +134,34 @@ class Carrito(models.Model):
         return f"Carrito de {self.usuario.username}"
 
 class ItemCarrito(models.Model):
-    carrito = models.ForeignKey(Carrito, on_delete=models.CASCADE, related_name="items")
+    # Sin índice propio: lo cubre la restricción única (carrito, libro)
+    carrito = models.ForeignKey(Carrito, on_delete=models.CASCADE, related_name="items", db_index=False)
     libro = models.ForeignKey(Libro, on_delete=models.CASCADE)
     cantidad = models.PositiveIntegerField(default=1)
 
+    class Meta:
+        constraints = [
+            # Un item por libro en cada carrito: agregar el mismo libro suma cantidad (core/reservas.py)
+            models.UniqueConstraint(fields=['carrito', 'libro'], name='itemcarrito_carrito_libro_uniq'),
+        ]
+
     def subtotal(self):
         return self.libro.precio * self.cantidad
 
     def __str__(self):
         return f"{self.cantidad} x {self.libro.titulo}"
 
+
+class Reserva(models.Model):
+    """Unidades de un libro retenidas para un item del carrito hasta `expira_en`"""
+    item = models.OneToOneField(ItemCarrito, on_delete=models.CASCADE, related_name="reserva")
+    libro = models.ForeignKey(Libro, on_delete=models.CASCADE, related_name="reservas")
+    cantidad = models.PositiveIntegerField()
+    expira_en = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"Reserva de {self.cantidad} x {self.libro_id} hasta {self.expira_en}"
+
 # pedido
 
 class Pedido(models.Model):
@@ -113,6 +178,12 @@ class Pedido(models.Model):
     estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default='PENDIENTE')
     direccion_envio = models.CharField(max_length=250)
 
+    class Meta:
+        indexes = [
+            # Historial de pedidos: WHERE usuario_id = ? ORDER BY fecha DESC, id DESC
+            models.Index(fields=['usuario', '-fecha', '-id'], name='pedido_usuario_fecha_idx'),
+        ]
+
     def __str__(self):
         return f"Pedido #{self.id} - {self.usuario.username}"
 
@@ -129,6 +200,52 @@ class ItemPedido(models.Model):
         return f"{self.cantidad} x {self.libro.titulo}"
 
 
+class ResumenPedidos(models.Model):
+    """Totales de pedidos por usuario, mantenidos por señales (core/signals.py)"""
+    usuario = models.OneToOneField(User, on_delete=models.CASCADE, related_name="resumen_pedidos")
+    total_pedidos = models.PositiveIntegerField(default=0)
+    gasto_total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"Resumen de {self.usuario_id}: {self.total_pedidos} pedidos"
 
 
+# tokens revocados
 
+class TokenRevocado(models.Model):
+    """JTI de un refresh token rotado; se puede purgar una vez pasado `expira_en`"""
+    jti = models.CharField(max_length=64, unique=True)
+    expira_en = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return self.jti
+
+# estadísticas
+
+class ContadorEstadistica(models.Model):
+    """Contador global pre-agregado (usuarios, libros, carritos, pedidos, ingresos)"""
+    clave = models.CharField(max_length=50, unique=True)
+    valor = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    actualizado = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.clave} = {self.valor}"
+
+
+class VentaDiaria(models.Model):
+    """Ventas de un día; con categoria nula la fila guarda el total del día"""
+    fecha = models.DateField()
+    categoria = models.ForeignKey(Categoria, on_delete=models.CASCADE, null=True, blank=True, related_name="ventas")
+    pedidos = models.IntegerField(default=0)
+    unidades = models.IntegerField(default=0)
+    ingresos = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'categoria'], name='venta_diaria_fecha_categoria_uniq'),
+            models.UniqueConstraint(fields=['fecha'], condition=models.Q(categoria__isnull=True),
+                                    name='venta_diaria_total_fecha_uniq'),
+        ]
+
+    def __str__(self):
+        return f"Ventas {self.fecha} ({self.categoria_id or 'total'}): {self.ingresos}"
@@ -0,0 +1,75 @@
+"""
+Resumen de pedidos por usuario (cantidad de pedidos y gasto acumulado).
+
+Los contadores se ajustan de forma incremental desde core/signals.py cada vez que
+se crea, modifica o elimina un Pedido; `recalcular_resumenes` los reconstruye en
+bloque cuando los pedidos se cargan saltándose las señales (bulk_create).
+"""
+from decimal import Decimal
+
+from django.db import transaction, IntegrityError
+from django.db.models import Count, Sum, Q, F
+
+from .models import ResumenPedidos
+
+
+def aporte_al_gasto(total, estado):
+    """Importe con el que un pedido contribuye al gasto total (los cancelados no suman)"""
+    if estado == 'CANCELADO' or total is None:
+        return Decimal('0')
+    return Decimal(str(total))
+
+
+def ajustar_resumen(usuario_id, pedidos=0, gasto=Decimal('0')):
+    """Suma `pedidos` y `gasto` al resumen del usuario con un único UPDATE"""
+    actualizados = ResumenPedidos.objects.filter(usuario_id=usuario_id).update(
+        total_pedidos=F('total_pedidos') + pedidos,
+        gasto_total=F('gasto_total') + gasto,
+    )
+    if actualizados or pedidos <= 0:
+        # Sin fila solo se crea al registrar un pedido nuevo; con ajuste negativo
+        # el usuario se está eliminando en cascada
+        return
+    try:
+        with transaction.atomic():
+            ResumenPedidos.objects.create(usuario_id=usuario_id, total_pedidos=pedidos, gasto_total=gasto)
+    except IntegrityError:
+        # Otra transacción creó la fila en paralelo
+        ajustar_resumen(usuario_id, pedidos, gasto)
+
+
+def obtener_resumen(usuario):
+    """Resumen del usuario (sin guardar, en cero, si todavía no tiene pedidos)"""
+    return ResumenPedidos.objects.filter(usuario=usuario).first() or ResumenPedidos(usuario=usuario)
+
+
+def recalcular_resumenes(batch_size=1000, apps=None):
+    """
+    Reconstruye todos los resúmenes con una agregación y bulk_create. `apps` permite usarla
+    desde una migración con los modelos históricos.
+    """
+    if apps is None:
+        from django.apps import apps
+    Pedido, ResumenPedidos = apps.get_model('core', 'Pedido'), apps.get_model('core', 'ResumenPedidos')
+    filas = (
+        Pedido.objects.values('usuario_id')
+        .annotate(
+            total_pedidos=Count('id'),
+            gasto_total=Sum('total', filter=~Q(estado='CANCELADO')),
+        )
+        .order_by()
+    )
+    with transaction.atomic():
+        ResumenPedidos.objects.all().delete()
+        ResumenPedidos.objects.bulk_create(
+            (
+                ResumenPedidos(
+                    usuario_id=fila['usuario_id'],
+                    total_pedidos=fila['total_pedidos'],
+                    gasto_total=fila['gasto_total'] or Decimal('0'),
+                )
+                for fila in filas.iterator(chunk_size=batch_size)
+            ),
+            batch_size=batch_size,
+        )
+    return ResumenPedidos.objects.count()
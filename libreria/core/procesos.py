@@ -0,0 +1,21 @@
+"""
+Inicialización de procesos hijos de ProcessPoolExecutor.
+
+Con el método spawn (Windows, macOS) el hijo arranca un intérprete nuevo y, para
+deserializar el initializer o las tareas, importa sus módulos antes de que nada haya
+configurado Django: un comando que importa core.models muere con AppRegistryNotReady.
+Este módulo no importa modelos, así que puede hacer de initializer y cargar el del
+comando una vez hecho `django.setup()`.
+"""
+from importlib import import_module
+
+
+def inicializar_django(ruta, *args):
+    """Configura Django (si el hijo no lo heredó con fork) y llama a `ruta` ('modulo.funcion') con args"""
+    import django
+    from django.apps import apps
+
+    if not apps.ready:
+        django.setup()
+    modulo, _, funcion = ruta.rpartition('.')
+    getattr(import_module(modulo), funcion)(*args)
@@ -0,0 +1,159 @@
+"""
+Reservas de stock con expiración.
+
+Cada ItemCarrito retiene sus unidades mediante una Reserva con TTL. El contador
+`Libro.stock_reservado` se actualiza con UPDATEs condicionales (F expressions), de
+modo que reservar nunca sobrevende y no requiere bloquear la fila del libro mientras
+el usuario decide; el bloqueo dura solo lo que tarda el UPDATE.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import Libro, ItemCarrito, Reserva
+
+logger = logging.getLogger('security')
+
+
+def ttl_reserva():
+    return timedelta(seconds=getattr(settings, 'RESERVA_TTL_SECONDS', 900))
+
+
+def _retener(libro_id, cantidad):
+    """Incrementa stock_reservado solo si hay stock disponible suficiente"""
+    return Libro.objects.filter(
+        id=libro_id,
+        stock__gte=F('stock_reservado') + cantidad,
+    ).update(stock_reservado=F('stock_reservado') + cantidad) == 1
+
+
+def _soltar(libro_id, cantidad):
+    """
+    Decrementa stock_reservado. La condición evita un contador negativo; si no coincide
+    ninguna fila el contador ya estaba desviado por debajo de las reservas y se avisa
+    para corregirlo con `expirar_reservas --reconcile`.
+    """
+    soltados = Libro.objects.filter(id=libro_id, stock_reservado__gte=cantidad).update(
+        stock_reservado=F('stock_reservado') - cantidad
+    )
+    if not soltados:
+        logger.warning(f"Reserved stock drift on book {libro_id}: could not release {cantidad} units, "
+                       f"run expirar_reservas --reconcile")
+
+
+def reservar(carrito, libro, cantidad):
+    """
+    Agrega `cantidad` unidades del libro al carrito reteniendo el stock.
+
+    Devuelve el ItemCarrito actualizado, o None si no hay stock disponible.
+    Si la reserva previa del item ya expiró se vuelve a retener la cantidad completa.
+    """
+    try:
+        return _reservar(carrito, libro, cantidad)
+    except IntegrityError:
+        # Otra petición creó el mismo item a la vez (único por carrito y libro): el savepoint
+        # deshizo la retención y se repite sumando sobre ese item
+        return _reservar(carrito, libro, cantidad)
+
+
+def _reservar(carrito, libro, cantidad):
+    with transaction.atomic():
+        item = (ItemCarrito.objects.select_for_update()
+                .filter(carrito=carrito, libro=libro).first())
+        reserva = None
+        if item is not None:
+            reserva = Reserva.objects.select_for_update().filter(item=item).first()
+
+        total = (item.cantidad if item else 0) + cantidad
+        retenido = reserva.cantidad if reserva else 0
+        if total > retenido and not _retener(libro.id, total - retenido):
+            return None
+
+        if item is None:
+            item = ItemCarrito.objects.create(carrito=carrito, libro=libro, cantidad=total)
+        else:
+            item.cantidad = total
+            item.save(update_fields=['cantidad'])
+
+        expira_en = timezone.now() + ttl_reserva()
+        if reserva is None:
+            Reserva.objects.create(item=item, libro=libro, cantidad=total, expira_en=expira_en)
+        else:
+            reserva.cantidad = total
+            reserva.expira_en = expira_en
+            reserva.save(update_fields=['cantidad', 'expira_en'])
+        return item
+
+
+def liberar(item):
+    """Devuelve al stock disponible las unidades retenidas por el item"""
+    with transaction.atomic():
+        reserva = Reserva.objects.select_for_update().filter(item=item).first()
+        if reserva is None:
+            return 0
+        _soltar(reserva.libro_id, reserva.cantidad)
+        reserva.delete()
+        return reserva.cantidad
+
+
+def eliminar_item(item):
+    """Elimina un item del carrito; la señal pre_delete de core/signals.py libera su reserva"""
+    item.delete()
+
+
+def expirar_reservas(batch_size=500, ahora=None):
+    """
+    Libera un lote de reservas vencidas.
+
+    Las reservas del lote se agrupan por libro para aplicar un único UPDATE por libro.
+    Devuelve el número de reservas liberadas (0 cuando no quedan vencidas).
+    """
+    ahora = ahora or timezone.now()
+    with transaction.atomic():
+        vencidas = list(
+            Reserva.objects.select_for_update(skip_locked=True)
+            .filter(expira_en__lte=ahora)
+            .order_by('expira_en')
+            .values_list('id', 'libro_id', 'cantidad')[:batch_size]
+        )
+        if not vencidas:
+            return 0
+
+        por_libro = {}
+        for _, libro_id, cantidad in vencidas:
+            por_libro[libro_id] = por_libro.get(libro_id, 0) + cantidad
+        for libro_id, cantidad in por_libro.items():
+            _soltar(libro_id, cantidad)
+
+        Reserva.objects.filter(id__in=[reserva_id for reserva_id, _, _ in vencidas]).delete()
+    return len(vencidas)
+
+
+def reconciliar_stock_reservado():
+    """
+    Recalcula stock_reservado a partir de las reservas activas.
+
+    Corrige desvíos producidos por escrituras que no pasan por `liberar` ni por la señal
+    pre_delete de ItemCarrito (SQL directo, borrados de Reserva sueltos, restauraciones).
+    Devuelve el número de libros corregidos.
+    """
+    activos = dict(
+        Reserva.objects.values('libro_id')
+        .annotate(total=Sum('cantidad'))
+        .values_list('libro_id', 'total')
+    )
+    corregidos = 0
+    with transaction.atomic():
+        for libro in Libro.objects.filter(stock_reservado__gt=0).only('id', 'stock_reservado'):
+            if libro.stock_reservado != activos.get(libro.id, 0):
+                Libro.objects.filter(id=libro.id).update(stock_reservado=activos.get(libro.id, 0))
+                corregidos += 1
+        for libro_id, total in activos.items():
+            corregidos += Libro.objects.filter(id=libro_id, stock_reservado=0).update(stock_reservado=total)
+    if corregidos:
+        logger.warning(f"Reserved stock reconciled for {corregidos} books")
+    return corregidos
@@ -0,0 +1,75 @@
+"""
+Enrutado de lecturas del catálogo a réplicas de solo lectura.
+
+Los modelos del catálogo (Libro, Categoria, Autor, Editorial y la tabla de autores de
+cada libro) se leen de una réplica al azar de settings.DATABASE_REPLICAS; todo lo demás
+(carritos, pedidos, reservas, usuarios, sesiones) y todas las escrituras van a `default`.
+
+Solo se usan réplicas dentro de una petición (entre iniciar_peticion y terminar_peticion,
+ReplicaPinningMiddleware). Los comandos y los trabajos en segundo plano lanzados con
+on_commit (hilos de ThreadPoolExecutor, sin el contexto de la petición) leen del primario:
+suelen leer justo lo que se acaba de confirmar, y una réplica atrasada no lo tendría.
+
+Lectura de las propias escrituras: en cuanto una petición escribe en el catálogo, sus
+lecturas siguientes van al primario, y ReplicaPinningMiddleware deja una cookie para que
+las peticiones de los próximos REPLICA_PIN_SECONDS (el retraso de replicación tolerado)
+también lo hagan. Las escrituras en otros modelos (sesión, last_login, carritos) no fijan
+al cliente: esos modelos ya se leen siempre del primario. Dentro de una transacción en
+`default` se lee siempre del primario.
+"""
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+CATALOGO = {'libro', 'categoria', 'autor', 'editorial', 'libro_autores'}
+
+# Por petición (también a través de sync_to_async): si hay una petición en curso, si debe
+# leer del primario y si escribió en el catálogo
+_en_peticion = ContextVar('replica_en_peticion', default=False)
+_fijado = ContextVar('replica_fijado', default=False)
+_escribio = ContextVar('replica_escribio', default=False)
+
+
+def iniciar_peticion(fijado):
+    _en_peticion.set(True)
+    _fijado.set(fijado)
+    _escribio.set(False)
+
+
+def terminar_peticion():
+    """Limpia el contexto y devuelve si la petición escribió en el catálogo"""
+    escribio = _escribio.get()
+    _en_peticion.set(False)
+    _fijado.set(False)
+    _escribio.set(False)
+    return escribio
+
+
+def es_catalogo(model):
+    return model._meta.app_label == 'core' and model._meta.model_name in CATALOGO
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        replicas = getattr(settings, 'DATABASE_REPLICAS', ())
+        if (not replicas or not es_catalogo(model) or not _en_peticion.get() or _fijado.get()
+                or _escribio.get() or connections[DEFAULT_DB_ALIAS].in_atomic_block):
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        if es_catalogo(model):
+            _escribio.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Las réplicas tienen los mismos datos que el primario
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
@@ -1,8 +1,10 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from django.contrib.auth import authenticate
-from .models import Libro, Categoria, Editorial, Autor, Carrito, ItemCarrito, UserProfile
+from .models import Libro, Categoria, Editorial, Autor, Carrito, ItemCarrito, UserProfile, Pedido, ItemPedido, ResumenPedidos
 from rest_framework_simplejwt.tokens import RefreshToken
+from .backends import EmailBackend, users_by_email
+from . import imagenes, uploads
+import os
 import re
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
@@ -14,7 +16,7 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         fields = ('username', 'email', 'password', 'password_confirm', 'first_name', 'last_name')
     
     def validate_email(self, value):
-        if User.objects.filter(email=value).exists():
+        if users_by_email(value).exists():
             raise serializers.ValidationError("Email already registered.")
         return value
     
@@ -42,10 +44,8 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
     
     def create(self, validated_data):
         validated_data.pop('password_confirm')
-        user = User.objects.create_user(**validated_data)
-        # Crear perfil del usuario
-        UserProfile.objects.create(user=user, role='USER')
-        return user
+        # El perfil por defecto lo crea la señal post_save de User
+        return User.objects.create_user(**validated_data)
 
 
 class UserLoginSerializer(serializers.Serializer):
@@ -57,16 +57,12 @@ class UserLoginSerializer(serializers.Serializer):
         password = attrs.get('password')
         
         if email and password:
-            try:
-                user = User.objects.get(email=email)
-                user = authenticate(username=user.username, password=password)
-                if not user:
-                    raise serializers.ValidationError("Invalid credentials.")
-                if not user.is_active:
-                    raise serializers.ValidationError("User account is disabled.")
-                attrs['user'] = user
-            except User.DoesNotExist:
+            # Una sola consulta indexada por email y verificación del hash sobre ese usuario;
+            # los usuarios inactivos también dan None (user_can_authenticate)
+            user = EmailBackend().authenticate(self.context.get('request'), email=email, password=password)
+            if not user:
                 raise serializers.ValidationError("Invalid credentials.")
+            attrs['user'] = user
         else:
             raise serializers.ValidationError("Must include email and password.")
         
@@ -122,11 +118,29 @@ class LibroSerializer(serializers.ModelSerializer):
     autores = AutorSerializer(many=True, read_only=True)
     categoria = CategoriaSerializer(read_only=True)
     editorial = EditorialSerializer(read_only=True)
+    imagen_variantes = serializers.SerializerMethodField()
     
     class Meta:
         model = Libro
-        fields = ('id', 'titulo', 'descripcion', 'precio', 'stock', 'categoria', 
-                 'editorial', 'autores', 'imagen', 'fecha_publicacion')
+        fields = ('id', 'titulo', 'descripcion', 'precio', 'stock', 'stock_disponible', 'categoria', 
+                 'editorial', 'autores', 'imagen', 'imagen_variantes', 'imagen_estado', 'fecha_publicacion')
+        read_only_fields = ('stock_disponible', 'imagen_estado')
+    
+    def get_imagen_variantes(self, obj):
+        """{'webp': {'srcset': ..., 'urls': {ancho: url}}, 'jpeg': {...}} o {} si aún no hay derivados"""
+        request = self.context.get('request')
+        resultado = {}
+        for formato in ('webp', 'jpeg'):
+            urls = {
+                ancho: request.build_absolute_uri(url) if request else url
+                for ancho, url in obj.variantes_imagen(formato)
+            }
+            if urls:
+                resultado[formato] = {
+                    'srcset': ', '.join(f'{url} {ancho}w' for ancho, url in urls.items()),
+                    'urls': urls,
+                }
+        return resultado
     
     def validate_precio(self, value):
         if value <= 0:
@@ -147,16 +161,28 @@ class LibroCreateUpdateSerializer(serializers.ModelSerializer):
     )
     categoria_id = serializers.IntegerField(write_only=True, required=False)
     editorial_id = serializers.IntegerField(write_only=True, required=False)
+    # FileField y no ImageField: la verificación con Pillow se hace en segundo plano
+    # (core/imagenes.py) y no bloquea la petición leyendo el archivo completo
+    imagen = serializers.FileField(required=False, allow_null=True)
     
     class Meta:
         model = Libro
         fields = ('titulo', 'descripcion', 'precio', 'stock', 'categoria_id',
-                 'editorial_id', 'autores_ids', 'imagen', 'fecha_publicacion')
+                 'editorial_id', 'autores_ids', 'imagen', 'imagen_estado', 'fecha_publicacion')
+        read_only_fields = ('imagen_estado',)
+    
+    def validate_imagen(self, value):
+        if value and value.size > uploads.max_bytes():
+            raise serializers.ValidationError("File too large.")
+        if value and os.path.splitext(value.name)[1].lower() not in uploads.IMAGE_EXTENSIONS:
+            raise serializers.ValidationError("Unsupported image type.")
+        return value
     
     def create(self, validated_data):
         autores_ids = validated_data.pop('autores_ids', [])
         categoria_id = validated_data.pop('categoria_id', None)
         editorial_id = validated_data.pop('editorial_id', None)
+        imagen = validated_data.pop('imagen', None)
         
         if categoria_id:
             validated_data['categoria'] = Categoria.objects.get(id=categoria_id)
@@ -169,6 +195,19 @@ class LibroCreateUpdateSerializer(serializers.ModelSerializer):
             autores = Autor.objects.filter(id__in=autores_ids)
             libro.autores.set(autores)
         
+        if imagen:
+            imagenes.programar_subida(libro, imagen)
+        
+        return libro
+    
+    def update(self, instance, validated_data):
+        imagen = validated_data.pop('imagen', serializers.empty)
+        libro = super().update(instance, validated_data)
+        if imagen is None:
+            libro.imagen = None
+            libro.save()
+        elif imagen is not serializers.empty:
+            imagenes.programar_subida(libro, imagen)
         return libro
 
 
@@ -203,11 +242,35 @@ class AddToCartSerializer(serializers.Serializer):
     
     def validate(self, attrs):
         libro = Libro.objects.get(id=attrs['libro_id'])
-        if libro.stock < attrs['cantidad']:
-            raise serializers.ValidationError(f"Not enough stock. Available: {libro.stock}")
+        if libro.stock_disponible < attrs['cantidad']:
+            raise serializers.ValidationError(f"Not enough stock. Available: {libro.stock_disponible}")
         return attrs
 
 
+class ItemPedidoSerializer(serializers.ModelSerializer):
+    libro_id = serializers.IntegerField(read_only=True)
+    titulo = serializers.CharField(source='libro.titulo', read_only=True, default=None)
+    subtotal = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    
+    class Meta:
+        model = ItemPedido
+        fields = ('id', 'libro_id', 'titulo', 'cantidad', 'precio_unitario', 'subtotal')
+
+
+class PedidoSerializer(serializers.ModelSerializer):
+    items = ItemPedidoSerializer(many=True, read_only=True)
+    
+    class Meta:
+        model = Pedido
+        fields = ('id', 'fecha', 'estado', 'total', 'direccion_envio', 'items')
+
+
+class ResumenPedidosSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ResumenPedidos
+        fields = ('total_pedidos', 'gasto_total')
+
+
 # Serializer para respuestas que excluye campos sensibles
 class SafeUserSerializer(serializers.ModelSerializer):
     profile = UserProfileSerializer(read_only=True)
@@ -0,0 +1,141 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Libro, Carrito, ItemCarrito, Pedido, ItemPedido, UserProfile, Categoria, Autor, Editorial
+from . import pedidos, estadisticas, imagenes, reservas
+
+
+# Perfil de usuario: se crea junto con el usuario (registro, admin, allauth/Google,
+# createsuperuser), así las vistas solo leen `user.profile` y nunca escriben en un GET
+
+@receiver(post_save, sender=User)
+def crear_perfil(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserProfile.objects.get_or_create(user=instance)
+
+
+# Contadores globales del panel de administración
+
+def _contar(clave):
+    def al_guardar(sender, instance, created, raw=False, **kwargs):
+        if created and not raw:
+            estadisticas.incrementar(clave, 1)
+
+    def al_eliminar(sender, instance, **kwargs):
+        estadisticas.incrementar(clave, -1)
+
+    return al_guardar, al_eliminar
+
+
+for _modelo, _clave in ((User, estadisticas.USUARIOS), (Libro, estadisticas.LIBROS), (Carrito, estadisticas.CARRITOS)):
+    _al_guardar, _al_eliminar = _contar(_clave)
+    post_save.connect(_al_guardar, sender=_modelo, weak=False, dispatch_uid=f'estadisticas_{_clave}_save')
+    post_delete.connect(_al_eliminar, sender=_modelo, weak=False, dispatch_uid=f'estadisticas_{_clave}_delete')
+
+
+# Libros: derivados responsive de la imagen
+
+@receiver(post_save, sender=Libro)
+def programar_variantes_imagen(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    origen = (instance.imagen_variantes or {}).get('origen')
+    if instance.imagen and instance.imagen.name != origen:
+        imagenes.programar_variantes(instance.pk)
+    elif not instance.imagen and instance.imagen_variantes:
+        imagenes.descartar_variantes(instance)
+
+
+# Carrito: reservas de stock. También corre en los borrados en cascada (carrito o usuario
+# eliminados), que de otro modo dejarían las unidades retenidas en Libro.stock_reservado
+
+@receiver(pre_delete, sender=ItemCarrito)
+def liberar_reserva_del_item(sender, instance, **kwargs):
+    reservas.liberar(instance)
+
+
+# Pedidos: resumen por usuario y ventas diarias
+
+@receiver(pre_save, sender=Pedido)
+def recordar_aporte_previo(sender, instance, **kwargs):
+    """Guardar el aporte al gasto antes de modificar un pedido existente"""
+    instance._aporte_previo = None
+    instance._estado_previo = None
+    if instance.pk and not instance._state.adding:
+        previo = Pedido.objects.filter(pk=instance.pk).values('total', 'estado').first()
+        if previo:
+            instance._aporte_previo = pedidos.aporte_al_gasto(previo['total'], previo['estado'])
+            instance._estado_previo = previo['estado']
+
+
+@receiver(post_save, sender=Pedido)
+def actualizar_resumen_pedidos(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    aporte = pedidos.aporte_al_gasto(instance.total, instance.estado)
+    dia = timezone.localdate(instance.fecha)
+    if created:
+        pedidos.ajustar_resumen(instance.usuario_id, pedidos=1, gasto=aporte)
+        estadisticas.incrementar(estadisticas.PEDIDOS, 1)
+        estadisticas.incrementar(estadisticas.INGRESOS, aporte)
+        estadisticas.registrar_venta(dia, pedidos=1, ingresos=aporte)
+        return
+
+    previo = getattr(instance, '_aporte_previo', None)
+    if previo is not None and aporte != previo:
+        pedidos.ajustar_resumen(instance.usuario_id, gasto=aporte - previo)
+        estadisticas.incrementar(estadisticas.INGRESOS, aporte - previo)
+        estadisticas.registrar_venta(dia, ingresos=aporte - previo)
+
+    estado_previo = getattr(instance, '_estado_previo', None)
+    cancelado_ahora = instance.estado == 'CANCELADO'
+    if estado_previo is not None and (estado_previo == 'CANCELADO') != cancelado_ahora:
+        estadisticas.registrar_items(instance.pk, -1 if cancelado_ahora else 1)
+
+
+@receiver(post_delete, sender=Pedido)
+def descontar_pedido_eliminado(sender, instance, **kwargs):
+    aporte = pedidos.aporte_al_gasto(instance.total, instance.estado)
+    pedidos.ajustar_resumen(instance.usuario_id, pedidos=-1, gasto=-aporte)
+    estadisticas.incrementar(estadisticas.PEDIDOS, -1)
+    estadisticas.incrementar(estadisticas.INGRESOS, -aporte)
+    estadisticas.registrar_venta(timezone.localdate(instance.fecha), pedidos=-1, ingresos=-aporte)
+
+
+def _registrar_item(item, signo):
+    pedido = Pedido.objects.filter(pk=item.pedido_id).values('fecha', 'estado').first()
+    if pedido is None or pedido['estado'] == 'CANCELADO' or item.libro_id is None:
+        return
+    categoria_id = Libro.objects.filter(pk=item.libro_id).values_list('categoria_id', flat=True).first()
+    if categoria_id is None:
+        return
+    estadisticas.registrar_venta(
+        timezone.localdate(pedido['fecha']), categoria_id,
+        unidades=signo * item.cantidad, ingresos=signo * item.cantidad * item.precio_unitario,
+    )
+
+
+@receiver(post_save, sender=ItemPedido)
+def sumar_item_a_ventas(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        _registrar_item(instance, 1)
+
+
+@receiver(post_delete, sender=ItemPedido)
+def restar_item_de_ventas(sender, instance, **kwargs):
+    _registrar_item(instance, -1)
+
+
+# Filtros de la tienda cacheados por core/async_views.py
+
+def _invalidar_facetas(sender, **kwargs):
+    # Import diferido: core.async_views carga DRF y las vistas, que migrate y los comandos no usan
+    from .async_views import invalidar_facetas
+    invalidar_facetas(**kwargs)
+
+
+for _modelo in (Categoria, Autor, Editorial):
+    post_save.connect(_invalidar_facetas, sender=_modelo, dispatch_uid=f'facetas_{_modelo.__name__}_save')
+    post_delete.connect(_invalidar_facetas, sender=_modelo, dispatch_uid=f'facetas_{_modelo.__name__}_delete')
@@ -0,0 +1,125 @@
+"""
+Estáticos para DEBUG=False sin bucket.
+
+`CompressedManifestStaticFilesStorage` renombra los archivos con el hash de su contenido
+(ManifestStaticFilesStorage) y, al final de `collectstatic`, escribe junto a cada archivo
+versionado sus variantes `.gz` y `.br` (Brotli, si el paquete está instalado).
+
+`serve_static` elige la variante precomprimida según Accept-Encoding, marca los archivos
+versionados como inmutables y responde con FileResponse, que el servidor WSGI envía con
+`wsgi.file_wrapper` (sendfile) cuando lo soporta.
+"""
+import gzip
+import mimetypes
+import os
+import posixpath
+import re
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+try:
+    import brotli
+except ImportError:  # Brotli es opcional: sin él solo se generan variantes gzip
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = {
+    '.css', '.js', '.mjs', '.map', '.json', '.svg', '.txt', '.html', '.xml', '.ico', '.eot', '.ttf', '.otf',
+}
+MIN_COMPRESS_SIZE = 256
+HASHED_NAME_RE = re.compile(r'\.[0-9a-f]{12}\.[^/.]+$')
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+DEFAULT_CACHE_CONTROL = 'public, max-age=300'
+
+# Extensión del archivo precomprimido por Content-Encoding, en orden de preferencia
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def compress_file(path):
+    """Escribe `path`.gz y `path`.br si reducen el tamaño; devuelve las variantes escritas"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if len(data) < MIN_COMPRESS_SIZE:
+        return []
+    variants = [('.gz', gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append(('.br', brotli.compress(data, quality=11)))
+    written = []
+    for suffix, compressed in variants:
+        if len(compressed) < len(data):
+            with open(path + suffix, 'wb') as f:
+                f.write(compressed)
+            written.append(path + suffix)
+    return written
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+        for hashed_name in set(self.hashed_files.values()):
+            if os.path.splitext(hashed_name)[1].lower() not in COMPRESSIBLE_EXTENSIONS:
+                continue
+            path = self.path(hashed_name)
+            if not os.path.exists(path):
+                continue
+            # Los nombres versionados no cambian de contenido: no recomprimir en cada despliegue
+            if os.path.exists(path + '.gz') and (brotli is None or os.path.exists(path + '.br')):
+                continue
+            compress_file(path)
+
+
+def accepted_encodings(header):
+    """Codificaciones aceptadas (q > 0) de una cabecera Accept-Encoding"""
+    accepted = set()
+    for part in (header or '').split(','):
+        coding, _, params = part.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if q > 0:
+            accepted.add(coding)
+    return accepted
+
+
+def serve_static(request, path, document_root):
+    path = posixpath.normpath(path).lstrip('/')
+    try:
+        fullpath = safe_join(document_root, path)
+    except SuspiciousFileOperation:
+        raise Http404('Not found')
+    if not os.path.isfile(fullpath):
+        raise Http404('Not found')
+
+    accepted = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING'))
+    served_path, encoding = fullpath, None
+    for coding, suffix in ENCODINGS:
+        if (coding in accepted or '*' in accepted) and os.path.isfile(fullpath + suffix):
+            served_path, encoding = fullpath + suffix, coding
+            break
+
+    stat = os.stat(served_path)
+    if not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'), stat.st_mtime):
+        response = HttpResponseNotModified()
+    else:
+        content_type, _ = mimetypes.guess_type(fullpath)
+        response = FileResponse(open(served_path, 'rb'), filename=os.path.basename(fullpath),
+                                content_type=content_type or 'application/octet-stream')
+        if encoding:
+            response['Content-Encoding'] = encoding
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['Vary'] = 'Accept-Encoding'
+    response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL if HASHED_NAME_RE.search(path) else DEFAULT_CACHE_CONTROL
+    return response
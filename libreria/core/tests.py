@@ -1,3 +1,1103 @@
-from django.test import TestCase
+import hashlib
+import json
+import multiprocessing
+import os
+import tempfile
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from importlib import import_module
+from io import StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import AnonymousUser, User
+from django.contrib.messages.storage.fallback import FallbackStorage
+from django.contrib.sessions.backends.cache import SessionStore
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.http import Http404, HttpResponse
+from django.test import AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework.throttling import AnonRateThrottle, SimpleRateThrottle
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from . import async_views, decorators, estadisticas, pedidos, procesos, reservas, routers, tokens
+from .authentication import verified_tokens
+from .backends import EmailBackend
+from .cache import SQLiteCache
+from .media import serve_media
+from .middleware import CompressionMiddleware, ReplicaPinningMiddleware
+from .models import (
+    Autor, Carrito, Categoria, ContadorEstadistica, Editorial, ItemCarrito, ItemPedido, Libro, Pedido, Reserva,
+    ResumenPedidos, UserProfile, VentaDiaria,
+)
+
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+
+def escrituras(queries):
+    return [q['sql'] for q in queries if q['sql'].lstrip().upper().startswith(WRITE_STATEMENTS)]
+
+
+class PerfilProvisioningTests(TestCase):
+    def test_perfil_creado_con_el_usuario(self):
+        user = User.objects.create_user('nuevo', 'nuevo@example.com', 'Secreto123!')
+        self.assertEqual(user.profile.role, 'USER')
+
+    def test_registro_api_crea_un_solo_perfil(self):
+        response = APIClient().post(reverse('api_register'), {
+            'username': 'registrado',
+            'email': 'registrado@example.com',
+            'password': 'Secreto123!',
+            'password_confirm': 'Secreto123!',
+            'first_name': 'Reg',
+            'last_name': 'Istrado',
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(UserProfile.objects.filter(user__username='registrado').count(), 1)
+
+    def test_backfill_crea_perfiles_faltantes(self):
+        users = [User.objects.create_user(f'antiguo{i}') for i in range(3)]
+        UserProfile.objects.filter(user__in=users).delete()
+        call_command('crear_perfiles_faltantes', batch_size=2, stdout=StringIO())
+        self.assertEqual(UserProfile.objects.filter(user__in=users, role='USER').count(), 3)
+
+
+@override_settings(RATELIMIT_ENABLE=False)
+class GetSinEscriturasTests(TestCase):
+    """Las peticiones GET no deben escribir en la base de datos"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('lector', 'lector@example.com', 'Secreto123!')
+        cls.admin = User.objects.create_user('jefe', 'jefe@example.com', 'Secreto123!')
+        UserProfile.objects.filter(user=cls.admin).update(role='ADMIN')
+
+    def api_client(self, user):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+        return client
+
+    def assertGetSinEscrituras(self, client, url, status=200):
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        self.assertEqual(response.status_code, status, url)
+        self.assertEqual(escrituras(queries), [], url)
+        return response
+
+    def test_api_sin_escrituras(self):
+        client = self.api_client(self.user)
+        for name in ('api_profile', 'api_cart', 'api_orders_list', 'api_orders_summary', 'api_books_list'):
+            self.assertGetSinEscrituras(client, reverse(name))
+        self.assertFalse(Carrito.objects.filter(usuario=self.user).exists())
+
+    def test_api_admin_sin_escrituras(self):
+        client = self.api_client(self.admin)
+        for name in ('api_admin_dashboard', 'api_user_list'):
+            self.assertGetSinEscrituras(client, reverse(name))
+
+    def test_web_sin_escrituras(self):
+        self.client.force_login(self.user)
+        self.assertGetSinEscrituras(self.client, reverse('user_profile'))
+        self.assertGetSinEscrituras(self.client, reverse('ver_carrito'))
+        self.assertFalse(Carrito.objects.filter(usuario=self.user).exists())
+
+    def test_usuario_sin_perfil_no_lo_crea_en_get(self):
+        UserProfile.objects.filter(user=self.user).delete()
+        self.assertGetSinEscrituras(self.api_client(self.user), reverse('api_profile'), status=404)
+        self.client.force_login(self.user)
+        self.assertGetSinEscrituras(self.client, reverse('ver_carrito'), status=302)
+        self.assertFalse(UserProfile.objects.filter(user=self.user).exists())
+
+
+# (nombre, método, ruta, cliente, presupuesto de consultas). Los presupuestos incluyen los
+# SAVEPOINT de las vistas con transaction.atomic(). La ruta admite {libro}, {categoria},
+# {autor}, {editorial}, {pedido} y {libro_nuevo} (un libro recién creado que no está en el carrito).
+# Clientes: anonimo, jwt, jwt_admin, sesion, sesion_admin.
+VISTAS_RENDIMIENTO = [
+    # core/views.py
+    ('home', 'get', '/', 'anonimo', 3),
+    ('tienda', 'get', '/tienda/', 'anonimo', 6),
+    ('categorias', 'get', '/categorias/', 'anonimo', 1),
+    ('categoria_detalle', 'get', '/categorias/{categoria}/', 'anonimo', 4),
+    ('autores', 'get', '/autores/', 'anonimo', 1),
+    ('autor_detalle', 'get', '/autores/{autor}/', 'anonimo', 3),
+    ('editoriales', 'get', '/editoriales/', 'anonimo', 1),
+    ('editorial_detalle', 'get', '/editoriales/{editorial}/', 'anonimo', 3),
+    ('libro_detail', 'get', '/libros/{libro}/', 'anonimo', 3),
+    ('nosotros', 'get', '/nosotros/', 'anonimo', 0),
+    ('contacto', 'get', '/contacto/', 'anonimo', 0),
+    ('faq', 'get', '/faq/', 'anonimo', 0),
+    ('registro', 'get', '/registro/', 'anonimo', 1),
+    ('ver_carrito', 'get', '/carrito/', 'sesion', 5),
+    ('agregar_al_carrito', 'post', '/carrito/agregar/{libro_nuevo}/', 'sesion', 13),
+    ('user_profile', 'get', '/perfil/', 'sesion', 3),
+    ('admin_dashboard', 'get', '/admin/dashboard/', 'sesion_admin', 2),
+    # core/api_views.py
+    ('api_books_list', 'get', '/api/books/', 'anonimo', 3),
+    ('api_books_list:search', 'get', '/api/books/?search=Libro', 'anonimo', 3),
+    ('api_book_detail', 'get', '/api/books/{libro}/', 'anonimo', 2),
+    ('api_profile', 'get', '/api/auth/profile/', 'jwt', 2),
+    ('api_cart', 'get', '/api/cart/', 'jwt', 4),
+    ('api_cart_add', 'post', '/api/cart/add/', 'jwt', 16),
+    ('api_orders_list', 'get', '/api/orders/', 'jwt', 3),
+    ('api_orders_summary', 'get', '/api/orders/summary/', 'jwt', 2),
+    ('api_order_detail', 'get', '/api/orders/{pedido}/', 'jwt', 3),
+    ('api_login', 'post', '/api/auth/login/', 'anonimo', 2),
+    ('api_admin_dashboard', 'get', '/api/admin/dashboard/', 'jwt_admin', 5),
+    ('api_user_list', 'get', '/api/admin/users/', 'jwt_admin', 3),
+]
+
+PERF_BASELINES = Path(__file__).with_name('perf_baselines.json')
+PERF_TOLERANCIA = float(os.environ.get('PERF_LATENCY_TOLERANCE', '3'))
+# Margen absoluto para que las vistas de 1-2 ms no fallen por ruido del runner
+PERF_MARGEN_MS = float(os.environ.get('PERF_LATENCY_SLACK_MS', '25'))
+PERF_REPETICIONES = 5
+
+
+@override_settings(
+    RATELIMIT_ENABLE=False,
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+)
+class RendimientoVistasTests(TestCase):
+    """
+    Consultas SQL y latencia de cada vista de core/views.py y core/api_views.py.
+
+    El número de consultas no debe crecer con el tamaño del resultado (se mide con un
+    catálogo chico y uno grande) ni superar el presupuesto de VISTAS_RENDIMIENTO. La
+    latencia mediana se compara con core/perf_baselines.json; para regrabarla:
+    PERF_RECORD=1 python manage.py test core.tests.RendimientoVistasTests
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('cliente', 'cliente@example.com', 'Secreto123!')
+        cls.admin = User.objects.create_user('admin_perf', 'admin_perf@example.com', 'Secreto123!')
+        UserProfile.objects.filter(user=cls.admin).update(role='ADMIN')
+        cls.categoria = Categoria.objects.create(nombre='Novela')
+        cls.editorial = Editorial.objects.create(nombre='Planeta')
+        cls.autor = Autor.objects.create(nombre='Ana', apellido='García')
+        cls.carrito = Carrito.objects.create(usuario=cls.usuario)
+
+    def setUp(self):
+        # El throttling de DRF cuenta en la caché entre tests
+        cache.clear()
+        self.libros = 0
+
+    def crear_libro(self):
+        self.libros += 1
+        libro = Libro.objects.create(
+            titulo=f'Libro {self.libros}', descripcion='Descripción', precio=Decimal('10.00'), stock=100,
+            categoria=self.categoria, editorial=self.editorial, fecha_publicacion=date(2020, 1, 1),
+        )
+        coautor = Autor.objects.create(nombre=f'Coautor {self.libros}', apellido='Pérez')
+        libro.autores.add(self.autor, coautor)
+        return libro
+
+    def poblar(self, cantidad):
+        """Agrega `cantidad` libros, cada uno en el carrito y en un pedido del cliente"""
+        for _ in range(cantidad):
+            libro = self.crear_libro()
+            ItemCarrito.objects.create(carrito=self.carrito, libro=libro, cantidad=1)
+            pedido = Pedido.objects.create(usuario=self.usuario, total=libro.precio, direccion_envio='Calle 1')
+            ItemPedido.objects.create(pedido=pedido, libro=libro, cantidad=1, precio_unitario=libro.precio)
+            ItemPedido.objects.create(pedido=pedido, libro=self.crear_libro(), cantidad=2,
+                                      precio_unitario=Decimal('5.00'))
+            User.objects.create_user(f'lector{self.libros}')
+        self.ultimo_libro = libro
+        self.ultimo_pedido = pedido
+
+    def cliente(self, tipo):
+        if tipo.startswith('jwt'):
+            usuario = self.admin if tipo == 'jwt_admin' else self.usuario
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(usuario).access_token}')
+            return client
+        client = APIClient()
+        if tipo.startswith('sesion'):
+            client.force_login(self.admin if tipo == 'sesion_admin' else self.usuario)
+        return client
+
+    def pedir(self, vista):
+        nombre, metodo, ruta, tipo, _ = vista
+        valores = {
+            'libro': self.ultimo_libro.id, 'categoria': self.categoria.id, 'autor': self.autor.id,
+            'editorial': self.editorial.id, 'pedido': self.ultimo_pedido.id,
+        }
+        if '{libro_nuevo}' in ruta or nombre == 'api_cart_add':
+            valores['libro_nuevo'] = self.crear_libro().id
+        data = None
+        if nombre == 'api_cart_add':
+            data = {'libro_id': valores['libro_nuevo'], 'cantidad': 1}
+        elif nombre == 'api_login':
+            data = {'email': self.usuario.email, 'password': 'Secreto123!'}
+        elif nombre == 'agregar_al_carrito':
+            data = {'cantidad': '1'}
+        client = self.cliente(tipo)
+        with CaptureQueriesContext(connection) as queries:
+            inicio = time.perf_counter()
+            if metodo == 'post':
+                response = client.post(ruta.format(**valores), data, format=None if nombre == 'agregar_al_carrito'
+                                       else 'json')
+            else:
+                response = client.get(ruta.format(**valores))
+            duracion = (time.perf_counter() - inicio) * 1000
+        self.assertLess(response.status_code, 400, f'{nombre}: {response.status_code}')
+        return len(queries), duracion
+
+    def test_consultas_no_crecen_con_los_datos(self):
+        self.poblar(2)
+        chico = {}
+        for vista in VISTAS_RENDIMIENTO:
+            self.pedir(vista)  # calentar cachés de plantillas, URLs y ContentTypes
+            chico[vista[0]] = self.pedir(vista)[0]
+        self.poblar(25)
+        filas, fallos = [], []
+        for vista in VISTAS_RENDIMIENTO:
+            nombre, presupuesto = vista[0], vista[4]
+            grande = self.pedir(vista)[0]
+            estado = 'ok'
+            if grande != chico[nombre]:
+                estado = f'crece con los datos ({chico[nombre]} -> {grande})'
+            elif grande > presupuesto:
+                estado = f'supera el presupuesto en {grande - presupuesto}'
+            filas.append(f'{nombre:26} {chico[nombre]:>5} {grande:>6} {presupuesto:>11}  {estado}')
+            if estado != 'ok':
+                fallos.append(nombre)
+        reporte = '\n'.join([f'{"vista":26} {"chico":>5} {"grande":>6} {"presupuesto":>11}'] + filas)
+        if fallos or os.environ.get('PERF_REPORT'):
+            print('\n' + reporte)
+        self.assertFalse(fallos, f'Consultas fuera de presupuesto en {", ".join(fallos)}:\n{reporte}')
+
+    def test_latencia_bajo_baseline(self):
+        self.poblar(25)
+        medidas = {}
+        for vista in VISTAS_RENDIMIENTO:
+            self.pedir(vista)
+            medidas[vista[0]] = statistics.median(self.pedir(vista)[1] for _ in range(PERF_REPETICIONES))
+
+        if os.environ.get('PERF_RECORD'):
+            PERF_BASELINES.write_text(json.dumps(
+                {nombre: round(ms, 2) for nombre, ms in medidas.items()}, indent=2) + '\n')
+            return
+
+        baselines = json.loads(PERF_BASELINES.read_text()) if PERF_BASELINES.exists() else {}
+        filas, fallos = [], []
+        for nombre, ms in medidas.items():
+            baseline = baselines.get(nombre)
+            if baseline is None:
+                estado = 'sin baseline'
+            elif ms > baseline * PERF_TOLERANCIA + PERF_MARGEN_MS:
+                estado = f'regresión {ms / baseline - 1:+.0%}'
+                fallos.append(nombre)
+            else:
+                estado = 'ok'
+            filas.append(f'{nombre:26} {ms:>9.2f} {baseline if baseline is not None else "-":>11}  {estado}')
+        reporte = '\n'.join([f'{"vista":26} {"mediana ms":>9} {"baseline ms":>11}'] + filas)
+        if fallos or os.environ.get('PERF_REPORT'):
+            print('\n' + reporte)
+        self.assertFalse(fallos, f'Latencia sobre el baseline (x{PERF_TOLERANCIA} + {PERF_MARGEN_MS} ms) '
+                                 f'en {", ".join(fallos)}:\n{reporte}')
+
+
+@override_settings(RATELIMIT_ENABLE=False)
+class VistasAsyncTests(TestCase):
+    """Las vistas de core/async_views.py responden lo mismo que sus equivalentes síncronas"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('async', 'async@example.com', 'Secreto123!')
+        categoria = Categoria.objects.create(nombre='Async')
+        editorial = Editorial.objects.create(nombre='Editorial Async')
+        autor = Autor.objects.create(nombre='Autor', apellido='Async')
+        for i in range(25):
+            libro = Libro.objects.create(
+                titulo=f'Libro {i}', descripcion='Descripción', precio=Decimal('10.00'), stock=5,
+                categoria=categoria, editorial=editorial, fecha_publicacion=date(2020, 1, 1),
+            )
+            libro.autores.add(autor)
+        cls.libro = libro
+        carrito = Carrito.objects.create(usuario=cls.user)
+        ItemCarrito.objects.create(carrito=carrito, libro=libro, cantidad=2)
+
+    def setUp(self):
+        cache.clear()
+
+    def peticion(self, path, user=None, **extra):
+        request = AsyncRequestFactory().get(path, **extra)
+        request.user = user or AnonymousUser()
+        request.session = SessionStore()
+        request._messages = FallbackStorage(request)
+
+        async def auser():
+            return request.user
+        request.auser = auser
+        return request
+
+    def bearer(self, user):
+        # Los clientes y factories async no convierten HTTP_* en headers
+        return {'headers': {'Authorization': f'Bearer {RefreshToken.for_user(user).access_token}'}}
+
+    async def test_api_igual_que_drf(self):
+        casos = [
+            (async_views.libros_api, (), '/api/books/?page=2', {}),
+            (async_views.libros_api, (), '/api/books/?search=Libro 1', {}),
+            (async_views.libro_api, (self.libro.pk,), f'/api/books/{self.libro.pk}/', {}),
+            (async_views.libro_api, (0,), '/api/books/0/', {}),
+            (async_views.carrito_api, (), '/api/cart/', self.bearer(self.user)),
+            (async_views.carrito_api, (), '/api/cart/', {}),
+        ]
+        for vista, args, path, extra in casos:
+            esperado = await self.async_client.get(path, **extra)
+            response = await vista(self.peticion(path, **extra), *args)
+            self.assertEqual(response.status_code, esperado.status_code, path)
+            self.assertEqual(json.loads(response.content), esperado.json(), path)
+
+    async def test_throttles_igual_que_drf(self):
+        casos = [
+            (async_views.libros_api, (), '/api/books/', {}),
+            (async_views.libro_api, (self.libro.pk,), f'/api/books/{self.libro.pk}/', {}),
+            (async_views.carrito_api, (), '/api/cart/', self.bearer(self.user)),
+        ]
+        with mock.patch.object(SimpleRateThrottle, 'THROTTLE_RATES', {'anon': '1/hour', 'user': '1/hour'}):
+            for vista, args, path, extra in casos:
+                await cache.aclear()
+                await self.async_client.get(path, **extra)
+                esperado = await self.async_client.get(path, **extra)
+                await cache.aclear()
+                await vista(self.peticion(path, **extra), *args)
+                response = await vista(self.peticion(path, **extra), *args)
+                self.assertEqual(response.status_code, 429, path)
+                self.assertEqual(esperado.status_code, 429, path)
+                self.assertEqual(json.loads(response.content), esperado.json(), path)
+                self.assertEqual(response['Retry-After'], esperado['Retry-After'], path)
+
+    async def test_paginas(self):
+        for vista, args, path in [
+            (async_views.home, (), '/?page=99'),
+            (async_views.tienda, (), '/tienda/?q=Libro'),
+            (async_views.libro_detail, (self.libro.pk,), f'/libros/{self.libro.pk}/'),
+        ]:
+            response = await vista(self.peticion(path), *args)
+            self.assertEqual(response.status_code, 200, path)
+        response = await async_views.libro_detail(self.peticion('/libros/0/'), 0)
+        self.assertEqual(response.status_code, 302)
+
+    async def test_facetas_se_invalidan(self):
+        antes = await async_views.facetas()
+        await Categoria.objects.acreate(nombre='Nueva')
+        despues = await async_views.facetas()
+        self.assertEqual(len(despues['categorias']), len(antes['categorias']) + 1)
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class ReplicaRouterTests(SimpleTestCase):
+    """Catálogo a las réplicas, el resto y lo posterior a una escritura al primario"""
+
+    # Sin la transacción de TestCase, que fijaría todas las lecturas al primario
+    databases = {'default'}
+
+    def setUp(self):
+        self.router = routers.PrimaryReplicaRouter()
+        routers.iniciar_peticion(False)
+        self.addCleanup(routers.terminar_peticion)
+
+    def test_catalogo_en_replica(self):
+        for modelo in (Libro, Categoria, Autor, Editorial, Libro.autores.through):
+            self.assertEqual(self.router.db_for_read(modelo), 'replica1', modelo)
+        for modelo in (Carrito, ItemCarrito, Pedido, User):
+            self.assertEqual(self.router.db_for_read(modelo), 'default', modelo)
+        self.assertFalse(self.router.allow_migrate('replica1', 'core'))
+
+    def test_lee_sus_escrituras(self):
+        # Escribir fuera del catálogo (sesión, last_login, carrito) no fija al primario
+        self.assertEqual(self.router.db_for_write(Carrito), 'default')
+        self.assertEqual(self.router.db_for_read(Libro), 'replica1')
+        self.assertEqual(self.router.db_for_write(Libro), 'default')
+        self.assertEqual(self.router.db_for_read(Libro), 'default')
+
+    def test_fuera_de_una_peticion_en_primario(self):
+        # Comandos y trabajos de on_commit en hilos del pool (core/imagenes.py)
+        routers.terminar_peticion()
+        self.assertEqual(self.router.db_for_read(Libro), 'default')
+        routers.iniciar_peticion(False)
+        with ThreadPoolExecutor(1) as pool:
+            self.assertEqual(pool.submit(self.router.db_for_read, Libro).result(), 'default')
+        self.assertEqual(self.router.db_for_read(Libro), 'replica1')
+
+    def test_transaccion_en_primario(self):
+        with transaction.atomic():
+            self.assertEqual(self.router.db_for_read(Libro), 'default')
+
+    def test_middleware_fija_tras_escribir(self):
+        def vista(request):
+            self.router.db_for_write(Libro)
+            return HttpResponse()
+
+        response = ReplicaPinningMiddleware(vista)(RequestFactory().post('/carrito/agregar/1/'))
+        self.assertEqual(response.cookies['db_primary']['max-age'], 5)
+        # La escritura no queda en el contexto de la siguiente petición
+        routers.iniciar_peticion(False)
+        self.assertEqual(self.router.db_for_read(Libro), 'replica1')
+
+        def lectura(request):
+            return HttpResponse(self.router.db_for_read(Libro))
+
+        request = RequestFactory().get('/tienda/')
+        request.COOKIES['db_primary'] = '1'
+        response = ReplicaPinningMiddleware(lectura)(request)
+        self.assertEqual(response.content, b'default')
+        self.assertNotIn('db_primary', response.cookies)
+
+
+def _incrementar(path, veces):
+    cache = SQLiteCache(path, {})
+    for _ in range(veces):
+        cache.incr('contador')
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.path = os.path.join(directorio.name, 'cache.sqlite3')
+        self.cache = SQLiteCache(self.path, {'OPTIONS': {'MAX_ENTRIES': 20, 'CULL_FREQUENCY': 2}})
+
+    def test_operaciones(self):
+        self.cache.set('lista', [1, 'dos'])
+        self.cache.set('entero', 7)
+        self.cache.set('booleano', True)
+        self.assertEqual(self.cache.get('lista'), [1, 'dos'])
+        self.assertIs(self.cache.get('booleano'), True)
+        self.assertFalse(self.cache.add('entero', 1))
+        self.assertEqual(self.cache.incr('entero', 3), 10)
+        self.assertEqual(self.cache.decr('entero'), 9)
+        self.assertRaises(ValueError, self.cache.incr, 'no_existe')
+        self.assertTrue(self.cache.delete('entero'))
+        self.assertIsNone(self.cache.get('entero'))
+
+    def test_archivo_privado(self):
+        path = os.path.join(os.path.dirname(self.path), 'privado', 'cache.sqlite3')
+        SQLiteCache(path, {}).set('clave', 1)
+        self.assertEqual(os.stat(os.path.dirname(path)).st_mode & 0o777, 0o700)
+        self.assertEqual(os.stat(path).st_mode & 0o777, 0o600)
+
+    def test_rechaza_archivo_escribible_por_otros(self):
+        # Archivo creado por otro usuario en un directorio compartido, con sus propias filas
+        with open(self.path, 'wb'):
+            pass
+        os.chmod(self.path, 0o666)
+        with self.assertRaises(ImproperlyConfigured):
+            self.cache.get('clave')
+
+    def sin_geteuid(self):
+        geteuid = os.geteuid
+        del os.geteuid
+        self.addCleanup(setattr, os, 'geteuid', geteuid)
+
+    def test_plataforma_sin_geteuid(self):
+        self.sin_geteuid()
+        self.cache.set('clave', 1)
+        self.assertEqual(self.cache.get('clave'), 1)
+        os.chmod(self.path, 0o666)
+        with self.assertRaises(ImproperlyConfigured):
+            SQLiteCache(self.path, {}).get('clave')
+
+    def test_windows(self):
+        # st_mode de Windows marca como 0o666 todo archivo escribible
+        self.sin_geteuid()
+        with open(self.path, 'wb'):
+            pass
+        os.chmod(self.path, 0o666)
+        with mock.patch.object(os, 'name', 'nt'):
+            self.cache.set('clave', 1)
+            self.assertEqual(self.cache.get('clave'), 1)
+
+    def test_expiracion(self):
+        self.cache.set('viejo', 'x', timeout=-1)
+        self.assertIsNone(self.cache.get('viejo'))
+        self.assertTrue(self.cache.add('viejo', 'y'))
+        self.assertEqual(self.cache.get('viejo'), 'y')
+        self.assertTrue(self.cache.touch('viejo', timeout=0))
+        self.assertFalse(self.cache.has_key('viejo'))
+
+    def test_desaloja_las_menos_usadas(self):
+        for i in range(64):
+            self.cache.set(f'clave{i}', i)
+        restantes = [i for i in range(64) if self.cache.has_key(f'clave{i}')]
+        self.assertLessEqual(len(restantes), 20 + 16)
+        self.assertIn(63, restantes)
+        self.assertNotIn(0, restantes)
+
+    def test_incr_atomico_entre_procesos(self):
+        self.cache.set('contador', 0)
+        contexto = multiprocessing.get_context('fork')
+        procesos = [contexto.Process(target=_incrementar, args=(self.path, 100)) for _ in range(4)]
+        for proceso in procesos:
+            proceso.start()
+        for proceso in procesos:
+            proceso.join()
+        self.assertEqual(self.cache.get('contador'), 400)
+
+
+class IndicesTests(TestCase):
+    def test_consultas_de_las_vistas_usan_indices(self):
+        call_command('explain_queries', fail_on_scan=True, stdout=StringIO())
+
+    def test_item_unico_por_carrito_y_libro(self):
+        user = User.objects.create_user('unico')
+        libro = Libro.objects.create(titulo='Único', descripcion='-', precio=Decimal('5.00'), stock=10,
+                                     fecha_publicacion=date(2020, 1, 1))
+        carrito = Carrito.objects.create(usuario=user)
+        reservas.reservar(carrito, libro, 1)
+        reservas.reservar(carrito, libro, 2)
+        self.assertEqual(list(carrito.items.values_list('cantidad', flat=True)), [3])
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            ItemCarrito.objects.create(carrito=carrito, libro=libro)
+
+
+class StartupTests(TestCase):
+    def test_no_migra_si_no_hay_pendientes(self):
+        salida = StringIO()
+        call_command('startup', no_static=True, stdout=salida)
+        self.assertIn('0 pending', salida.getvalue())
+        self.assertNotIn('startup: migrate', salida.getvalue())
+
+    def directorio(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        return directorio.name
+
+    def test_lock_de_sqlite_sin_fcntl(self):
+        from .management.commands import startup
+
+        ruta = os.path.join(self.directorio(), 'db.sqlite3.migrate.lock')
+        msvcrt = mock.Mock(LK_LOCK=1, LK_UNLCK=0)
+        # LK_LOCK se rinde a los 10 s con OSError: se sigue esperando
+        msvcrt.locking.side_effect = [OSError, None, None]
+        with mock.patch.object(startup, 'fcntl', None), mock.patch.object(startup, 'msvcrt', msvcrt, create=True):
+            with startup.bloqueo_archivo(ruta):
+                self.assertEqual(msvcrt.locking.call_count, 2)
+        self.assertEqual([c.args[1:] for c in msvcrt.locking.call_args_list], [(1, 1), (1, 1), (0, 1)])
+
+    def test_huella_fuera_de_static_root(self):
+        from .management.commands import startup
+
+        base, static_root = self.directorio(), self.directorio()
+        storages = {**settings.STORAGES,
+                    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'}}
+        with override_settings(BASE_DIR=Path(base), STATIC_ROOT=static_root, STORAGES=storages):
+            with open(os.path.join(static_root, startup.STAMP_NAME), 'w') as archivo:
+                archivo.write('{}')
+            startup.guardar_huella('abc')
+            self.assertEqual(startup.huella_guardada(), 'abc')
+            self.assertEqual(os.listdir(static_root), [])
+            self.assertTrue(os.path.exists(os.path.join(base, startup.STAMP_NAME)))
+        with override_settings(BASE_DIR=Path(base), STATIC_ROOT=os.path.join(static_root, 'otro'), STORAGES=storages):
+            self.assertIsNone(startup.huella_guardada())
+
+
+class StartupProfileTests(SimpleTestCase):
+    def test_lee_salida_de_importtime(self):
+        from .management.commands.startup_profile import leer_importtime
+        salida = ('import time: self [us] | cumulative | imported package\n'
+                  'import time:       120 |        120 |     _io\n'
+                  'import time:      2500 |       3000 | django.utils\n')
+        self.assertEqual(leer_importtime(salida), {'_io': (0.00012, 0.00012), 'django.utils': (0.0025, 0.003)})
+
+
+@override_settings(RATELIMIT_ENABLE=False)
+class IdempotencyKeyTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('idempotente', 'idempotente@example.com', 'Secreto123!')
+        cls.libro = Libro.objects.create(titulo='Idempotente', descripcion='-', precio=Decimal('9.00'), stock=10,
+                                         fecha_publicacion=date(2020, 1, 1))
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def agregar(self, clave, cantidad=1):
+        return self.client.post('/api/cart/add/', {'libro_id': self.libro.pk, 'cantidad': cantidad},
+                                format='json', HTTP_IDEMPOTENCY_KEY=clave)
+
+    def cantidad_en_carrito(self):
+        return sum(ItemCarrito.objects.filter(carrito__usuario=self.user).values_list('cantidad', flat=True))
+
+    def test_reintento_repite_la_respuesta_sin_volver_a_ejecutar(self):
+        primera = self.agregar('clave-1')
+        segunda = self.agregar('clave-1')
+        self.assertEqual(primera.status_code, 201)
+        self.assertEqual(segunda.status_code, 201)
+        self.assertEqual(segunda['Idempotent-Replayed'], 'true')
+        self.assertEqual(segunda.json(), primera.json())
+        self.assertEqual(self.cantidad_en_carrito(), 1)
+
+    def test_409_mientras_otra_peticion_tiene_el_lock(self):
+        digest = hashlib.sha256(b'POST:/api/cart/add/:clave-2').hexdigest()
+        cache.add(f'idempotency:{self.user.pk}:{digest}:lock', 'otra', 30)
+        response = self.agregar('clave-2')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(self.cantidad_en_carrito(), 0)
+
+    def test_422_con_otro_body(self):
+        self.agregar('clave-3', cantidad=1)
+        response = self.agregar('clave-3', cantidad=2)
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(self.cantidad_en_carrito(), 1)
+
+    def test_400_con_clave_invalida(self):
+        response = self.agregar('clave inválida')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.cantidad_en_carrito(), 0)
+
+    def test_respuesta_guardada_mientras_se_tomaba_el_lock(self):
+        # La primera lectura no ve la respuesta (la otra petición aún no la guardaba) y, al tomar
+        # el lock, la otra ya terminó: se repite su respuesta en vez de ejecutar la vista otra vez
+        self.agregar('clave-4')
+        get = cache.get
+        lecturas = []
+
+        def get_atrasado(key, *args, **kwargs):
+            if key.startswith('idempotency:'):
+                lecturas.append(key)
+                if len(lecturas) == 1:
+                    return None
+            return get(key, *args, **kwargs)
+
+        with mock.patch.object(decorators.cache, 'get', side_effect=get_atrasado):
+            response = self.agregar('clave-4')
+        self.assertEqual(response['Idempotent-Replayed'], 'true')
+        self.assertEqual(self.cantidad_en_carrito(), 1)
+
+
+class EstadisticasTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('comprador')
+        cls.categoria = Categoria.objects.create(nombre='Ensayo')
+        cls.libro = Libro.objects.create(titulo='Ensayo', descripcion='-', precio=Decimal('10.00'), stock=10,
+                                         fecha_publicacion=date(2020, 1, 1), categoria=cls.categoria)
+
+    def pedido(self, total='20.00', cantidad=2):
+        pedido = Pedido.objects.create(usuario=self.user, total=Decimal(total), direccion_envio='Calle 1')
+        ItemPedido.objects.create(pedido=pedido, libro=self.libro, cantidad=cantidad, precio_unitario=Decimal('10.00'))
+        return pedido
+
+    def ventas(self, fecha, categoria=None):
+        return VentaDiaria.objects.filter(fecha=fecha, categoria=categoria).values(
+            'pedidos', 'unidades', 'ingresos').first()
+
+    def test_senales_mantienen_contadores_y_ventas(self):
+        pedido = self.pedido()
+        hoy = timezone.localdate()
+        resumen = estadisticas.resumen_dashboard()
+        self.assertEqual((resumen['total_usuarios'], resumen['total_libros'], resumen['total_pedidos']), (1, 1, 1))
+        self.assertEqual(resumen['ingresos_totales'], Decimal('20.00'))
+        self.assertEqual(self.ventas(hoy), {'pedidos': 1, 'unidades': 0, 'ingresos': Decimal('20.00')})
+
+        pedido.estado = 'CANCELADO'
+        pedido.save()
+        self.assertEqual(estadisticas.valor(estadisticas.INGRESOS), Decimal('0'))
+        self.assertEqual(self.ventas(hoy, self.categoria)['unidades'], 0)
+
+        pedido.delete()
+        self.assertEqual(estadisticas.valor(estadisticas.PEDIDOS), Decimal('0'))
+
+    def test_recalcular_coincide_con_las_senales(self):
+        self.pedido()
+        self.pedido(total='10.00', cantidad=1)
+        antes = (list(ContadorEstadistica.objects.order_by('clave').values_list('clave', 'valor')),
+                 list(VentaDiaria.objects.order_by('fecha', 'categoria').values('pedidos', 'unidades', 'ingresos')))
+        estadisticas.recalcular()
+        despues = (list(ContadorEstadistica.objects.order_by('clave').values_list('clave', 'valor')),
+                   list(VentaDiaria.objects.order_by('fecha', 'categoria').values('pedidos', 'unidades', 'ingresos')))
+        self.assertEqual(despues, antes)
+
+    def test_recalcular_dias_reconstruye_dias_completos(self):
+        hoy = timezone.localdate()
+        ayer = hoy - timedelta(days=1)
+        temprano = timezone.make_aware(datetime.combine(ayer, datetime.min.time())) + timedelta(seconds=1)
+        Pedido.objects.filter(pk=self.pedido().pk).update(fecha=temprano)
+        self.pedido(total='10.00', cantidad=1)
+        estadisticas.recalcular()
+
+        # Solo hoy: el día anterior queda intacto
+        estadisticas.recalcular(dias=1)
+        self.assertEqual(self.ventas(ayer)['pedidos'], 1)
+        self.assertEqual(self.ventas(hoy)['pedidos'], 1)
+
+        # Ayer completo, también el pedido de las 00:00:01
+        estadisticas.recalcular(dias=2)
+        self.assertEqual(self.ventas(ayer), {'pedidos': 1, 'unidades': 0, 'ingresos': Decimal('20.00')})
+        self.assertEqual(self.ventas(ayer, self.categoria)['unidades'], 2)
+
+
+@override_settings(
+    RATELIMIT_ENABLE=False,
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.PBKDF2PasswordHasher',
+                      'django.contrib.auth.hashers.MD5PasswordHasher'],
+)
+class LoginPorEmailTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('lector', 'Lector@Example.com', 'Secreto123!')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_email_sin_distinguir_mayusculas(self):
+        backend = EmailBackend()
+        self.assertEqual(backend.authenticate(None, email=' lector@EXAMPLE.com', password='Secreto123!'), self.user)
+        self.assertIsNone(backend.authenticate(None, email='lector@example.com', password='otra'))
+        self.assertIsNone(backend.authenticate(None, email='nadie@example.com', password='Secreto123!'))
+
+    def test_usuario_inactivo(self):
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertIsNone(EmailBackend().authenticate(None, email='lector@example.com', password='Secreto123!'))
+        response = APIClient().post(reverse('api_login'), {'email': 'lector@example.com', 'password': 'Secreto123!'},
+                                    format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_actualiza_el_hash(self):
+        User.objects.filter(pk=self.user.pk).update(password=make_password('Secreto123!', hasher='md5'))
+        EmailBackend().authenticate(None, email='lector@example.com', password='Secreto123!')
+        self.assertTrue(User.objects.get(pk=self.user.pk).password.startswith('pbkdf2_sha256$'))
+
+    def login_async(self, password='Secreto123!'):
+        request = AsyncRequestFactory().post('/api/auth/login/', {'email': 'lector@example.com', 'password': password},
+                                             content_type='application/json')
+        request.user = AnonymousUser()
+        return async_to_sync(async_views.user_login)(request)
+
+    def test_login_async(self):
+        response = self.login_async()
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('access', json.loads(response.content)['tokens'])
+        self.assertEqual(self.login_async('otra').status_code, 400)
+
+    def test_login_async_con_los_throttles_de_drf(self):
+        with mock.patch.object(AnonRateThrottle, 'THROTTLE_RATES', {'anon': '2/minute', 'user': '2/minute'}):
+            estados = [self.login_async('otra').status_code for _ in range(3)]
+        self.assertEqual(estados, [400, 400, 429])
+
+    @override_settings(RATELIMIT_ENABLE=True)
+    def test_limite_de_la_ruta_de_login(self):
+        client = APIClient()
+        estados = [client.post(reverse('api_login'), {'email': 'lector@example.com', 'password': 'otra'},
+                               format='json').status_code for _ in range(6)]
+        self.assertEqual(estados[-1], 429)
+
+
+@override_settings(RATELIMIT_ENABLE=False)
+class RefreshRevocadoTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('rotador')
+
+    def refrescar(self, refresh):
+        return APIClient().post(reverse('token_refresh'), {'refresh': refresh}, format='json')
+
+    def test_refresh_rotado_rechazado(self):
+        refresh = str(RefreshToken.for_user(self.user))
+        response = self.refrescar(refresh)
+        self.assertEqual(response.status_code, 200)
+        nuevo = response.json()['refresh']
+        self.assertNotEqual(nuevo, refresh)
+        self.assertEqual(self.refrescar(refresh).status_code, 401)
+        self.assertEqual(self.refrescar(nuevo).status_code, 200)
+
+    def test_rechazado_tras_reiniciar_el_proceso(self):
+        refresh = str(RefreshToken.for_user(self.user))
+        self.assertEqual(self.refrescar(refresh).status_code, 200)
+        # Un proceso nuevo parte sin filtro y lo carga desde TokenRevocado
+        with mock.patch.object(tokens, 'revocation_store', tokens.RevocationStore()):
+            self.assertEqual(self.refrescar(refresh).status_code, 401)
+
+    def test_filtro_sin_falsos_negativos(self):
+        bloom = tokens.BloomFilter(1000)
+        jtis = [f'jti-{i}' for i in range(1000)]
+        for jti in jtis:
+            bloom.add(jti)
+        self.assertTrue(all(jti in bloom for jti in jtis))
+
+
+@override_settings(RATELIMIT_ENABLE=False)
+class TokenVerificadoCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('portador')
+
+    def setUp(self):
+        verified_tokens.clear()
+        self.addCleanup(verified_tokens.clear)
+
+    def carrito(self, token):
+        return APIClient().get('/api/cart/', HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_usuario_desactivado_tras_cachear(self):
+        token = str(AccessToken.for_user(self.user))
+        self.assertEqual(self.carrito(token).status_code, 200)
+        self.assertEqual(verified_tokens.stats()['size'], 1)
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.carrito(token).status_code, 401)
+
+    def test_la_entrada_no_dura_mas_que_el_token(self):
+        token = AccessToken.for_user(self.user)
+        verified_tokens.set(str(token), token)
+        exp = token.payload['exp']
+        with mock.patch('core.authentication.time.time', return_value=exp - 1):
+            self.assertIs(verified_tokens.get(str(token)), token)
+        with mock.patch('core.authentication.time.time', return_value=exp):
+            self.assertIsNone(verified_tokens.get(str(token)))
+        self.assertEqual(verified_tokens.stats()['size'], 0)
+
+    def test_token_expirado_tras_cachear(self):
+        # Verificado y cacheado mientras era válido; expira antes de la siguiente petición
+        token = AccessToken.for_user(self.user)
+        token.set_exp(lifetime=timedelta(seconds=-1))
+        verified_tokens.set(str(token), token)
+        self.assertEqual(self.carrito(str(token)).status_code, 401)
+
+
+@override_settings(MEDIA_ACCEL_MODE='')
+class MediaTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.duenio = User.objects.create_user('duenio')
+        cls.otro = User.objects.create_user('otro')
+        cls.staff = User.objects.create_user('staff', is_staff=True)
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.root = directorio.name
+        self.privado = f'usuarios/{self.duenio.pk}/factura.pdf'
+        for ruta, contenido in ((self.privado, b'privado'), ('libros/portada.jpg', bytes(range(100)))):
+            os.makedirs(os.path.join(self.root, os.path.dirname(ruta)), exist_ok=True)
+            with open(os.path.join(self.root, ruta), 'wb') as f:
+                f.write(contenido)
+
+    def pedir(self, ruta, user=None, **headers):
+        request = RequestFactory().get(f'/media/{ruta}', **headers)
+        request.user = user or AnonymousUser()
+        return serve_media(request, ruta, document_root=self.root)
+
+    def contenido(self, response):
+        return b''.join(response.streaming_content) if response.streaming else response.content
+
+    def test_media_privada_solo_para_su_duenio(self):
+        self.assertEqual(self.contenido(self.pedir(self.privado, self.duenio)), b'privado')
+        self.assertEqual(self.pedir(self.privado, self.staff).status_code, 200)
+        for user in (self.otro, None):
+            with self.assertRaises(Http404):
+                self.pedir(self.privado, user)
+        # Lo que está fuera de los prefijos públicos y de usuarios/<id>/ es solo para el staff
+        with self.assertRaises(Http404):
+            self.pedir(f'usuarios/{self.otro.pk}/../{self.duenio.pk}/factura.pdf', self.otro)
+
+    def test_range_y_etag(self):
+        completa = self.pedir('libros/portada.jpg')
+        self.assertEqual(completa.status_code, 200)
+        etag = completa['ETag']
+
+        parcial = self.pedir('libros/portada.jpg', HTTP_RANGE='bytes=10-19')
+        self.assertEqual(parcial.status_code, 206)
+        self.assertEqual(parcial['Content-Range'], 'bytes 10-19/100')
+        self.assertEqual(self.contenido(parcial), bytes(range(10, 20)))
+        self.assertEqual(self.pedir('libros/portada.jpg', HTTP_RANGE='bytes=200-').status_code, 416)
+
+        self.assertEqual(self.pedir('libros/portada.jpg', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # If-Range con otro ETag: el archivo cambió, se envía completo
+        self.assertEqual(self.pedir('libros/portada.jpg', HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"otro"').status_code,
+                         200)
+
+
+class CompresionBreachTests(SimpleTestCase):
+    def comprimir(self, ruta, fijar_cookie=False):
+        respuesta = HttpResponse(json.dumps({'token': 'x' * 40, 'datos': ['libro'] * 500}),
+                                 content_type='application/json')
+        if fijar_cookie:
+            respuesta.set_cookie('sessionid', 'secreto')
+        request = RequestFactory().get(ruta, HTTP_ACCEPT_ENCODING='gzip')
+        return CompressionMiddleware(lambda r: respuesta)(request)
+
+    def test_comprime_la_api(self):
+        self.assertEqual(self.comprimir('/api/libros/')['Content-Encoding'], 'gzip')
+
+    def test_rutas_excluidas_sin_comprimir(self):
+        for ruta in ('/api/auth/login/', '/api/auth/register/', '/api/token/refresh/'):
+            with self.subTest(ruta=ruta):
+                self.assertFalse(self.comprimir(ruta).has_header('Content-Encoding'))
+
+    def test_respuestas_con_cookies_sin_comprimir(self):
+        respuesta = self.comprimir('/api/libros/', fijar_cookie=True)
+        self.assertFalse(respuesta.has_header('Content-Encoding'))
+        self.assertIn('sessionid', respuesta.cookies)
+
+
+class ReservasTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.carrito = Carrito.objects.create(usuario=User.objects.create_user('comprador'))
+        cls.libro = Libro.objects.create(titulo='Reservado', descripcion='Descripción', precio=Decimal('10.00'),
+                                         stock=5, fecha_publicacion=date(2020, 1, 1))
+
+    def reservado(self):
+        self.libro.refresh_from_db(fields=['stock_reservado'])
+        return self.libro.stock_reservado
+
+    def test_reservar_retiene_sin_sobrevender(self):
+        item = reservas.reservar(self.carrito, self.libro, 3)
+        self.assertEqual((item.cantidad, item.reserva.cantidad, self.reservado()), (3, 3, 3))
+        item = reservas.reservar(self.carrito, self.libro, 2)
+        self.assertEqual((item.cantidad, item.reserva.cantidad, self.reservado()), (5, 5, 5))
+        self.assertIsNone(reservas.reservar(self.carrito, self.libro, 1))
+        self.assertEqual(self.reservado(), 5)
+
+    def test_eliminar_item_libera_la_reserva(self):
+        item = reservas.reservar(self.carrito, self.libro, 3)
+        reservas.eliminar_item(item)
+        self.assertEqual(self.reservado(), 0)
+        self.assertFalse(ItemCarrito.objects.filter(pk=item.pk).exists())
+        self.assertFalse(Reserva.objects.exists())
+
+    def test_expirar_reservas(self):
+        item = reservas.reservar(self.carrito, self.libro, 2)
+        self.assertEqual(reservas.expirar_reservas(), 0)
+        despues = timezone.now() + reservas.ttl_reserva() + timedelta(seconds=1)
+        self.assertEqual(reservas.expirar_reservas(ahora=despues), 1)
+        self.assertEqual(self.reservado(), 0)
+        # El item queda en el carrito; volver a reservarlo retiene de nuevo la cantidad completa
+        self.assertTrue(ItemCarrito.objects.filter(pk=item.pk).exists())
+        self.assertEqual(reservas.reservar(self.carrito, self.libro, 1).cantidad, 3)
+        self.assertEqual(self.reservado(), 3)
+
+    def test_soltar_avisa_del_desvio(self):
+        item = reservas.reservar(self.carrito, self.libro, 3)
+        Libro.objects.filter(pk=self.libro.pk).update(stock_reservado=1)
+        with self.assertLogs('security', 'WARNING') as logs:
+            reservas.eliminar_item(item)
+        self.assertIn(f'book {self.libro.pk}', logs.output[0])
+        self.assertEqual(self.reservado(), 1)
+
+    def test_reconciliar_stock_reservado(self):
+        reservas.reservar(self.carrito, self.libro, 2)
+        Libro.objects.filter(pk=self.libro.pk).update(stock_reservado=4)
+        with self.assertLogs('security', 'WARNING'):
+            self.assertEqual(reservas.reconciliar_stock_reservado(), 1)
+        self.assertEqual(self.reservado(), 2)
+
+        # Reservas borradas sin pasar por liberar
+        Reserva.objects.all().delete()
+        with self.assertLogs('security', 'WARNING'):
+            self.assertEqual(reservas.reconciliar_stock_reservado(), 1)
+        self.assertEqual(self.reservado(), 0)
+        self.assertEqual(reservas.reconciliar_stock_reservado(), 0)
+
+    def test_borrar_el_carrito_libera_las_reservas(self):
+        otro = Libro.objects.create(titulo='Otro', descripcion='Descripción', precio=Decimal('10.00'), stock=5,
+                                    fecha_publicacion=date(2020, 1, 1))
+        reservas.reservar(self.carrito, self.libro, 2)
+        reservas.reservar(self.carrito, otro, 3)
+        self.carrito.usuario.delete()
+        otro.refresh_from_db(fields=['stock_reservado'])
+        self.assertEqual((self.reservado(), otro.stock_reservado), (0, 0))
+        self.assertFalse(Reserva.objects.exists())
+        self.assertEqual(reservas.reconciliar_stock_reservado(), 0)
+
+
+class GenerateUsersTests(TestCase):
+    def generar(self, *args):
+        call_command('generate_users', '--count', '50', '--hash-pool', '1', '--seed', '1', *args, stdout=StringIO())
+
+    def roles(self):
+        return set(UserProfile.objects.filter(user__username__startswith='loadtest_').values_list('role', flat=True))
+
+    @override_settings(DEBUG=False)
+    def test_no_corre_sin_debug(self):
+        with self.assertRaisesMessage(CommandError, 'DEBUG=False'):
+            self.generar()
+        self.assertFalse(User.objects.filter(username__startswith='loadtest_').exists())
+
+    @override_settings(DEBUG=True)
+    def test_por_defecto_solo_clientes(self):
+        self.generar()
+        self.assertEqual(User.objects.filter(username__startswith='loadtest_').count(), 50)
+        self.assertLessEqual(self.roles(), {'USER', 'GUEST'})
+
+    @override_settings(DEBUG=True)
+    def test_admin_solo_si_se_pide(self):
+        self.generar('--roles', 'ADMIN=1')
+        self.assertEqual(self.roles(), {'ADMIN'})
+
+
+class ResumenPedidosTests(TestCase):
+    def test_migracion_carga_los_pedidos_existentes(self):
+        usuario = User.objects.create_user('antiguo')
+        Pedido.objects.create(usuario=usuario, total=Decimal('30.00'), direccion_envio='Calle 1')
+        Pedido.objects.create(usuario=usuario, total=Decimal('5.00'), direccion_envio='Calle 1', estado='CANCELADO')
+        # Estado previo al deploy: pedidos sin resumen. Se ejecuta la migración con los modelos históricos
+        ResumenPedidos.objects.all().delete()
+        nombre = '0013_poblar_resumenes_pedidos'
+        estado = MigrationExecutor(connection).loader.project_state(('core', nombre))
+        import_module(f'core.migrations.{nombre}').poblar(estado.apps, None)
+
+        Pedido.objects.create(usuario=usuario, total=Decimal('10.00'), direccion_envio='Calle 1')
+        resumen = pedidos.obtener_resumen(usuario)
+        self.assertEqual((resumen.total_pedidos, resumen.gasto_total), (3, Decimal('40.00')))
+
+
+class GenerateCatalogTests(TestCase):
+    def generar(self, *args):
+        call_command('generate_catalog', '--books', '20', '--authors', '5', '--categories', '2', '--publishers', '2',
+                     '--seed', '1', *args, stdout=StringIO())
+
+    def test_carritos_existentes(self):
+        usuarios = [User.objects.create_user(f'catalogo_{i}') for i in range(3)]
+        self.generar()
+        libro = Libro.objects.filter(stock__gt=0).first()
+        item = reservas.reservar(Carrito.objects.create(usuario=usuarios[0]), libro, 1)
+        carritos = estadisticas.valor(estadisticas.CARRITOS)
+
+        self.generar('--carts', '3', '--users-prefix', 'catalogo_')
+        # Solo se cuentan los dos carritos nuevos y el que tenía una reserva queda intacto
+        self.assertEqual(estadisticas.valor(estadisticas.CARRITOS), carritos + 2)
+        self.assertEqual(list(ItemCarrito.objects.filter(carrito__usuario=usuarios[0])), [item])
+        libro.refresh_from_db(fields=['stock_reservado'])
+        self.assertEqual(libro.stock_reservado, 1)
+        self.assertTrue(ItemCarrito.objects.filter(carrito__usuario=usuarios[2]).exists())
+
+    def test_pedidos_repartidos_en_el_tiempo(self):
+        for i in range(3):
+            User.objects.create_user(f'catalogo_{i}')
+        self.generar('--orders', '200', '--order-days', '30', '--users-prefix', 'catalogo_')
+        hoy = timezone.localdate()
+        dias = {timezone.localdate(fecha) for fecha in Pedido.objects.values_list('fecha', flat=True)}
+        self.assertGreater(len(dias), 10)
+        self.assertGreaterEqual(min(dias), hoy - timedelta(days=31))
+        # El rebuild de estadísticas reparte las ventas en los mismos días
+        self.assertEqual(set(VentaDiaria.objects.filter(categoria=None).values_list('fecha', flat=True)), dias)
+
+    def test_procesos_con_spawn(self):
+        from .management.commands import generate_catalog
+
+        # Con spawn el hijo importa el comando (y core.models) sin haber configurado Django
+        contexto = ('core.management.commands.generate_catalog._preparar', [1], [1], [1], 1.0, 1, 10)
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=procesos.inicializar_django, initargs=contexto) as pool:
+            self.assertEqual(pool.submit(generate_catalog.pesos_zipf, 2, 1.0).result(), [1.0, 1.5])
@@ -0,0 +1,150 @@
+"""
+Revocación de refresh tokens rotados.
+
+`ROTATE_REFRESH_TOKENS` + `BLACKLIST_AFTER_ROTATION` solo revocan si está instalada
+la app token_blacklist. Aquí el token rotado se registra en TokenRevocado (un INSERT
+sobre un JTI único, que además rechaza dos rotaciones concurrentes del mismo token) y
+cada proceso mantiene un filtro de Bloom con los JTI revocados, refrescado de forma
+incremental por id. El caso habitual, "no revocado", se responde en memoria sin I/O;
+solo un positivo del filtro consulta la base de datos.
+"""
+import hashlib
+import math
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import TokenRevocado
+
+
+class BloomFilter:
+    """Filtro de Bloom sobre un bytearray con doble hashing (blake2b)"""
+
+    def __init__(self, capacity, error_rate=0.001):
+        capacity = max(int(capacity), 1)
+        self.capacity = capacity
+        self.size = max(int(-capacity * math.log(error_rate) / (math.log(2) ** 2)), 8)
+        self.hashes = max(int(round(self.size / capacity * math.log(2))), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, value):
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, value):
+        for pos in self._positions(value):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, value):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(value))
+
+
+class RevocationStore:
+    """Vista por proceso de los JTI revocados"""
+
+    def __init__(self, capacity=None, sync_interval=None, rebuild_interval=None):
+        self.capacity = capacity or getattr(settings, 'REVOKED_TOKENS_BLOOM_CAPACITY', 1_000_000)
+        self.sync_interval = sync_interval if sync_interval is not None else \
+            getattr(settings, 'REVOKED_TOKENS_SYNC_SECONDS', 2)
+        self.rebuild_interval = rebuild_interval if rebuild_interval is not None else \
+            getattr(settings, 'REVOKED_TOKENS_REBUILD_SECONDS', 3600)
+        self._lock = threading.Lock()
+        self._filter = None
+        self._last_id = 0
+        self._last_sync = 0.0
+        self._last_rebuild = 0.0
+
+    def _load(self, bloom, since_id):
+        rows = (TokenRevocado.objects.filter(id__gt=since_id).order_by('id')
+                .values_list('id', 'jti').iterator(chunk_size=10000))
+        last_id = since_id
+        for row_id, jti in rows:
+            bloom.add(jti)
+            last_id = row_id
+        return last_id
+
+    def sync(self, force=False):
+        """Incorporar los JTI nuevos; reconstruir el filtro si está saturado o es antiguo"""
+        now = time.monotonic()
+        if not force and self._filter is not None and now - self._last_sync < self.sync_interval:
+            return
+        with self._lock:
+            if not force and self._filter is not None and now - self._last_sync < self.sync_interval:
+                return
+            if (self._filter is None
+                    or now - self._last_rebuild >= self.rebuild_interval
+                    or self._filter.count >= self._filter.capacity):
+                # Se construye aparte y se reemplaza de una vez: los lectores nunca ven un
+                # filtro a medio cargar, y reconstruir descarta los JTI ya purgados
+                bloom = BloomFilter(max(self.capacity, TokenRevocado.objects.count() * 2))
+                self._last_id = self._load(bloom, 0)
+                self._filter = bloom
+                self._last_rebuild = now
+            else:
+                self._last_id = self._load(self._filter, self._last_id)
+            self._last_sync = now
+
+    def is_revoked(self, jti):
+        self.sync()
+        if jti not in self._filter:
+            return False
+        return TokenRevocado.objects.filter(jti=jti).exists()
+
+    def revoke(self, jti, exp):
+        """Registrar el JTI; devuelve False si ya estaba revocado"""
+        expira_en = datetime.fromtimestamp(exp, tz=dt_timezone.utc)
+        try:
+            with transaction.atomic():
+                TokenRevocado.objects.create(jti=jti, expira_en=expira_en)
+        except IntegrityError:
+            return False
+        self.sync()
+        with self._lock:
+            self._filter.add(jti)
+        return True
+
+
+revocation_store = RevocationStore()
+
+
+def purge_expired(batch_size=5000):
+    """Eliminar en lotes los JTI cuyo token ya expiró"""
+    total = 0
+    while True:
+        ids = list(TokenRevocado.objects.filter(expira_en__lt=timezone.now())
+                   .values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return total
+        total += TokenRevocado.objects.filter(id__in=ids).delete()[0]
+
+
+class RevocableRefreshToken(RefreshToken):
+    """RefreshToken que se verifica y se revoca contra el RevocationStore"""
+
+    def verify(self, *args, **kwargs):
+        super().verify(*args, **kwargs)
+        jti = self.payload.get(api_settings.JTI_CLAIM)
+        if jti and revocation_store.is_revoked(jti):
+            raise TokenError('Token is blacklisted')
+
+    def blacklist(self):
+        jti = self.payload[api_settings.JTI_CLAIM]
+        if not revocation_store.revoke(jti, self.payload['exp']):
+            # Otra petición ya rotó este mismo token
+            raise TokenError('Token is blacklisted')
+
+
+class RevocableTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = RevocableRefreshToken
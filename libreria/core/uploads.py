@@ -0,0 +1,61 @@
+"""
+Subida de portadas fuera del hilo de la petición.
+
+`LimitedTemporaryFileUploadHandler` escribe el archivo en disco a medida que llega y lo
+descarta en cuanto supera LIBRO_IMAGEN_MAX_BYTES, sin esperar al final del cuerpo.
+La vista solo mueve el temporal a un directorio propio y encola el trabajo; la
+verificación con Pillow, el re-encode y la subida al storage (GCS en producción) se
+hacen en core/imagenes.py, que actualiza el libro al terminar.
+"""
+from django.conf import settings
+from django.core.files.uploadhandler import SkipFile, TemporaryFileUploadHandler
+from rest_framework import status
+from rest_framework.response import Response
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.gif')
+
+
+def max_bytes():
+    return getattr(settings, 'LIBRO_IMAGEN_MAX_BYTES', 5 * 1024 * 1024)
+
+
+class LimitedTemporaryFileUploadHandler(TemporaryFileUploadHandler):
+    """Siempre a archivo temporal y con límite de tamaño aplicado mientras se recibe"""
+
+    def __init__(self, request=None, limit=None):
+        super().__init__(request)
+        self.limit = limit or max_bytes()
+        self.received = 0
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > self.limit:
+            self.upload_interrupted()
+            if self.request is not None:
+                self.request.upload_rechazado = self.field_name
+            raise SkipFile()
+        return super().receive_data_chunk(raw_data, start)
+
+
+class ImagenUploadMixin:
+    """Para vistas DRF que reciben `imagen`: handler limitado y respuesta 413 si se excede"""
+
+    def initialize_request(self, request, *args, **kwargs):
+        # Solo se puede cambiar antes de que se lea el cuerpo (APIView es csrf_exempt)
+        if not hasattr(request, '_files'):
+            request.upload_handlers = [LimitedTemporaryFileUploadHandler(request)]
+        return super().initialize_request(request, *args, **kwargs)
+
+    def subida_rechazada(self, request):
+        request.data  # fuerza el parseo del multipart
+        campo = getattr(request._request, 'upload_rechazado', None)
+        if campo:
+            return Response(
+                {campo: [f'File too large. Maximum size is {max_bytes()} bytes.']},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            )
+        return None
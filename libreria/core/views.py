@@ -9,14 +9,15 @@ from django.http import JsonResponse
 from django.core.paginator import Paginator
 import logging
 
-from .decorators import role_required, permission_required, validate_input, COMMON_VALIDATIONS
+from .decorators import role_required, permission_required, validate_input, get_profile, COMMON_VALIDATIONS
+from . import reservas, estadisticas
 
 logger = logging.getLogger('security')
 
 # Create your views here.
 
-def home(request):
-    # Obtener libros con paginación
+def libros_home(request):
+    """Libros de la portada con la búsqueda y el filtro por categoría (también en core/async_views.py)"""
     libros_list = Libro.objects.select_related('categoria', 'editorial').prefetch_related('autores').all()
     
     # Búsqueda segura
@@ -35,8 +36,14 @@ def home(request):
     if categoria_id and categoria_id.isdigit():
         libros_list = libros_list.filter(categoria_id=categoria_id)
     
+    return libros_list.order_by('-id'), search_query
+
+
+def home(request):
+    libros_list, search_query = libros_home(request)
+    
     # Paginación
-    paginator = Paginator(libros_list.order_by('-id'), 12)  # 12 libros por página
+    paginator = Paginator(libros_list, 12)  # 12 libros por página
     page_number = request.GET.get('page')
     libros = paginator.get_page(page_number)
     
@@ -46,23 +53,28 @@ def home(request):
     })
 
 
-def tienda(request):
+def libros_tienda(params):
+    """Libros de la tienda filtrados por categoría, autor, editorial y texto"""
     qs = Libro.objects.select_related('categoria', 'editorial').prefetch_related('autores').all()
     # filtros
-    cat = request.GET.get('categoria')
+    cat = params.get('categoria')
     if cat and cat.isdigit():
         qs = qs.filter(categoria_id=int(cat))
-    autor = request.GET.get('autor')
+    autor = params.get('autor')
     if autor and autor.isdigit():
         qs = qs.filter(autores__id=int(autor))
-    editorial = request.GET.get('editorial')
+    editorial = params.get('editorial')
     if editorial and editorial.isdigit():
         qs = qs.filter(editorial_id=int(editorial))
-    q = request.GET.get('q', '')
+    q = params.get('q', '')
     if q:
         qs = qs.filter(titulo__icontains=q)
+    return qs.distinct().order_by('-id'), q
+
 
-    paginator = Paginator(qs.distinct().order_by('-id'), 12)
+def tienda(request):
+    qs, q = libros_tienda(request.GET)
+    paginator = Paginator(qs, 12)
     page = request.GET.get('page')
     libros = paginator.get_page(page)
     return render(request, 'tienda/listado.html', {
@@ -82,7 +94,8 @@ def categorias(request):
 
 def categoria_detalle(request, categoria_id):
     categoria = get_object_or_404(Categoria, id=categoria_id)
-    libros = Libro.objects.filter(categoria=categoria).order_by('-id')
+    # La plantilla lista los autores de cada libro
+    libros = Libro.objects.filter(categoria=categoria).prefetch_related('autores').order_by('-id')
     paginator = Paginator(libros, 12)
     page = request.GET.get('page')
     return render(request, 'tienda/categoria_detalle.html', {
@@ -146,9 +159,8 @@ def registro(request):
         if form.is_valid():
             try:
                 with transaction.atomic():
+                    # El perfil por defecto lo crea la señal post_save de User
                     user = form.save()
-                    # Crear perfil de usuario por defecto
-                    UserProfile.objects.create(user=user, role='USER')
                     
                     logger.info(f"New user registered: {user.username} from IP {get_client_ip(request)}")
                     messages.success(request, 'Usuario registrado exitosamente.')
@@ -182,12 +194,8 @@ def agregar_al_carrito(request, libro_id):
             libro = get_object_or_404(Libro, id=libro_id)
             
             # Verificar permisos del usuario
-            profile = getattr(request.user, 'profile', None)
-            if not profile:
-                UserProfile.objects.create(user=request.user, role='USER')
-                profile = request.user.profile
-            
-            if not profile.has_permission('manage_cart'):
+            profile = get_profile(request.user)
+            if profile is None or not profile.has_permission('manage_cart'):
                 messages.error(request, 'No tienes permisos para agregar al carrito.')
                 return redirect('home')
             
@@ -204,25 +212,17 @@ def agregar_al_carrito(request, libro_id):
                 messages.error(request, 'Cantidad inválida.')
                 return redirect('libro_detail', libro_id=libro_id)
             
-            # Verificar stock disponible
-            if libro.stock < cantidad:
-                messages.error(request, f'Stock insuficiente. Disponible: {libro.stock}')
+            # Verificar stock disponible (descontando las reservas activas)
+            if libro.stock_disponible < cantidad:
+                messages.error(request, f'Stock insuficiente. Disponible: {libro.stock_disponible}')
                 return redirect('libro_detail', libro_id=libro_id)
             
-            # Busca si el libro ya está en el carrito
-            item, creado = ItemCarrito.objects.get_or_create(carrito=carrito, libro=libro)
-            
-            if not creado:
-                # Verificar que la nueva cantidad total no exceda el stock
-                nueva_cantidad = item.cantidad + cantidad
-                if nueva_cantidad > libro.stock:
-                    messages.error(request, f'Stock insuficiente. En carrito: {item.cantidad}, Disponible: {libro.stock}')
-                    return redirect('libro_detail', libro_id=libro_id)
-                item.cantidad = nueva_cantidad
-            else:
-                item.cantidad = cantidad
-            
-            item.save()
+            # Agrega el libro al carrito reteniendo el stock
+            item = reservas.reservar(carrito, libro, cantidad)
+            if item is None:
+                libro.refresh_from_db(fields=['stock', 'stock_reservado'])
+                messages.error(request, f'Stock insuficiente. Disponible: {libro.stock_disponible}')
+                return redirect('libro_detail', libro_id=libro_id)
             
             logger.info(f"User {request.user.username} added {cantidad} of book {libro.titulo} to cart")
             messages.success(request, f'Se agregó "{libro.titulo}" al carrito.')
@@ -238,8 +238,10 @@ def agregar_al_carrito(request, libro_id):
 @permission_required('manage_cart')
 def ver_carrito(request):
     try:
-        carrito, creado = Carrito.objects.get_or_create(usuario=request.user)
-        items = carrito.items.select_related('libro__categoria', 'libro__editorial').all()
+        # Solo lectura: el carrito se crea al agregar el primer libro
+        carrito = Carrito.objects.filter(usuario=request.user).first()
+        items = (carrito.items.select_related('libro__categoria', 'libro__editorial').all()
+                 if carrito else ItemCarrito.objects.none())
         total = sum(item.subtotal() for item in items)
         
         return render(request, 'carrito/ver_carrito.html', {
@@ -259,7 +261,7 @@ def eliminar_item(request, item_id):
     try:
         item = get_object_or_404(ItemCarrito, id=item_id, carrito__usuario=request.user)
         libro_titulo = item.libro.titulo
-        item.delete()
+        reservas.eliminar_item(item)
         
         logger.info(f"User {request.user.username} removed {libro_titulo} from cart")
         messages.success(request, f'Se eliminó "{libro_titulo}" del carrito.')
@@ -277,11 +279,11 @@ def eliminar_item(request, item_id):
 })
 def libro_detail(request, libro_id):
     try:
-        libro = get_object_or_404(Libro, id=libro_id)
+        libro = get_object_or_404(Libro.objects.select_related('editorial'), id=libro_id)
         
         # Libros relacionados de la misma categoría (máximo 4)
         libros_relacionados = Libro.objects.filter(
-            categoria=libro.categoria
+            categoria_id=libro.categoria_id
         ).exclude(id=libro_id)[:4]
         
         return render(request, 'libros/libro_detail.html', {
@@ -299,20 +301,13 @@ def libro_detail(request, libro_id):
 @role_required(['ADMIN'])
 def admin_dashboard(request):
     try:
-        # Estadísticas básicas
-        total_usuarios = User.objects.count()
-        total_libros = Libro.objects.count()
-        total_carritos = Carrito.objects.count()
+        # Estadísticas pre-agregadas (core/estadisticas.py), sin COUNT(*) por carga
+        context = estadisticas.resumen_dashboard()
         
         # Usuarios recientes
-        usuarios_recientes = User.objects.order_by('-date_joined')[:5]
+        context['usuarios_recientes'] = User.objects.select_related('profile').order_by('-date_joined')[:5]
         
-        return render(request, 'admin/dashboard.html', {
-            'total_usuarios': total_usuarios,
-            'total_libros': total_libros,
-            'total_carritos': total_carritos,
-            'usuarios_recientes': usuarios_recientes,
-        })
+        return render(request, 'admin/dashboard.html', context)
     except Exception as e:
         logger.error(f"Error accessing admin dashboard: {str(e)}")
         messages.error(request, 'Error al acceder al panel administrativo.')
@@ -323,7 +318,11 @@ def admin_dashboard(request):
 @login_required
 def user_profile(request):
     try:
-        profile, created = UserProfile.objects.get_or_create(user=request.user)
+        profile = get_profile(request.user)
+        if profile is None:
+            logger.warning(f"User {request.user.username} has no profile")
+            messages.error(request, 'Tu perfil no está disponible.')
+            return redirect('home')
         
         context = {
             'profile': profile,
@@ -333,7 +332,7 @@ def user_profile(request):
         # Información adicional según el rol
         if profile.has_permission('view_all'):
             context['can_view_all'] = True
-            context['total_users'] = User.objects.count()
+            context['total_users'] = int(estadisticas.valor(estadisticas.USUARIOS))
         
         if profile.has_permission('manage_users'):
             context['can_manage_users'] = True
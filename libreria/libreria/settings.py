@@ -13,7 +13,11 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 from pathlib import Path
 from decouple import config
 from datetime import timedelta
+import atexit
 import os
+import shutil
+import sys
+import tempfile
 import dj_database_url
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -51,11 +55,15 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
-    'tailwind',
     'theme',
-    'django_browser_reload',    
 ]
 
+# Development-only apps and middleware (django-tailwind for `manage.py tailwind start/build`,
+# django-browser-reload). Off by default with DEBUG=False so workers don't load them
+DEV_TOOLS = config('DEV_TOOLS', default=DEBUG, cast=bool)
+if DEV_TOOLS:
+    INSTALLED_APPS += ['tailwind', 'django_browser_reload']
+
 STATIC_URL = '/static/'
 
 # Media files configuration
@@ -65,24 +73,26 @@ MEDIA_ROOT = BASE_DIR / 'media'
 SITE_ID = 1
 
 AUTHENTICATION_BACKENDS = (
+    'core.backends.EmailBackend',
     'django.contrib.auth.backends.ModelBackend',
     'allauth.account.auth_backends.AuthenticationBackend',
 )
 
 TAILWIND_APP_NAME = 'theme'
 
-TAILWIND_DEV_MODE = True
-
 INTERNAL_IPS = [
     "127.0.0.1",
 ]
 
-NPM_BIN_PATH = r"C:\Program Files\nodejs\npm.cmd"
+# npm used by `manage.py tailwind`: from the environment or the PATH (npm.cmd on Windows)
+NPM_BIN_PATH = config('NPM_BIN_PATH', default=shutil.which('npm') or 'npm')
 
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.CompressionMiddleware',
+    'core.middleware.ReplicaPinningMiddleware',
     'core.middleware.RateLimitMiddleware',
     'core.middleware.SecurityLoggingMiddleware',
     'core.middleware.XSSProtectionMiddleware',
@@ -93,8 +103,21 @@ MIDDLEWARE = [
     'allauth.account.middleware.AccountMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    "django_browser_reload.middleware.BrowserReloadMiddleware",
 ]
+if DEV_TOOLS:
+    MIDDLEWARE.append('django_browser_reload.middleware.BrowserReloadMiddleware')
+
+# Response compression (core.middleware.CompressionMiddleware). Paths whose responses
+# carry secrets next to request-reflected data are never compressed (BREACH)
+COMPRESSION_MIN_SIZE = config('COMPRESSION_MIN_SIZE', default=512, cast=int)
+COMPRESSION_GZIP_LEVEL = config('COMPRESSION_GZIP_LEVEL', default=6, cast=int)
+COMPRESSION_BROTLI_QUALITY = config('COMPRESSION_BROTLI_QUALITY', default=4, cast=int)
+COMPRESSION_EXCLUDE_PATHS = (
+    '/api/auth/login/',
+    '/api/auth/register/',
+    '/api/token/',
+    '/accounts/',
+)
 
 ROOT_URLCONF = 'libreria.urls'
 
@@ -127,7 +150,7 @@ if os.environ.get('DATABASE_URL'):
         'default': dj_database_url.config(
             default=os.environ.get('DATABASE_URL'),
             conn_max_age=600,
-            conn_health_check=True,
+            conn_health_checks=True,
         )
     }
 elif os.environ.get('DB_NAME'):
@@ -146,10 +169,61 @@ else:
         'default': dj_database_url.config(
             default=f"sqlite:///{BASE_DIR / 'db.sqlite3'}",
             conn_max_age=600,
-            conn_health_check=True,
+            conn_health_checks=True,
         )
     }
 
+# Gunicorn worker processes and threads per worker (see Dockerfile); the PostgreSQL pool is sized from them
+WEB_CONCURRENCY = config('WEB_CONCURRENCY', default=2, cast=int)
+GUNICORN_THREADS = config('GUNICORN_THREADS', default=4, cast=int)
+
+# Native psycopg 3 connection pool for PostgreSQL instead of persistent per-thread connections
+DB_POOL = config('DB_POOL', default=False, cast=bool)
+
+# Apply WAL, synchronous=NORMAL, mmap and cache size to every new SQLite connection
+SQLITE_TUNING = config('SQLITE_TUNING', default=True, cast=bool)
+SQLITE_OPTIONS = {
+    # Esperar al lock de escritura en vez de fallar con "database is locked"
+    'timeout': config('SQLITE_BUSY_TIMEOUT', default=20, cast=int),
+    # Las transacciones toman el lock de escritura al empezar: sin deadlocks al promover
+    # un lock de lectura cuando dos escritores leen antes de escribir
+    'transaction_mode': 'IMMEDIATE',
+    'init_command': ';'.join([
+        'PRAGMA journal_mode=WAL',
+        'PRAGMA synchronous=NORMAL',
+        f"PRAGMA mmap_size={config('SQLITE_MMAP_SIZE', default=128 * 1024 * 1024, cast=int)}",
+        f"PRAGMA cache_size=-{config('SQLITE_CACHE_SIZE_KIB', default=32 * 1024, cast=int)}",
+    ]),
+}
+
+# Comma-separated read replica URLs; catalog reads are routed to them (core/routers.py)
+DATABASE_REPLICAS = []
+for _i, _url in enumerate(u for u in config('DATABASE_REPLICA_URLS', default='').split(',') if u.strip()):
+    DATABASES[f'replica{_i + 1}'] = {
+        **dj_database_url.parse(_url.strip(), conn_max_age=600, conn_health_checks=True),
+        # Los tests usan la base de pruebas del primario en lugar de crear una por réplica
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{_i + 1}')
+DATABASE_ROUTERS = ['core.routers.PrimaryReplicaRouter'] if DATABASE_REPLICAS else []
+
+# Seconds a client keeps reading from the primary after a write (>= replication lag)
+REPLICA_PIN_SECONDS = config('REPLICA_PIN_SECONDS', default=5, cast=int)
+REPLICA_PIN_COOKIE = 'db_primary'
+
+for _db in DATABASES.values():
+    if _db['ENGINE'] == 'django.db.backends.postgresql' and DB_POOL:
+        # El pool es por proceso y cada hilo usa como mucho una conexión a la vez:
+        # cada servidor recibe hasta WEB_CONCURRENCY * DB_POOL_MAX_SIZE conexiones
+        _db['CONN_MAX_AGE'] = 0
+        _db.setdefault('OPTIONS', {})['pool'] = {
+            'min_size': config('DB_POOL_MIN_SIZE', default=1, cast=int),
+            'max_size': config('DB_POOL_MAX_SIZE', default=GUNICORN_THREADS, cast=int),
+            'timeout': config('DB_POOL_TIMEOUT', default=10, cast=int),
+        }
+    elif _db['ENGINE'] == 'django.db.backends.sqlite3' and SQLITE_TUNING:
+        _db.setdefault('OPTIONS', {}).update(SQLITE_OPTIONS)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -227,6 +301,36 @@ if GS_BUCKET_NAME:
     # For local testing, set GOOGLE_APPLICATION_CREDENTIALS to the service account JSON
     # that has access to the bucket. In Cloud Run the service account attached to the
     # service needs Storage Object Admin role for write access.
+elif config('STATIC_MANIFEST', default=not DEBUG, cast=bool):
+    # Without a bucket: content-hashed names plus .gz/.br variants written by collectstatic,
+    # served by core.staticfiles.serve_static when DEBUG=False
+    STORAGES = {
+        'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+        'staticfiles': {'BACKEND': 'core.staticfiles.CompressedManifestStaticFilesStorage'},
+    }
+
+
+# Responsive derivatives of Libro.imagen generated in background threads (core/imagenes.py)
+IMAGEN_ANCHOS = tuple(int(ancho) for ancho in config('IMAGEN_ANCHOS', default='160,320,640,960').split(','))
+IMAGEN_CALIDAD = config('IMAGEN_CALIDAD', default=80, cast=int)
+IMAGEN_WORKERS = config('IMAGEN_WORKERS', default=2, cast=int)
+
+
+# Cover uploads through the API: streamed to FILE_UPLOAD_TEMP_DIR, rejected past
+# LIBRO_IMAGEN_MAX_BYTES and verified/re-encoded in the background (core/uploads.py)
+FILE_UPLOAD_TEMP_DIR = config('FILE_UPLOAD_TEMP_DIR', default=None)
+LIBRO_IMAGEN_MAX_BYTES = config('LIBRO_IMAGEN_MAX_BYTES', default=5 * 1024 * 1024, cast=int)
+LIBRO_IMAGEN_MAX_PIXELS = config('LIBRO_IMAGEN_MAX_PIXELS', default=40_000_000, cast=int)
+
+# Media delivery with DEBUG=False (core.media.serve_media). MEDIA_ACCEL_MODE 'nginx' sends
+# X-Accel-Redirect to MEDIA_ACCEL_PREFIX (an `internal` location), 'apache' sends X-Sendfile
+MEDIA_ACCEL_MODE = config('MEDIA_ACCEL_MODE', default='')
+MEDIA_ACCEL_PREFIX = config('MEDIA_ACCEL_PREFIX', default='/protected-media/')
+MEDIA_PUBLIC_PREFIXES = ('libros/',)
+# Per-user private media lives under MEDIA_USER_PREFIX/<user id>/ (owner and staff only);
+# anything else outside the public prefixes is served to staff only
+MEDIA_USER_PREFIX = 'usuarios/'
+MEDIA_CACHE_SECONDS = config('MEDIA_CACHE_SECONDS', default=86400, cast=int)
 
 
 # Default primary key field type
@@ -245,7 +349,7 @@ ACCOUNT_LOGOUT_REDIRECT_URL = '/'
 # Django REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'core.authentication.CachedJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -280,8 +384,18 @@ SIMPLE_JWT = {
     'USER_ID_CLAIM': 'user_id',
     'AUTH_TOKEN_CLASSES': ('rest_framework_simplejwt.tokens.AccessToken',),
     'TOKEN_TYPE_CLAIM': 'token_type',
+    # Rotated refresh tokens are revoked in core.tokens (token_blacklist app is not installed)
+    'TOKEN_REFRESH_SERIALIZER': 'core.tokens.RevocableTokenRefreshSerializer',
 }
 
+# Verified access tokens kept per process by core.authentication.CachedJWTAuthentication
+JWT_VERIFY_CACHE_SIZE = config('JWT_VERIFY_CACHE_SIZE', default=10000, cast=int)
+
+# Revoked refresh tokens: per-process Bloom filter in front of core.TokenRevocado
+REVOKED_TOKENS_BLOOM_CAPACITY = config('REVOKED_TOKENS_BLOOM_CAPACITY', default=1000000, cast=int)
+REVOKED_TOKENS_SYNC_SECONDS = config('REVOKED_TOKENS_SYNC_SECONDS', default=2, cast=float)
+REVOKED_TOKENS_REBUILD_SECONDS = config('REVOKED_TOKENS_REBUILD_SECONDS', default=3600, cast=float)
+
 # CORS Configuration
 CORS_ALLOW_ALL_ORIGINS = DEBUG  # Solo en desarrollo
 CORS_ALLOWED_ORIGINS = [
@@ -303,6 +417,7 @@ CORS_ALLOWED_HEADERS = [
     'user-agent',
     'x-csrftoken',
     'x-requested-with',
+    'idempotency-key',
 ]
 
 # Security Headers
@@ -320,17 +435,55 @@ if not DEBUG:
     CSRF_COOKIE_SECURE = True
 
 # Cache Configuration for Rate Limiting
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'unique-snowflake',
+# Cache shared by every worker process on the host (SQLite file in WAL mode, core/cache.py);
+# CACHE_BACKEND=locmem gives each process its own LocMemCache
+CACHE_BACKEND = config('CACHE_BACKEND', default='sqlite')
+if CACHE_BACKEND == 'sqlite':
+    # Private to the app (core.cache.SQLiteCache creates the directory 0700 and the file 0600),
+    # never a shared directory such as /tmp. `manage.py test` gets its own file per run so
+    # cache.clear() in the tests doesn't wipe the cache of a dev server on the same host
+    if sys.argv[1:2] == ['test']:
+        _test_cache_dir = tempfile.mkdtemp(prefix='libreria-test-cache-')
+        atexit.register(shutil.rmtree, _test_cache_dir, True)
+        CACHE_LOCATION = os.path.join(_test_cache_dir, 'cache.sqlite3')
+    else:
+        CACHE_LOCATION = config('CACHE_LOCATION', default=str(BASE_DIR / 'cache' / 'cache.sqlite3'))
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache.SQLiteCache',
+            'LOCATION': CACHE_LOCATION,
+            'OPTIONS': {
+                'MAX_ENTRIES': config('CACHE_MAX_ENTRIES', default=50000, cast=int),
+            },
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'unique-snowflake',
+        }
     }
-}
 
 # Rate Limiting Configuration
 RATELIMIT_ENABLE = config('RATELIMIT_ENABLE', default=True, cast=bool)
 RATELIMIT_USE_CACHE = config('RATELIMIT_USE_CACHE', default='default')
 
+# Stock reservations (core/reservas.py): seconds a cart item holds its units
+RESERVA_TTL_SECONDS = config('RESERVA_TTL_SECONDS', default=900, cast=int)
+
+# Login: size of the thread pool that runs password hashing in async mode (core/backends.py)
+LOGIN_HASHER_MAX_WORKERS = config('LOGIN_HASHER_MAX_WORKERS', default=2, cast=int)
+
+# Route the async implementations in core/async_views.py (serve with an ASGI server)
+ASYNC_VIEWS = config('ASYNC_VIEWS', default=False, cast=bool)
+
+# Seconds the async shop view caches its category/author/publisher filter lists
+CATALOGO_CACHE_SECONDS = config('CATALOGO_CACHE_SECONDS', default=60, cast=int)
+
+# Idempotency-Key support (core.decorators.idempotent): seconds a stored response is replayed
+IDEMPOTENCY_KEY_TTL = config('IDEMPOTENCY_KEY_TTL', default=86400, cast=int)
+
 # Logging Configuration
 LOGGING = {
     'version': 1,
@@ -18,7 +18,8 @@ from django.contrib import admin
 from django.urls import include, path, re_path
 from django.conf import settings
 from django.conf.urls.static import static
-from django.views.static import serve as static_serve
+from core.media import serve_media
+from core.staticfiles import serve_static
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
     TokenRefreshView,
@@ -28,7 +29,6 @@ from rest_framework_simplejwt.views import (
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('accounts/', include('allauth.urls')),
-    path("__reload__/", include("django_browser_reload.urls")),
     path('', include('core.urls')),
     path('auth/', include('django.contrib.auth.urls')),
     
@@ -38,20 +38,24 @@ urlpatterns = [
     path('api/token/verify/', TokenVerifyView.as_view(), name='token_verify'),
 ]
 
+if settings.DEV_TOOLS:
+    urlpatterns += [path("__reload__/", include("django_browser_reload.urls"))]
+
 # Servir archivos media y estáticos correctamente según DEBUG
 if settings.DEBUG:
     # En desarrollo, Django sirve estáticos desde los finders (STATICFILES_DIRS, apps)
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
 else:
-    # Con DEBUG=False, agregar un mapeo explícito para /static/ y /media/ usando django.views.static.serve
-    # Nota: Esto es solo para uso local con runserver; en producción debe servirse con un servidor web.
+    # Con DEBUG=False, /static/ sirve las variantes precomprimidas (.br/.gz) de collectstatic
+    # con caché inmutable para los nombres versionados; /media/ admite Range y ETag y puede
+    # delegar la transferencia al servidor web (MEDIA_ACCEL_MODE).
     if getattr(settings, 'STATIC_ROOT', None):
         urlpatterns += [
-            re_path(r'^static/(?P<path>.*)$', static_serve, {'document_root': settings.STATIC_ROOT}),
+            re_path(r'^static/(?P<path>.*)$', serve_static, {'document_root': settings.STATIC_ROOT}),
         ]
     if getattr(settings, 'MEDIA_ROOT', None):
         urlpatterns += [
-            re_path(r'^media/(?P<path>.*)$', static_serve, {'document_root': settings.MEDIA_ROOT}),
+            re_path(r'^media/(?P<path>.*)$', serve_media, {'document_root': settings.MEDIA_ROOT}),
         ]
 
 handler404 = 'core.views.custom_404'